@@ -0,0 +1,331 @@
+"""依批次設定檔一次搶多個運動中心、帳號與時段，不需要任何互動輸入
+
+執行方式(在 badminton_bot 目錄下)：
+    python batch.py plan.json --dry-run
+    python batch.py plan.json --auto-tune --low-jitter
+
+設定檔的格式見 services/batch_plan.py。所有開搶在同一個 event loop 中各自倒數、登入、
+預熱連線並送出請求，--dry-run 只檢查設定檔並列出開搶時間表與需要的連線數。
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+from main import (
+    FIRING_WINDOW,
+    PRE_LOGIN_OFFSET,
+    WEBSERVICE_BY_CENTER,
+    connection_pool_size,
+    positive_int,
+    run_booking,
+    set_logger,
+)
+from services.batch_plan import BatchRun, load_batch_plan
+from services.firing_engine import FiringWindow, SlotResult
+from services.run_history import DEFAULT_RUN_HISTORY_PATH, FiringTuner, RunHistory
+from utils.low_jitter import run_event_loop
+
+
+def firing_settings(
+    run: BatchRun, tuner: FiringTuner | None
+) -> tuple[timedelta, FiringWindow, str]:
+    """Pick the send offset and firing window of a run, an offset written in the
+    spec file wins over the suggestion of the run history.
+
+    Args:
+        run (BatchRun): the planned run
+        tuner (FiringTuner | None): the tuner when auto tuning is enabled
+
+    Returns:
+        tuple[timedelta, FiringWindow, str]: the send offset, the firing window and where they come from
+    """
+    if run.send_offset is not None:
+        return run.send_offset, FIRING_WINDOW, "設定檔"
+
+    suggestion = tuner.suggest(center=run.center) if tuner is not None else None
+    if suggestion is not None:
+        return suggestion.send_offset, suggestion.window, f"最近 {suggestion.run_count} 次開搶紀錄"
+    return timedelta(), FIRING_WINDOW, "預設"
+
+
+def run_connection_count(
+    run: BatchRun, window: FiringWindow, raw_socket: bool, workers: int
+) -> int:
+    """Count the connections a run keeps open around its booking time.
+
+    Args:
+        run (BatchRun): the planned run
+        window (FiringWindow): the firing window of the run
+        raw_socket (bool): whether raw connections are warmed up next to the aiohttp ones
+        workers (int): the number of worker processes
+
+    Returns:
+        int: the number of connections across the main and worker processes
+    """
+    pool_size = connection_pool_size(
+        window=window,
+        periods_by_username={
+            account.username: periods for account, periods in run.assignments.items()
+        },
+        courts_per_slot=len(WEBSERVICE_BY_CENTER[run.center].CENTER.courts),
+    )
+    if workers > 1:
+        # 每個工作行程預熱平分後的連線數，主行程另外保留一條掃描時刻表與取消場地用的連線
+        return -(-pool_size // workers) * workers * (2 if raw_socket else 1) + 1
+    return pool_size * (2 if raw_socket else 1)
+
+
+def print_plan(
+    plan: tuple[BatchRun, ...],
+    tuner: FiringTuner | None,
+    raw_socket: bool,
+    workers: int,
+) -> None:
+    """Print the schedule of every run and the connections needed at the busiest moment.
+
+    Args:
+        plan (tuple[BatchRun, ...]): the planned runs
+        tuner (FiringTuner | None): the tuner when auto tuning is enabled
+        raw_socket (bool): whether raw connections are warmed up next to the aiohttp ones
+        workers (int): the number of worker processes
+    """
+    # 每次開搶從開始登入到連發結束之間都會佔用連線
+    busy_intervals = []
+    for index, run in enumerate(plan, start=1):
+        send_offset, window, source = firing_settings(run=run, tuner=tuner)
+        send_time = run.server_booking_date + send_offset
+        connections = run_connection_count(
+            run=run, window=window, raw_socket=raw_socket, workers=workers
+        )
+        busy_intervals.append(
+            (send_time + PRE_LOGIN_OFFSET, send_time + window.window_end, connections)
+        )
+
+        webservice = WEBSERVICE_BY_CENTER[run.center]
+        print(f"#{index} {webservice.sports_center_name()} ({run.center})")
+        print(
+            f"  開搶時間：{run.server_booking_date.isoformat(sep=' ', timespec='milliseconds')} "
+            f"送出偏移 {send_offset.total_seconds() * 1000:+.0f} 毫秒 ({source})"
+        )
+        print(f"  開始登入：{send_time + PRE_LOGIN_OFFSET:%Y-%m-%d %H:%M:%S}")
+        print(f"  網址：{run.base_url or webservice.DEFAULT_BASE_URL}")
+        for account, periods in run.assignments.items():
+            print(
+                f"  {account.username}："
+                f"{', '.join(f'{period:%Y-%m-%d %H:%M}' for period in periods)}"
+            )
+        print(
+            f"  連發區間 {window.window_start.total_seconds() * 1000:.0f} ~ "
+            f"{window.window_end.total_seconds() * 1000:.0f} 毫秒，"
+            f"每個時段最多 {window.shots_per_slot} 發、全部最多 {window.max_requests} 發，"
+            f"預熱 {connections} 條連線"
+        )
+
+    peak_connections = max(
+        sum(
+            connections
+            for other_start, other_end, connections in busy_intervals
+            if other_start <= start <= other_end
+        )
+        for start, _, _ in busy_intervals
+    )
+    print(
+        f"共 {len(plan)} 次開搶、"
+        f"{len({account.username for run in plan for account in run.assignments})} 個帳號、"
+        f"{sum(len(run.booking_periods) for run in plan)} 個時段，"
+        f"同一時間最多 {peak_connections} 條連線"
+    )
+    descriptor_limit = open_file_limit()
+    if workers == 1 and descriptor_limit is not None and peak_connections >= descriptor_limit:
+        print(f"警告：連線數超過可以開啟的檔案數上限 {descriptor_limit}，請提高 ulimit -n 或使用 --workers")
+
+
+def open_file_limit() -> int | None:
+    """Read the soft limit of open file descriptors of this process.
+
+    Returns:
+        int | None: the limit, None when it is unknown or unlimited
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    return None if soft_limit == resource.RLIM_INFINITY else soft_limit
+
+
+async def run_batch(
+    plan: tuple[BatchRun, ...],
+    tuner: FiringTuner | None = None,
+    history: RunHistory | None = None,
+    low_jitter: bool = False,
+    raw_socket: bool = False,
+    workers: int = 1,
+) -> list[dict[str, list[SlotResult]] | None]:
+    """Run every planned booking concurrently in the current event loop, a failed
+    run is logged and does not stop the others.
+
+    Args:
+        plan (tuple[BatchRun, ...]): the planned runs
+        tuner (FiringTuner | None, optional): the tuner when auto tuning is enabled. Defaults to None.
+        history (RunHistory | None, optional): the run history store. Defaults to None.
+        low_jitter (bool, optional): whether to enter the low jitter mode around each booking time. Defaults to False.
+        raw_socket (bool, optional): whether to write the pre-serialized requests to raw connections. Defaults to False.
+        workers (int, optional): the number of worker processes of each run. Defaults to 1.
+
+    Returns:
+        list[dict[str, list[SlotResult]] | None]: the results of each run in plan order, None for failed runs
+    """
+
+    async def run_one(run: BatchRun) -> dict[str, list[SlotResult]]:
+        send_offset, window, _ = firing_settings(run=run, tuner=tuner)
+        return await run_booking(
+            webservice=WEBSERVICE_BY_CENTER[run.center],
+            assignments=run.assignments,
+            server_booking_date=run.server_booking_date,
+            base_url=run.base_url,
+            low_jitter=low_jitter,
+            raw_socket=raw_socket,
+            workers=workers,
+            send_offset=send_offset,
+            window=window,
+            history=history,
+        )
+
+    outcomes = await asyncio.gather(*(run_one(run=run) for run in plan), return_exceptions=True)
+    results = []
+    for run, outcome in zip(plan, outcomes):
+        if isinstance(outcome, BaseException):
+            logging.error(
+                "%s %s 的開搶執行失敗",
+                run.center,
+                run.server_booking_date,
+                exc_info=outcome,
+            )
+            results.append(None)
+            continue
+        results.append(outcome)
+    return results
+
+
+def log_batch_summary(
+    plan: tuple[BatchRun, ...], results: list[dict[str, list[SlotResult]] | None]
+) -> None:
+    """Log the won periods of every account in every run.
+
+    Args:
+        plan (tuple[BatchRun, ...]): the planned runs
+        results (list[dict[str, list[SlotResult]] | None]): the results of each run in plan order
+    """
+    for index, (run, run_results) in enumerate(zip(plan, results), start=1):
+        if run_results is None:
+            logging.info("#%d %s：執行失敗", index, run.center)
+            continue
+        periods_by_username = {
+            account.username: periods for account, periods in run.assignments.items()
+        }
+        for username, slot_results in run_results.items():
+            won = [result for result in slot_results if result.is_success]
+            logging.info(
+                "#%d %s %s 搶到 %d/%d 個時段 %s",
+                index,
+                run.center,
+                username,
+                len(won),
+                len(periods_by_username[username]),
+                ", ".join(
+                    f"{result.booking_date:%m-%d %H:%M}({','.join(result.won_courts)})"
+                    for result in won
+                ),
+            )
+
+
+def parse_args() -> argparse.Namespace:
+    """parse command line arguments
+
+    Returns:
+        argparse.Namespace: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="依批次設定檔搶多個運動中心的球場")
+    parser.add_argument("spec", type=Path, help="批次設定檔 (JSON)")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="只檢查設定檔並列出開搶時間表與需要的連線數，不會登入或送出請求",
+    )
+    parser.add_argument(
+        "--history", type=Path, default=DEFAULT_RUN_HISTORY_PATH, help="開搶紀錄資料庫路徑"
+    )
+    parser.add_argument(
+        "--auto-tune",
+        action="store_true",
+        help="設定檔沒有指定送出偏移時，套用開搶紀錄建議的送出偏移與連發區間",
+    )
+    parser.add_argument(
+        "--low-jitter",
+        action="store_true",
+        help="使用 uvloop (有安裝時)，並在開搶前後暫停 GC、綁定 CPU 與提高行程優先權",
+    )
+    parser.add_argument(
+        "--raw-socket",
+        action="store_true",
+        help="開搶時把預先序列化好的請求直接寫入預熱好的連線，不經過 aiohttp",
+    )
+    parser.add_argument(
+        "--workers", type=positive_int, default=1, help="每次開搶分擔請求的工作行程數"
+    )
+    parser.add_argument(
+        "--log-json", type=Path, default=None, help="另外把 log 以 JSON lines 格式寫入指定的檔案"
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> int:
+    """批次執行的進入點
+
+    Returns:
+        int: 設定檔不正確時為 1，否則為 0
+    """
+    set_logger(json_log_path=args.log_json)
+    try:
+        plan = load_batch_plan(path=args.spec, centers=WEBSERVICE_BY_CENTER)
+    except (OSError, ValueError) as e:
+        logging.error("設定檔不正確：\n%s", e)
+        return 1
+
+    history = RunHistory(path=args.history)
+    try:
+        tuner = (
+            FiringTuner(history=history, base_window=FIRING_WINDOW) if args.auto_tune else None
+        )
+        if args.dry_run:
+            print_plan(plan=plan, tuner=tuner, raw_socket=args.raw_socket, workers=args.workers)
+            return 0
+
+        logging.info(
+            "共 %d 次開搶，最早的開搶時間：%s", len(plan), min(run.server_booking_date for run in plan)
+        )
+        results = run_event_loop(
+            run_batch(
+                plan=plan,
+                tuner=tuner,
+                history=history,
+                low_jitter=args.low_jitter,
+                raw_socket=args.raw_socket,
+                workers=args.workers,
+            ),
+            use_uvloop=args.low_jitter,
+        )
+        log_batch_summary(plan=plan, results=results)
+        return 0
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(args=parse_args()))
@@ -0,0 +1,360 @@
+"""常駐執行的搶場地排程器，依 SQLite 中保存的每週排程自動登入、預熱並搶球場
+
+執行方式(在 badminton_bot 目錄下)：
+    python daemon.py add --center zhongshan --username A123456789 --weekday 4 --hours 20,21
+    python daemon.py list
+    python daemon.py run --auto-tune
+    python daemon.py tune
+
+排程保存在資料庫中，常駐程式重新啟動後會自動接續下一次的開搶時間。
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import getpass
+import logging
+import signal
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from main import (
+    FIRING_WINDOW,
+    PRE_LOGIN_OFFSET,
+    WEBSERVICE_BY_CENTER,
+    positive_int,
+    run_booking,
+    set_logger,
+)
+from services.account_assignment import BookingAccount
+from services.firing_engine import SlotResult
+from services.run_history import DEFAULT_RUN_HISTORY_PATH, FiringTuner, RunHistory
+from utils.job_store import DEFAULT_DAYS_AHEAD, DEFAULT_JOB_STORE_PATH, BookingJob, JobStore
+from utils.low_jitter import run_event_loop
+
+# 比 run_booking 開始登入的時間再早一點醒來，剩下的時間交給 run_booking 精準倒數
+DAEMON_WAKE_OFFSET = PRE_LOGIN_OFFSET - timedelta(minutes=2)
+# 多久重新讀取一次資料庫，讓常駐期間新增或停用的排程生效
+JOB_RELOAD_INTERVAL = timedelta(seconds=60)
+
+
+class BookingDaemon:
+    """在同一個 event loop 中為每個啟用的排程各自倒數並執行搶場地流程"""
+
+    def __init__(
+        self,
+        store: JobStore,
+        history: RunHistory | None = None,
+        base_url: str | None = None,
+        low_jitter: bool = False,
+        raw_socket: bool = False,
+        workers: int = 1,
+        auto_tune: bool = False,
+    ) -> None:
+        """
+        Args:
+            store (JobStore): 保存排程的資料庫
+            history (RunHistory | None, optional): 保存每次開搶結果的紀錄. Defaults to None.
+            base_url (str | None, optional): 運動中心網站網址，不指定則使用正式網站. Defaults to None.
+            low_jitter (bool, optional): 開搶前後是否進入低抖動模式. Defaults to False.
+            raw_socket (bool, optional): 是否把預先序列化好的請求直接寫入原始連線. Defaults to False.
+            workers (int, optional): 分擔開搶請求的工作行程數. Defaults to 1.
+            auto_tune (bool, optional): 是否套用開搶紀錄建議的送出偏移與連發區間. Defaults to False.
+        """
+        self.store = store
+        self.history = history
+        self.base_url = base_url
+        self.low_jitter = low_jitter
+        self.raw_socket = raw_socket
+        self.workers = workers
+        self.auto_tune = auto_tune
+        self._tasks: dict[int, tuple[BookingJob, asyncio.Task]] = {}
+
+    async def run(self) -> None:
+        """持續執行排程直到被取消"""
+        try:
+            while True:
+                self._sync_jobs()
+                await asyncio.sleep(JOB_RELOAD_INTERVAL.total_seconds())
+        finally:
+            for _, task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(*(task for _, task in self._tasks.values()), return_exceptions=True)
+
+    def _sync_jobs(self) -> None:
+        jobs = {job.job_id: job for job in self.store.list(enabled_only=True)}
+
+        for job_id, (job, task) in list(self._tasks.items()):
+            latest = jobs.get(job_id)
+            if task.done() or latest is None or _schedule_key(latest) != _schedule_key(job):
+                task.cancel()
+                del self._tasks[job_id]
+
+        for job_id, job in jobs.items():
+            if job_id in self._tasks:
+                continue
+            if job.center not in WEBSERVICE_BY_CENTER:
+                logging.error("排程 #%d 的運動中心 %s 不存在，略過", job_id, job.center)
+                continue
+            self._tasks[job_id] = (job, asyncio.create_task(self._run_job(job=job)))
+
+    async def _run_job(self, job: BookingJob) -> None:
+        webservice = WEBSERVICE_BY_CENTER[job.center]
+        booking_date = None
+        while True:
+            # 上一次開搶就算提早結束(例如登入失敗)也不重複執行，直接排到下一週
+            now = datetime.now() if booking_date is None else max(datetime.now(), booking_date)
+            booking_date = job.next_booking_date(now=now)
+            logging.info(
+                "排程 #%d (%s %s) 下一次開搶時間：%s",
+                job.job_id,
+                webservice.sports_center_name(),
+                job.username,
+                booking_date,
+            )
+            await _sleep_until(target_time=booking_date + DAEMON_WAKE_OFFSET)
+
+            try:
+                # 每次開搶前重新讀取紀錄，上一週的結果也會反映在這一次的設定
+                suggestion = (
+                    FiringTuner(history=self.history, base_window=FIRING_WINDOW).suggest(
+                        center=job.center
+                    )
+                    if self.auto_tune and self.history is not None
+                    else None
+                )
+                account = BookingAccount(username=job.username, password=job.password)
+                results = await run_booking(
+                    webservice=webservice,
+                    assignments={account: job.booking_periods(booking_date=booking_date)},
+                    server_booking_date=booking_date,
+                    base_url=self.base_url,
+                    low_jitter=self.low_jitter,
+                    raw_socket=self.raw_socket,
+                    workers=self.workers,
+                    send_offset=suggestion.send_offset if suggestion else timedelta(),
+                    window=suggestion.window if suggestion else FIRING_WINDOW,
+                    history=self.history,
+                )
+                summary = _summarize_results(results=results[job.username])
+            except Exception as e:
+                # 單一排程出錯不影響其他排程，下週照常執行
+                logging.exception("排程 #%d 執行失敗", job.job_id)
+                summary = f"錯誤：{e!r}"
+
+            self.store.record_run(job_id=job.job_id, booking_date=booking_date, result=summary)
+
+
+def _schedule_key(job: BookingJob) -> BookingJob:
+    # 執行紀錄變動時不需要重新排程
+    return dataclasses.replace(job, last_booking_date=None, last_result=None)
+
+
+def _summarize_results(results: list[SlotResult]) -> str:
+    if not results:
+        return "登入失敗"
+    return ", ".join(
+        f"{result.booking_date:%m-%d %H:%M} "
+        + (f"成功({','.join(result.won_courts)})" if result.is_success else "失敗")
+        for result in results
+    )
+
+
+async def _sleep_until(target_time: datetime) -> None:
+    # 分段睡眠，電腦休眠或系統校時後仍能在正確的時間醒來
+    while (remaining := (target_time - datetime.now()).total_seconds()) > 0:
+        await asyncio.sleep(min(remaining, JOB_RELOAD_INTERVAL.total_seconds()))
+
+
+async def serve(
+    store: JobStore,
+    base_url: str | None,
+    low_jitter: bool = False,
+    raw_socket: bool = False,
+    workers: int = 1,
+    history: RunHistory | None = None,
+    auto_tune: bool = False,
+) -> None:
+    """執行常駐排程器直到收到 SIGINT 或 SIGTERM"""
+    task = asyncio.create_task(
+        BookingDaemon(
+            store=store,
+            history=history,
+            base_url=base_url,
+            low_jitter=low_jitter,
+            raw_socket=raw_socket,
+            workers=workers,
+            auto_tune=auto_tune,
+        ).run()
+    )
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, task.cancel)
+
+    logging.info("排程器已啟動，共 %d 個啟用中的排程", len(store.list(enabled_only=True)))
+    try:
+        await task
+    except asyncio.CancelledError:
+        logging.info("排程器已停止")
+
+
+def parse_hours(hours_str: str) -> tuple[int, ...]:
+    """parse hours seperated by comma, e.g. 20,21
+
+    Args:
+        hours_str (str): hours string from the command line
+
+    Raises:
+        argparse.ArgumentTypeError: if any hour is not between 0 and 23
+
+    Returns:
+        tuple[int, ...]: the parsed hours
+    """
+    try:
+        hours = tuple(int(hour) for hour in hours_str.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("時段格式不正確，例：20,21")
+    if not all(0 <= hour <= 23 for hour in hours):
+        raise argparse.ArgumentTypeError("時段必須介於 0 ~ 23")
+    return hours
+
+
+def parse_args() -> argparse.Namespace:
+    """parse command line arguments
+
+    Returns:
+        argparse.Namespace: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="常駐執行的搶場地排程器")
+    parser.add_argument("--db", type=Path, default=DEFAULT_JOB_STORE_PATH, help="排程資料庫路徑")
+    parser.add_argument(
+        "--history", type=Path, default=DEFAULT_RUN_HISTORY_PATH, help="開搶紀錄資料庫路徑"
+    )
+    parser.add_argument(
+        "--log-json", type=Path, default=None, help="另外把 log 以 JSON lines 格式寫入指定的檔案"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="新增每週排程")
+    add_parser.add_argument("--center", required=True, choices=sorted(WEBSERVICE_BY_CENTER))
+    add_parser.add_argument("--username", required=True, help="身分證字號")
+    add_parser.add_argument("--password", default=None, help="密碼，不指定則在執行時輸入")
+    add_parser.add_argument(
+        "--weekday",
+        type=int,
+        required=True,
+        choices=range(1, 8),
+        help="每週開搶的星期幾(1 為星期一)",
+    )
+    add_parser.add_argument("--hours", type=parse_hours, required=True, help="想要預約的小時，例：20,21")
+    add_parser.add_argument(
+        "--opening-time", type=time.fromisoformat, default=time(0, 0), help="開搶時刻，例：00:00"
+    )
+    add_parser.add_argument("--days-ahead", type=int, default=DEFAULT_DAYS_AHEAD, help="預約幾天後的場地")
+
+    subparsers.add_parser("list", help="列出所有排程")
+    subparsers.add_parser("tune", help="依開搶紀錄列出每個運動中心建議的送出偏移與連發區間")
+
+    for command, help_message in (
+        ("remove", "刪除排程"),
+        ("enable", "啟用排程"),
+        ("disable", "停用排程"),
+    ):
+        job_parser = subparsers.add_parser(command, help=help_message)
+        job_parser.add_argument("job_id", type=int)
+
+    run_parser = subparsers.add_parser("run", help="啟動常駐排程器")
+    run_parser.add_argument(
+        "--base-url", default=None, help="運動中心網站網址，例如本機的模擬伺服器 http://127.0.0.1:8080"
+    )
+    run_parser.add_argument(
+        "--low-jitter",
+        action="store_true",
+        help="使用 uvloop (有安裝時)，並在開搶前後暫停 GC、綁定 CPU 與提高行程優先權",
+    )
+    run_parser.add_argument(
+        "--raw-socket",
+        action="store_true",
+        help="開搶時把預先序列化好的請求直接寫入預熱好的連線，不經過 aiohttp",
+    )
+    run_parser.add_argument(
+        "--workers", type=positive_int, default=1, help="分擔開搶請求的工作行程數"
+    )
+    run_parser.add_argument(
+        "--auto-tune",
+        action="store_true",
+        help="開搶紀錄足夠時，自動套用紀錄建議的送出偏移與連發區間",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    """排程器的進入點"""
+    set_logger(json_log_path=args.log_json)
+    store = JobStore(path=args.db)
+    history = RunHistory(path=args.history)
+    try:
+        if args.command == "add":
+            job = store.add(
+                BookingJob(
+                    center=args.center,
+                    username=args.username,
+                    password=args.password or getpass.getpass("請輸入密碼："),
+                    weekday=args.weekday,
+                    hours=args.hours,
+                    opening_time=args.opening_time,
+                    days_ahead=args.days_ahead,
+                )
+            )
+            logging.info(
+                "已新增排程 #%d，下一次開搶時間：%s",
+                job.job_id,
+                job.next_booking_date(now=datetime.now()),
+            )
+        elif args.command == "list":
+            for job in store.list():
+                print(
+                    f"#{job.job_id} {'啟用' if job.enabled else '停用'} {job.center} {job.username} "
+                    f"每週{job.weekday} {job.opening_time:%H:%M} 預約 {job.days_ahead} 天後 "
+                    f"{','.join(str(hour) for hour in job.hours)} 點 "
+                    f"上次：{job.last_booking_date or '-'} {job.last_result or ''}"
+                )
+        elif args.command == "tune":
+            tuner = FiringTuner(history=history, base_window=FIRING_WINDOW)
+            for center in history.centers():
+                suggestion = tuner.suggest(center=center)
+                if suggestion is None:
+                    print(f"{center} 紀錄不足")
+                    continue
+                print(
+                    f"{center} 送出偏移 {suggestion.send_offset.total_seconds() * 1000:+.0f} 毫秒 "
+                    f"連發區間 {suggestion.window.window_start.total_seconds() * 1000:.0f} ~ "
+                    f"{suggestion.window.window_end.total_seconds() * 1000:.0f} 毫秒 "
+                    f"(參考 {suggestion.run_count} 次開搶)"
+                )
+        elif args.command == "remove":
+            if not store.remove(job_id=args.job_id):
+                logging.error("排程 #%d 不存在", args.job_id)
+        elif args.command in ("enable", "disable"):
+            if not store.set_enabled(job_id=args.job_id, enabled=args.command == "enable"):
+                logging.error("排程 #%d 不存在", args.job_id)
+        elif args.command == "run":
+            run_event_loop(
+                serve(
+                    store=store,
+                    base_url=args.base_url,
+                    low_jitter=args.low_jitter,
+                    raw_socket=args.raw_socket,
+                    workers=args.workers,
+                    history=history,
+                    auto_tune=args.auto_tune,
+                ),
+                use_uvloop=args.low_jitter,
+            )
+    finally:
+        history.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main(args=parse_args())
@@ -0,0 +1,369 @@
+"""對本機模擬伺服器重複執行完整的搶場地流程，統計觸發精度與延遲的百分位數
+
+執行方式(在 badminton_bot 目錄下)：
+    python -m devtools.benchmark --iterations 50 --periods 2 --output bench.json
+    python -m devtools.benchmark --iterations 50 --compare-low-jitter
+    python -m devtools.benchmark --iterations 50 --raw-socket
+    python -m devtools.benchmark --iterations 50 --compare-logging 2> /dev/null
+"""
+
+import argparse
+import json
+import logging
+import math
+import platform
+import subprocess
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterator
+
+import aiohttp
+from services.firing_engine import FiringEngine, FiringWindow
+from services.sports_center_webservice import LOGIN_BACKEND_HTTP
+from services.zhongshan_sports_center_webservice import ZhongshanSportsCenterWebService
+from utils.connection_warmer import ConnectionWarmer
+from utils.deadline_scheduler import DeadlineScheduler
+from utils.log_pipeline import LOG_FORMAT, LogPipeline
+from utils.low_jitter import LowJitterMode, run_event_loop
+from utils.raw_http import RawConnectionPool
+
+from .mock_sports_center import MockServerConfig, MockSportsCenterServer
+
+# 每個時段只在開搶時間送出一個請求，才能直接比較預定時間與實際送出時間
+SINGLE_SHOT_WINDOW = FiringWindow(
+    shots_per_slot=1,
+    window_start=timedelta(),
+    window_end=timedelta(),
+    max_requests=1_000,
+)
+# 開搶期間的 log 設定：不輸出、在 event loop 的執行緒直接寫入 stderr、經由佇列由背景執行緒寫入
+LOG_MODE_OFF = "off"
+LOG_MODE_DIRECT = "direct"
+LOG_MODE_QUEUE = "queue"
+
+
+@dataclass
+class BenchmarkConfig:
+    """壓測設定
+
+    Attributes:
+        iterations (int): 重複執行完整流程的次數
+        periods (int): 每次要搶幾個時段
+        lead_time (timedelta): 每次從建立排程器到開搶的時間
+        latency (timedelta): 模擬伺服器的單程延遲
+        jitter (timedelta): 模擬伺服器的延遲抖動
+        low_jitter (bool): 倒數與開搶期間是否進入低抖動模式
+        raw_socket (bool): 是否把預先序列化好的請求直接寫入原始連線，此時送出時間是寫入連線後的時間
+        log_mode (str): 開搶期間的 log 設定，LOG_MODE_OFF、LOG_MODE_DIRECT 或 LOG_MODE_QUEUE
+    """
+
+    iterations: int = 20
+    periods: int = 2
+    lead_time: timedelta = timedelta(seconds=1)
+    latency: timedelta = timedelta()
+    jitter: timedelta = timedelta()
+    low_jitter: bool = False
+    raw_socket: bool = False
+    log_mode: str = LOG_MODE_OFF
+
+
+@dataclass
+class BenchmarkSamples:
+    """所有請求的量測結果，單位皆為奈秒"""
+
+    overshoot_ns: list[int] = field(default_factory=list)
+    rtt_ns: list[int] = field(default_factory=list)
+    time_to_result_ns: list[int] = field(default_factory=list)
+
+
+class RequestTimingCollector:
+    """用 aiohttp 的 TraceConfig 記錄每個請求開始、送出 header 與結束的時間"""
+
+    def __init__(self) -> None:
+        self.headers_sent_ns: list[int] = []
+        self.rtt_ns: list[int] = []
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_start.append(self._on_request_start)
+        self.trace_config.on_request_headers_sent.append(self._on_request_headers_sent)
+        self.trace_config.on_request_end.append(self._on_request_end)
+
+    def reset(self) -> None:
+        self.headers_sent_ns.clear()
+        self.rtt_ns.clear()
+
+    async def _on_request_start(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestStartParams,
+    ) -> None:
+        trace_config_ctx.headers_sent_ns = None
+
+    async def _on_request_headers_sent(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestHeadersSentParams,
+    ) -> None:
+        # 重導向時同一個請求會送出多次 header，只記錄第一次
+        if trace_config_ctx.headers_sent_ns is None:
+            trace_config_ctx.headers_sent_ns = time.perf_counter_ns()
+            self.headers_sent_ns.append(trace_config_ctx.headers_sent_ns)
+
+    async def _on_request_end(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        if trace_config_ctx.headers_sent_ns is not None:
+            self.rtt_ns.append(time.perf_counter_ns() - trace_config_ctx.headers_sent_ns)
+
+
+def percentile(values: list[int], percent: float) -> int:
+    """nearest-rank 百分位數
+
+    Args:
+        values (list[int]): 量測值
+        percent (float): 百分位，介於 0 ~ 100
+
+    Returns:
+        int: 百分位數
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values_ns: list[int]) -> dict[str, float | int]:
+    """把奈秒的量測值整理成微秒的 p50/p95/p99/max
+
+    Args:
+        values_ns (list[int]): 量測值
+
+    Returns:
+        dict[str, float | int]: 統計結果
+    """
+    if not values_ns:
+        return {"count": 0}
+
+    return {
+        "count": len(values_ns),
+        "p50_us": percentile(values_ns, 50) / 1000,
+        "p95_us": percentile(values_ns, 95) / 1000,
+        "p99_us": percentile(values_ns, 99) / 1000,
+        "max_us": max(values_ns) / 1000,
+    }
+
+
+async def run_iteration(
+    server: MockSportsCenterServer,
+    config: BenchmarkConfig,
+    collector: RequestTimingCollector,
+    samples: BenchmarkSamples,
+) -> None:
+    """執行一次完整流程：倒數、登入、預熱 session、開搶"""
+    scheduler = DeadlineScheduler(booking_date=datetime.now() + config.lead_time)
+    booking_day = scheduler.booking_date + timedelta(days=14)
+    booking_periods = tuple(
+        booking_day.replace(hour=8 + index, minute=0, second=0, microsecond=0)
+        for index in range(config.periods)
+    )
+
+    service = ZhongshanSportsCenterWebService(
+        username="benchmark",
+        password="benchmark",
+        login_backend=LOGIN_BACKEND_HTTP,
+        base_url=server.base_url,
+    )
+    async with service:
+        warmer = ConnectionWarmer(url=service.login_page_url, pool_size=config.periods)
+        async with warmer.create_session(
+            cookies=service.get_cookies(), trace_configs=[collector.trace_config]
+        ) as session:
+            await warmer.warm_up(session=session)
+            raw_pool = None
+            if config.raw_socket:
+                raw_pool = RawConnectionPool(url=service.login_page_url, pool_size=config.periods)
+                await raw_pool.warm_up()
+
+            engine = FiringEngine(
+                service=service,
+                session=session,
+                scheduler=scheduler,
+                window=SINGLE_SHOT_WINDOW,
+                raw_pool=raw_pool,
+            )
+            engine.prepare(booking_periods=booking_periods)
+            try:
+                with LowJitterMode() if config.low_jitter else nullcontext():
+                    await scheduler.wait_for_deadline(log_count_down=False)
+
+                    collector.reset()
+                    # 和 booking_courts 一樣在送出前印出 log，量測 log 本身造成的延遲
+                    logging.info("搶 %d 個時段的場地", len(booking_periods))
+                    slot_results = await engine.fire(booking_periods=booking_periods)
+                    finished_ns = time.perf_counter_ns()
+            finally:
+                if raw_pool is not None:
+                    await raw_pool.close()
+
+    deadline_ns = scheduler.deadline_ns
+    if config.raw_socket:
+        # 原始連線不經過 aiohttp 的 TraceConfig，直接使用寫入連線後量到的時間
+        samples.overshoot_ns.extend(
+            shot.overshoot_ns for result in slot_results for shot in result.shots
+        )
+    else:
+        samples.overshoot_ns.extend(
+            sent_ns - deadline_ns for sent_ns in collector.headers_sent_ns
+        )
+    samples.rtt_ns.extend(collector.rtt_ns)
+    samples.time_to_result_ns.append(finished_ns - deadline_ns)
+
+
+async def run_benchmark(config: BenchmarkConfig) -> dict:
+    """對模擬伺服器重複執行完整流程並回傳可供比較的統計結果
+
+    Args:
+        config (BenchmarkConfig): 壓測設定
+
+    Returns:
+        dict: 壓測設定、環境資訊與統計結果
+    """
+    server_config = MockServerConfig(
+        port=0,
+        latency=config.latency,
+        jitter=config.jitter,
+        capacity_per_slot=config.iterations,
+        seed=0,
+    )
+    collector = RequestTimingCollector()
+    samples = BenchmarkSamples()
+
+    async with MockSportsCenterServer(config=server_config) as server:
+        with benchmark_logging(log_mode=config.log_mode):
+            for _ in range(config.iterations):
+                await run_iteration(
+                    server=server, config=config, collector=collector, samples=samples
+                )
+
+    return {
+        "config": {
+            key: value.total_seconds() if isinstance(value, timedelta) else value
+            for key, value in asdict(config).items()
+        },
+        "environment": {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "metrics": {
+            "deadline_overshoot": summarize(samples.overshoot_ns),
+            "request_rtt": summarize(samples.rtt_ns),
+            "time_to_result": summarize(samples.time_to_result_ns),
+        },
+    }
+
+
+@contextmanager
+def benchmark_logging(log_mode: str) -> Iterator[None]:
+    """壓測期間依 log_mode 把 log 等級調到 DEBUG 並輸出到 stderr，結束後改回只輸出警告"""
+    pipeline = None
+    if log_mode == LOG_MODE_QUEUE:
+        pipeline = LogPipeline(level=logging.DEBUG)
+        pipeline.start()
+    elif log_mode == LOG_MODE_DIRECT:
+        logging.basicConfig(level=logging.DEBUG, format=LOG_FORMAT, force=True)
+
+    try:
+        yield
+    finally:
+        if pipeline is not None:
+            pipeline.stop()
+        logging.basicConfig(level=logging.WARNING, format=LOG_FORMAT, force=True)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="搶場地流程的觸發精度壓測")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--periods", type=int, default=2, help="每次要搶幾個時段")
+    parser.add_argument("--lead-ms", type=float, default=1000, help="每次從建立排程器到開搶的毫秒數")
+    parser.add_argument("--latency-ms", type=float, default=0, help="模擬伺服器的單程延遲")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="模擬伺服器的延遲抖動")
+    parser.add_argument("--low-jitter", action="store_true", help="倒數與開搶期間進入低抖動模式")
+    parser.add_argument(
+        "--raw-socket", action="store_true", help="把預先序列化好的請求直接寫入原始連線"
+    )
+    parser.add_argument(
+        "--log-mode",
+        choices=(LOG_MODE_OFF, LOG_MODE_DIRECT, LOG_MODE_QUEUE),
+        default=LOG_MODE_OFF,
+        help="開搶期間的 log 設定，direct 與 queue 會把 DEBUG 等級的 log 輸出到 stderr",
+    )
+    compare_group = parser.add_mutually_exclusive_group()
+    compare_group.add_argument(
+        "--compare-low-jitter",
+        action="store_true",
+        help="依序執行一般模式與低抖動模式，輸出兩者的統計結果",
+    )
+    compare_group.add_argument(
+        "--compare-logging",
+        action="store_true",
+        help="依序執行三種 log 設定，輸出各自的統計結果",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="輸出 JSON 的檔案，不指定則印在標準輸出")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format=LOG_FORMAT)
+    args = parse_args()
+    config = BenchmarkConfig(
+        iterations=args.iterations,
+        periods=args.periods,
+        lead_time=timedelta(milliseconds=args.lead_ms),
+        latency=timedelta(milliseconds=args.latency_ms),
+        jitter=timedelta(milliseconds=args.jitter_ms),
+        low_jitter=args.low_jitter,
+        raw_socket=args.raw_socket,
+        log_mode=args.log_mode,
+    )
+    if args.compare_low_jitter:
+        # 兩種模式各自使用自己的 event loop，低抖動模式才會用到 uvloop
+        result = {
+            name: run_event_loop(
+                run_benchmark(replace(config, low_jitter=low_jitter)), use_uvloop=low_jitter
+            )
+            for name, low_jitter in (("default", False), ("low_jitter", True))
+        }
+    elif args.compare_logging:
+        result = {
+            log_mode: run_event_loop(
+                run_benchmark(replace(config, log_mode=log_mode)), use_uvloop=config.low_jitter
+            )
+            for log_mode in (LOG_MODE_OFF, LOG_MODE_DIRECT, LOG_MODE_QUEUE)
+        }
+    else:
+        result = run_event_loop(run_benchmark(config), use_uvloop=config.low_jitter)
+    report = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(report)
+    else:
+        print(report)
@@ -0,0 +1,189 @@
+"""比較預設與精簡 Chrome 設定的瀏覽器登入時間與記憶體用量
+
+執行方式(在 badminton_bot 目錄下)：
+    python -m devtools.chrome_login_benchmark --iterations 5 --output chrome.json
+
+不指定 --base-url 時會對本機模擬伺服器登入；指定正式網站時需要一併指定 --username 與 --password。
+記憶體用量是 chromedriver 底下所有 Chrome 行程的 RSS 總和，只支援 Linux。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import time
+from contextlib import AsyncExitStack
+from functools import partial
+from pathlib import Path
+
+from selenium.webdriver.remote.webdriver import WebDriver
+from services.sports_center_webservice import LOGIN_BACKEND_SELENIUM
+from services.zhongshan_sports_center_webservice import ZhongshanSportsCenterWebService
+from utils.driver_pool import (
+    DEFAULT_PROFILE_DIR,
+    ChromeDriverPool,
+    block_heavy_resources,
+    default_chrome_options,
+    lean_chrome_options,
+)
+
+from .benchmark import git_commit, summarize
+from .mock_sports_center import MockServerConfig, MockSportsCenterServer
+
+MOCK_USERNAME = "A123456789"
+MOCK_PASSWORD = "password"
+
+
+def chrome_rss_bytes(driver: WebDriver) -> int | None:
+    """計算 chromedriver 底下所有行程的 RSS 總和
+
+    Args:
+        driver (WebDriver): 要量測的 Chrome
+
+    Returns:
+        int | None: RSS 位元組數，無法讀取 /proc 時回傳 None
+    """
+    root_pid = driver.service.process.pid
+    try:
+        parents = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                with open(f"/proc/{entry}/stat") as f:
+                    # comm 可能含有空白，從最後一個右括號之後開始解析
+                    fields = f.read().rsplit(")", 1)[1].split()
+                parents[int(entry)] = int(fields[1])
+    except OSError:
+        return None
+
+    descendants = {root_pid}
+    changed = True
+    while changed:
+        children = {pid for pid, ppid in parents.items() if ppid in descendants}
+        changed = not children <= descendants
+        descendants |= children
+
+    total_kb = 0
+    for pid in descendants:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb * 1024
+
+
+async def measure_profile(
+    name: str,
+    pool: ChromeDriverPool,
+    base_url: str,
+    username: str,
+    password: str,
+    iterations: int,
+) -> dict:
+    """用同一個 Chrome 重複登入並記錄每次的登入時間與登入後的記憶體用量"""
+    login_ns = []
+    rss_bytes = []
+    for _ in range(iterations):
+        service = ZhongshanSportsCenterWebService(
+            username=username,
+            password=password,
+            login_backend=LOGIN_BACKEND_SELENIUM,
+            base_url=base_url,
+            driver_pool=pool,
+        )
+        start = time.perf_counter_ns()
+        await service.browser_login()
+        login_ns.append(time.perf_counter_ns() - start)
+        if not service.login_status:
+            logging.error("%s 設定登入失敗", name)
+            break
+
+        rss = await pool.run(chrome_rss_bytes)
+        if rss is not None:
+            rss_bytes.append(rss)
+        await service.http_logout()
+
+    stats = pool.stats()
+    return {
+        "chrome_startup_s": stats[0].startup_seconds if stats else None,
+        "login_wall": summarize(login_ns),
+        "chrome_rss_mb": {
+            "max": max(rss_bytes) / 2**20 if rss_bytes else None,
+            "last": rss_bytes[-1] / 2**20 if rss_bytes else None,
+        },
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    profiles = {
+        "default": ChromeDriverPool(
+            max_drivers=1, options_factory=default_chrome_options, driver_setup=None
+        ),
+        "lean": ChromeDriverPool(
+            max_drivers=1,
+            options_factory=partial(lean_chrome_options, profile_dir=args.profile_dir),
+            driver_setup=block_heavy_resources,
+        ),
+    }
+
+    async with AsyncExitStack() as stack:
+        base_url, username, password = args.base_url, args.username, args.password
+        if base_url is None:
+            server = await stack.enter_async_context(
+                MockSportsCenterServer(
+                    config=MockServerConfig(port=0, accounts={MOCK_USERNAME: MOCK_PASSWORD})
+                )
+            )
+            base_url, username, password = server.base_url, MOCK_USERNAME, MOCK_PASSWORD
+
+        metrics = {}
+        for name, pool in profiles.items():
+            stack.push_async_callback(pool.close)
+            metrics[name] = await measure_profile(
+                name=name,
+                pool=pool,
+                base_url=base_url,
+                username=username,
+                password=password,
+                iterations=args.iterations,
+            )
+
+    return {
+        "config": {"iterations": args.iterations, "base_url": base_url},
+        "environment": {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "metrics": metrics,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="比較預設與精簡 Chrome 設定的登入時間與記憶體用量")
+    parser.add_argument("--iterations", type=int, default=5, help="每種設定重複登入幾次")
+    parser.add_argument("--base-url", default=None, help="登入的網站，不指定則使用本機模擬伺服器")
+    parser.add_argument("--username", default=None)
+    parser.add_argument("--password", default=None)
+    parser.add_argument(
+        "--profile-dir", type=Path, default=DEFAULT_PROFILE_DIR, help="精簡設定在這個目錄下建立每個 Chrome 的使用者資料目錄"
+    )
+    parser.add_argument("--output", type=Path, default=None, help="輸出 JSON 的檔案，不指定則印在標準輸出")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    args = parse_args()
+    if args.base_url is not None and (args.username is None or args.password is None):
+        raise SystemExit("指定 --base-url 時需要一併指定 --username 與 --password")
+
+    report = json.dumps(asyncio.run(run_benchmark(args)), ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(report)
+    else:
+        print(report)
@@ -0,0 +1,404 @@
+"""模擬運動中心網站的本機伺服器，用來在沒有網路的環境下測試登入與搶場地流程
+
+執行方式(在 badminton_bot 目錄下)：
+    python -m devtools.mock_sports_center --port 8080 --opening-in 30 --latency-ms 20
+
+再把 SportsCenterWebService 的 base_url 指向 http://127.0.0.1:8080 即可。
+"""
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import logging
+import random
+import secrets
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from email.utils import formatdate
+
+from aiohttp import web
+
+SESSION_COOKIE_NAME = "ASP.NET_SessionId"
+
+
+@dataclass
+class MockServerConfig:
+    """模擬伺服器的設定
+
+    Attributes:
+        host (str): 監聽的位址
+        port (int): 監聽的埠號，0 表示自動選擇
+        accounts (dict[str, str]): 允許登入的帳號與密碼，空的話任何帳密都可以登入
+        latency (timedelta): 單程網路延遲
+        jitter (timedelta): 延遲的隨機抖動範圍(正負)
+        opening_time (datetime | None): 伺服器時間的開放預約時間，None 表示一啟動就開放
+        capacity_per_slot (int): 每個場地時段可以被預約的次數
+        max_concurrency (int): 同時處理的請求數超過這個值就視為過載
+        overload_error_rate (float): 過載時直接回應 503 的機率，其餘的請求會卡住到逾時
+        overload_timeout (timedelta): 過載時卡住的請求要等多久才回應 503
+        clock_offset (timedelta): 伺服器時鐘比真實時間快多少
+        competitor_delays (tuple[timedelta, ...]): 模擬的競爭者在開放後多久搶下每個時段
+        seed (int | None): 亂數種子，用來重現相同的延遲與過載行為
+        courts (tuple[str, ...]): 時刻表上列出的場地編號
+        opening_hours (range): 時刻表上列出的小時
+        blocked_slots (tuple[tuple[str, str, int], ...]): 一開始就已被預約的 (場地編號, 日期, 小時)，
+            日期格式和網址的 D 參數相同，例如 2024/05/02
+    """
+
+    host: str = "127.0.0.1"
+    port: int = 8080
+    accounts: dict[str, str] = field(default_factory=dict)
+    latency: timedelta = timedelta()
+    jitter: timedelta = timedelta()
+    opening_time: datetime | None = None
+    capacity_per_slot: int = 1
+    max_concurrency: int = 100
+    overload_error_rate: float = 0.5
+    overload_timeout: timedelta = timedelta(seconds=30)
+    clock_offset: timedelta = timedelta()
+    competitor_delays: tuple[timedelta, ...] = ()
+    seed: int | None = None
+    courts: tuple[str, ...] = ("84",)
+    opening_hours: range = range(6, 22)
+    blocked_slots: tuple[tuple[str, str, int], ...] = ()
+
+
+@dataclass(frozen=True)
+class BookingRecord:
+    """伺服器收到的一次搶場地請求
+
+    Attributes:
+        arrived_at (datetime): 請求抵達時的伺服器時間
+        username (str | None): 發出請求的帳號，未登入則為 None
+        qpid (str): 場地編號
+        date (str): 預約日期
+        hour (int): 預約的小時
+        is_success (bool): 是否預約成功
+    """
+
+    arrived_at: datetime
+    username: str | None
+    qpid: str
+    date: str
+    hour: int
+    is_success: bool
+
+
+class MockSportsCenterServer:
+    """模擬運動中心網站的登入頁、登出與 net_booking 搶場地流程
+
+    任何 *.aspx 頁面都會被處理，所以兩個運動中心的網址格式都可以指向同一個伺服器。
+    """
+
+    def __init__(self, config: MockServerConfig = MockServerConfig()) -> None:
+        self.config = config
+        self.bookings: list[BookingRecord] = []
+        self._sessions: dict[str, str] = {}
+        self._won_counts: dict[tuple[str, str, int], int] = {
+            slot: config.capacity_per_slot for slot in config.blocked_slots
+        }
+        self._in_flight = 0
+        self._random = random.Random(config.seed)
+        self._runner: web.AppRunner | None = None
+        self._site: web.TCPSite | None = None
+
+        self.app = web.Application()
+        self.app.router.add_route("*", "/{page}.aspx", self._handle)
+
+    @property
+    def base_url(self) -> str:
+        """給 SportsCenterWebService 使用的 base_url"""
+        port = self._site._server.sockets[0].getsockname()[1] if self._site else self.config.port
+        return f"http://{self.config.host}:{port}"
+
+    def server_now(self) -> datetime:
+        """目前的伺服器時間"""
+        return datetime.now() + self.config.clock_offset
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        self._site = web.TCPSite(self._runner, host=self.config.host, port=self.config.port)
+        await self._site.start()
+        logging.info("模擬伺服器啟動於 %s", self.base_url)
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+            self._site = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self._in_flight += 1
+        try:
+            await self._simulate_latency()
+            if self._in_flight > self.config.max_concurrency:
+                return await self._overloaded_response()
+
+            response = await self._dispatch(request=request)
+            await self._simulate_latency()
+            response.headers["Date"] = formatdate(
+                time.time() + self.config.clock_offset.total_seconds(), usegmt=True
+            )
+            return response
+        finally:
+            self._in_flight -= 1
+
+    async def _dispatch(self, request: web.Request) -> web.StreamResponse:
+        module = request.query.get("module")
+        page = request.match_info["page"]
+
+        if module == "login_page":
+            if request.method == "POST":
+                return await self._login(request=request, page=page)
+            return self._login_page(request=request, page=page)
+        elif module == "logout":
+            self._sessions.pop(request.cookies.get(SESSION_COOKIE_NAME, ""), None)
+            return _redirect(f"./{page}.aspx?module=login_page&files=login")
+        elif module == "net_booking":
+            if request.query.get("StepFlag") == "25":
+                return self._booking(request=request, page=page)
+            if request.query.get("StepFlag") == "2":
+                return self._schedule_page(request=request, page=page)
+            return self._booking_result_page(request=request)
+
+        return web.Response(status=404, text="Not Found")
+
+    def _login_page(
+        self,
+        request: web.Request,
+        page: str,
+        error_message: str = "",
+        session_id: str | None = None,
+    ) -> web.Response:
+        session_id = session_id or request.cookies.get(SESSION_COOKIE_NAME, "")
+        username = self._sessions.get(session_id)
+        if username:
+            member_block = (
+                f'<span id="lab_Name">{username}</span>'
+                f'<a href="./{page}.aspx?module=logout"><span>[登出]</span></a>'
+            )
+        else:
+            member_block = '<span id="member_login">會員註冊/登入</span>'
+
+        token = secrets.token_urlsafe(16)
+        html = f"""<html><head><script>
+alert("模擬伺服器公告一");
+alert("模擬伺服器公告二");
+function DoSubmit() {{ document.getElementById("form1").submit(); }}
+</script></head><body>
+{member_block}
+<form method="post" action="./{page}.aspx?module=login_page&amp;files=login" id="form1">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{token}" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{token}" />
+<div class="swal2-actions"></div>
+<input name="ctl00$ContentPlaceHolder1$loginid" type="text" id="ContentPlaceHolder1_loginid" />
+<input name="loginpw" type="password" id="loginpw" />
+<span id="showerror3">{error_message}</span>
+</form></body></html>"""
+        return web.Response(text=html, content_type="text/html")
+
+    async def _login(self, request: web.Request, page: str) -> web.Response:
+        form = await request.post()
+        username = form.get("ctl00$ContentPlaceHolder1$loginid", "")
+        password = form.get("loginpw", "")
+
+        # ASP.NET 會拒絕沒有帶回隱藏欄位的表單
+        if not form.get("__VIEWSTATE") or not form.get("__EVENTVALIDATION"):
+            return self._login_page(
+                request=request, page=page, error_message="頁面已過期，請重新登入"
+            )
+
+        accounts = self.config.accounts
+        if not username or (accounts and accounts.get(username) != password):
+            return self._login_page(
+                request=request, page=page, error_message="帳號或密碼錯誤"
+            )
+
+        session_id = secrets.token_hex(12)
+        self._sessions[session_id] = username
+        response = self._login_page(request=request, page=page, session_id=session_id)
+        response.set_cookie(SESSION_COOKIE_NAME, session_id, httponly=True)
+        return response
+
+    def _booking(self, request: web.Request, page: str) -> web.Response:
+        arrived_at = self.server_now()
+        username = self._sessions.get(request.cookies.get(SESSION_COOKIE_NAME, ""))
+        if username is None:
+            return _redirect(f"./{page}.aspx?module=login_page&files=login")
+
+        slot = (
+            request.query.get("QPid", ""),
+            request.query.get("D", ""),
+            int(request.query.get("QTime", "0")),
+        )
+        is_success = self._try_book(slot=slot, arrived_at=arrived_at)
+        self.bookings.append(
+            BookingRecord(
+                arrived_at=arrived_at,
+                username=username,
+                qpid=slot[0],
+                date=slot[1],
+                hour=slot[2],
+                is_success=is_success,
+            )
+        )
+
+        result = 1 if is_success else 2
+        return _redirect(
+            f"./{page}.aspx?module=net_booking&files=booking_place&PT=1&X={result}"
+        )
+
+    def _try_book(self, slot: tuple[str, str, int], arrived_at: datetime) -> bool:
+        opening_time = self.config.opening_time
+        if opening_time is not None and arrived_at < opening_time:
+            return False
+
+        # 比這個請求早抵達的競爭者會先搶走名額
+        won = self._won_counts.get(slot, 0)
+        if won + self._competitors_before(arrived_at) >= self.config.capacity_per_slot:
+            return False
+
+        self._won_counts[slot] = won + 1
+        return True
+
+    def _competitors_before(self, moment: datetime) -> int:
+        """在 moment 之前已經搶下每個時段的競爭者人數"""
+        opening_time = self.config.opening_time
+        if opening_time is None:
+            return 0
+        competitor_times = sorted(opening_time + d for d in self.config.competitor_delays)
+        return bisect.bisect_right(competitor_times, moment)
+
+    def _schedule_page(self, request: web.Request, page: str) -> web.Response:
+        if self._sessions.get(request.cookies.get(SESSION_COOKIE_NAME, "")) is None:
+            return _redirect(f"./{page}.aspx?module=login_page&files=login")
+
+        day = request.query.get("D", "")
+        # 競爭者搶下的名額不會記在 _won_counts 中，要一起算進去
+        competitors = self._competitors_before(self.server_now())
+        rows = []
+        for hour in self.config.opening_hours:
+            cells = []
+            for court in self.config.courts:
+                booked = self._won_counts.get((court, day, hour), 0) + competitors
+                if booked < self.config.capacity_per_slot:
+                    cells.append(
+                        f'<td><img src="img/sche01.png" onclick="Step3Action({court},{hour})" /></td>'
+                    )
+                else:
+                    cells.append('<td><img src="img/sche02.png" title="已被預約" /></td>')
+            rows.append(f"<tr><td>{hour:02d}:00</td>{''.join(cells)}</tr>")
+        html = f"<html><body><table>{''.join(rows)}</table></body></html>"
+
+        # 時刻表沒變時回應 304，讓客戶端可以用條件式請求略過沒有變動的頁面
+        etag = f'"{hashlib.sha1(html.encode()).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=html, content_type="text/html", headers={"ETag": etag})
+
+    def _booking_result_page(self, request: web.Request) -> web.Response:
+        # 搶場地的結果藏在頁面中的網址參數裡，和真實網站一樣不做 html escape
+        html = f'<html><head><script>var pageUrl = "{request.path_qs}";</script></head><body></body></html>'
+        return web.Response(text=html, content_type="text/html")
+
+    async def _simulate_latency(self) -> None:
+        latency = self.config.latency.total_seconds()
+        jitter = self.config.jitter.total_seconds()
+        delay = max(0.0, latency + self._random.uniform(-jitter, jitter))
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def _overloaded_response(self) -> web.Response:
+        if self._random.random() >= self.config.overload_error_rate:
+            await asyncio.sleep(self.config.overload_timeout.total_seconds())
+        return web.Response(status=503, text="Service Unavailable")
+
+
+def _redirect(location: str) -> web.Response:
+    return web.Response(status=302, headers={"Location": location})
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="模擬運動中心網站的本機伺服器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0, help="單程網路延遲")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="延遲的隨機抖動範圍")
+    parser.add_argument(
+        "--opening-in", type=float, default=None, help="啟動後幾秒開放預約，不指定則一啟動就開放"
+    )
+    parser.add_argument("--capacity", type=int, default=1, help="每個場地時段可以被預約的次數")
+    parser.add_argument("--max-concurrency", type=int, default=100)
+    parser.add_argument("--clock-offset-ms", type=float, default=0, help="伺服器時鐘比真實時間快多少")
+    parser.add_argument(
+        "--competitor-delays-ms",
+        default="",
+        help="競爭者在開放後多久搶下時段，用 , 分隔，例：5,12,40",
+    )
+    parser.add_argument("--account", action="append", default=[], help="允許登入的帳密，格式為 帳號:密碼")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--courts", default="84", help="時刻表上列出的場地編號，用 , 分隔")
+    parser.add_argument(
+        "--blocked",
+        action="append",
+        default=[],
+        help="一開始就已被預約的時段，格式為 場地編號@日期@小時，例：84@2024/05/02@20",
+    )
+    return parser.parse_args()
+
+
+async def serve(config: MockServerConfig) -> None:
+    """啟動模擬伺服器直到被中斷"""
+    async with MockSportsCenterServer(config=config) as server:
+        if config.opening_time:
+            logging.info("開放預約時間(伺服器時間)：%s", config.opening_time)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            logging.info("共收到 %d 個搶場地請求", len(server.bookings))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    args = parse_args()
+    clock_offset = timedelta(milliseconds=args.clock_offset_ms)
+    config = MockServerConfig(
+        host=args.host,
+        port=args.port,
+        accounts=dict(account.split(":", 1) for account in args.account),
+        latency=timedelta(milliseconds=args.latency_ms),
+        jitter=timedelta(milliseconds=args.jitter_ms),
+        opening_time=(
+            datetime.now() + clock_offset + timedelta(seconds=args.opening_in)
+            if args.opening_in is not None
+            else None
+        ),
+        capacity_per_slot=args.capacity,
+        max_concurrency=args.max_concurrency,
+        clock_offset=clock_offset,
+        competitor_delays=tuple(
+            timedelta(milliseconds=float(delay))
+            for delay in args.competitor_delays_ms.split(",")
+            if delay
+        ),
+        seed=args.seed,
+        courts=tuple(court for court in args.courts.split(",") if court),
+        blocked_slots=tuple(
+            (court, day, int(hour))
+            for court, day, hour in (blocked.split("@") for blocked in args.blocked)
+        ),
+    )
+    try:
+        asyncio.run(serve(config=config))
+    except KeyboardInterrupt:
+        pass
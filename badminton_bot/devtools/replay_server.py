@@ -0,0 +1,244 @@
+"""重播 utils.exchange_recorder 記錄的 HAR 檔，離線重跑登入、掃描時刻表與搶場地流程
+
+執行方式(在 badminton_bot 目錄下)：
+    python -m devtools.replay_server recordings/exchanges-20250412-000000.har --port 8080
+    python -m devtools.replay_server recordings/exchanges-20250412-000000.har --latency-scale 1
+
+再把 SportsCenterWebService 的 base_url 指向 http://127.0.0.1:8080 即可。同一個請求
+(method 與網址相同)依記錄的順序回應，用完後重複最後一個回應，所以開搶前後
+先 X=2 後 X=1 的順序也會照原樣重現。--latency-scale 0 時全速回應，1 時依記錄的
+等待時間延遲回應。
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+# 這些 header 由重播伺服器重新產生，記錄到的內容已經解壓縮，長度也可能因遮蔽而改變
+_DROPPED_RESPONSE_HEADERS = {
+    "content-encoding",
+    "content-length",
+    "transfer-encoding",
+    "connection",
+    "keep-alive",
+    "date",
+}
+
+
+@dataclass
+class ReplayServerConfig:
+    """重播伺服器的設定
+
+    Attributes:
+        archive_path (Path): HAR 檔路徑
+        host (str): 監聽的位址
+        port (int): 監聽的埠號，0 表示自動選擇
+        latency_scale (float): 依記錄的等待時間延遲回應的比例，0 表示全速回應
+    """
+
+    archive_path: Path
+    host: str = "127.0.0.1"
+    port: int = 8080
+    latency_scale: float = 0.0
+
+
+@dataclass(frozen=True)
+class ReplayEntry:
+    """HAR 中的一個回應
+
+    Attributes:
+        status (int): HTTP 狀態碼
+        reason (str): 狀態碼說明
+        headers (tuple[tuple[str, str], ...]): 回應的 header
+        body (bytes): 回應內容
+        wait_seconds (float): 記錄時從送出請求到收到回應的秒數
+    """
+
+    status: int
+    reason: str
+    headers: tuple[tuple[str, str], ...]
+    body: bytes
+    wait_seconds: float
+
+
+class ReplayServer:
+    """依 HAR 檔的內容回應請求的本機伺服器"""
+
+    def __init__(self, config: ReplayServerConfig) -> None:
+        self.config = config
+        self.unmatched: list[str] = []
+        self.entry_count = 0
+        self._entries: dict[tuple[str, ...], deque[ReplayEntry]] = {}
+        self._origins: set[str] = set()
+        self._runner: web.AppRunner | None = None
+        self._site: web.TCPSite | None = None
+        self._load(har=json.loads(config.archive_path.read_text()))
+
+        self.app = web.Application()
+        self.app.router.add_route("*", "/{path:.*}", self._handle)
+
+    @property
+    def base_url(self) -> str:
+        """給 SportsCenterWebService 使用的 base_url"""
+        port = self._site._server.sockets[0].getsockname()[1] if self._site else self.config.port
+        return f"http://{self.config.host}:{port}"
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        self._site = web.TCPSite(self._runner, host=self.config.host, port=self.config.port)
+        await self._site.start()
+        logging.info("重播伺服器啟動於 %s，共 %d 筆記錄", self.base_url, self.entry_count)
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+            self._site = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    def _load(self, har: dict[str, Any]) -> None:
+        for entry in har["log"]["entries"]:
+            request, response = entry["request"], entry["response"]
+            parts = urlsplit(request["url"])
+            self._origins.add(f"{parts.scheme}://{parts.netloc}")
+
+            content = response.get("content", {})
+            text = content.get("text", "")
+            body = (
+                base64.b64decode(text)
+                if content.get("encoding") == "base64"
+                else text.encode("utf-8")
+            )
+            replay_entry = ReplayEntry(
+                status=response["status"],
+                reason=response.get("statusText", ""),
+                headers=tuple((h["name"], h["value"]) for h in response["headers"]),
+                body=body,
+                wait_seconds=max(entry.get("timings", {}).get("wait", 0), 0) / 1000,
+            )
+            for key in _request_keys(method=request["method"], url=request["url"]):
+                self._entries.setdefault(key, deque()).append(replay_entry)
+            self.entry_count += 1
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        entry = self._next_entry(method=request.method, url=str(request.rel_url))
+        if entry is None:
+            self.unmatched.append(f"{request.method} {request.rel_url}")
+            logging.warning("記錄中沒有 %s %s 的回應", request.method, request.rel_url)
+            return web.Response(status=404)
+
+        if self.config.latency_scale > 0:
+            await asyncio.sleep(entry.wait_seconds * self.config.latency_scale)
+
+        response = web.Response(status=entry.status, reason=entry.reason or None)
+        for name, value in entry.headers:
+            if name.lower() not in _DROPPED_RESPONSE_HEADERS:
+                response.headers.add(name, self._rewrite_header(name=name, value=value))
+        # 伺服器時鐘以重播當下為準，校時不會算出和記錄時一樣的偏移
+        response.headers["Date"] = formatdate(time.time(), usegmt=True)
+        body = entry.body
+        if body and self._is_text(headers=entry.headers):
+            body = self._rewrite_origins(text=body.decode("utf-8")).encode("utf-8")
+        response.body = body
+        return response
+
+    def _next_entry(self, method: str, url: str) -> ReplayEntry | None:
+        # 先找 method 與完整網址都相同的記錄，找不到再忽略 query string
+        for key in _request_keys(method=method, url=url):
+            entries = self._entries.get(key)
+            if entries:
+                return entries.popleft() if len(entries) > 1 else entries[0]
+        return None
+
+    def _rewrite_header(self, name: str, value: str) -> str:
+        if name.lower() != "set-cookie":
+            return self._rewrite_origins(text=value)
+        # 重播伺服器是 http 且主機不同，拿掉 Domain 與 Secure 讓用戶端仍會保存 cookie
+        cookie, *attributes = (part.strip() for part in value.split(";"))
+        kept = [
+            attribute
+            for attribute in attributes
+            if attribute.lower() != "secure" and not attribute.lower().startswith("domain=")
+        ]
+        return "; ".join([cookie, *kept])
+
+    def _rewrite_origins(self, text: str) -> str:
+        for origin in self._origins:
+            text = text.replace(origin, self.base_url)
+        return text
+
+    def _is_text(self, headers: tuple[tuple[str, str], ...]) -> bool:
+        content_type = next(
+            (value for name, value in headers if name.lower() == "content-type"), ""
+        )
+        return content_type.startswith("text/") or "json" in content_type or "xml" in content_type
+
+
+def _request_keys(method: str, url: str) -> tuple[tuple[str, str], tuple[str, str, str]]:
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    target = f"{path}?{parts.query}" if parts.query else path
+    # 第二個 key 多一個元素，和完整網址的 key 不會重複
+    return (method, target), (method, path, "")
+
+
+def parse_args() -> argparse.Namespace:
+    """parse command line arguments
+
+    Returns:
+        argparse.Namespace: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="重播記錄下來的運動中心網站請求")
+    parser.add_argument("archive", type=Path, help="由 main.py --record 產生的 HAR 檔")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=0.0,
+        help="依記錄的等待時間延遲回應的比例，0 為全速回應，1 為記錄時的延遲",
+    )
+    return parser.parse_args()
+
+
+async def serve(config: ReplayServerConfig) -> None:
+    """啟動重播伺服器直到被中斷"""
+    async with ReplayServer(config=config) as server:
+        try:
+            await asyncio.Event().wait()
+        finally:
+            if server.unmatched:
+                logging.info("共 %d 個請求沒有對應的記錄", len(server.unmatched))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    args = parse_args()
+    config = ReplayServerConfig(
+        archive_path=args.archive,
+        host=args.host,
+        port=args.port,
+        latency_scale=args.latency_scale,
+    )
+    try:
+        asyncio.run(serve(config=config))
+    except KeyboardInterrupt:
+        pass
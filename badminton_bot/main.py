@@ -1,23 +1,58 @@
 """Main entry point to execute the program"""
 
+import sys
+
+from utils.startup_profiler import profiler
+
+# 必須在載入其他模組之前開始量測，才能算出每個模組的載入時間
+if __name__ == "__main__" and "--profile-startup" in sys.argv:
+    profiler.enable()
+
+import argparse
 import asyncio
+import atexit
 import logging
+import sqlite3
+from collections.abc import Coroutine
+from contextlib import AsyncExitStack, ExitStack
 from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 import aiohttp
-from services.sports_center_webservice import SportsCenterWebService
-from services.zhongshan_sports_center_webservice import ZhongshanSportsCenterWebService
-from services.zhongzheng_sports_center_webservice import (
-    ZhongzhengSportsCenterWebService,
+from services.account_assignment import BookingAccount, assign_booking_periods
+from services.availability_scanner import AvailabilityScanner, ScheduleIndex
+from services.configured_sports_center_webservice import create_webservice_classes
+from services.firing_engine import FiringEngine, FiringWindow, SlotResult
+from services.run_history import DEFAULT_RUN_HISTORY_PATH, FiringTuner, RunHistory
+from services.session_supervisor import SessionSupervisor, get_session_cookies
+from services.sports_center_webservice import (
+    LOGIN_BACKEND_HTTP,
+    SportsCenterWebService,
 )
+from utils.clock_sync import estimate_server_clock_offset
+from utils.connection_warmer import ConnectionWarmer
+from utils.deadline_scheduler import PRE_FIRING_TASK_MARGIN, DeadlineScheduler
+from utils.driver_pool import DEFAULT_MAX_DRIVERS, ChromeDriverPool
+from utils.exchange_recorder import recorder
 from utils.input_helper import (
     cast_court_no_to_int_and_check_is_valid,
     check_if_target_datetime_is_outdated,
     get_valid_input,
     parse_input_booking_periods_str,
+    parse_input_national_ids_str,
     transform_offset_milliseconds_param,
     transform_yes_no_input,
 )
+from utils.log_pipeline import LogPipeline
+from utils.low_jitter import enter_low_jitter_mode, run_event_loop
+from utils.raw_http import RawConnectionPool
+from utils.session_cache import SessionCache
+from utils.tracing import tracer
+
+# 工作行程只有 --workers 大於 1 時才用到，單一行程執行時不載入 multiprocessing
+if TYPE_CHECKING:
+    from services.multiprocess_firing import MultiProcessFiring
 
 BOOKING_WEEKDAY = 4  # 填上星期幾搶場地
 UPCOMING_BOOKING_DATE = (
@@ -26,15 +61,72 @@ UPCOMING_BOOKING_DATE = (
 ).replace(hour=0, minute=0, second=0, microsecond=0)  # 這次搶場地的時間
 FIRST_BOOKING_DATE = (UPCOMING_BOOKING_DATE + timedelta(days=14)).replace(hour=20)
 SECOND_BOOKING_DATE = (UPCOMING_BOOKING_DATE + timedelta(days=14)).replace(hour=21)
-WEBSERVICE_MAPPING = {
-    0: ZhongshanSportsCenterWebService,
-    1: ZhongzhengSportsCenterWebService,
-}
+# 每個時段在開搶前 30 毫秒到開搶後 200 毫秒之間最多連發 5 個請求，所有帳號的所有時段加起來最多 10 個請求
+FIRING_WINDOW = FiringWindow(
+    shots_per_slot=5,
+    window_start=timedelta(milliseconds=-30),
+    window_end=timedelta(milliseconds=200),
+    max_requests=10,
+)
+# 開搶前多久開始登入，倒數期間會定期確認登入狀態，過期時自動重新登入
+PRE_LOGIN_OFFSET = timedelta(minutes=-10)
+# 開搶前最後一次確認登入狀態的時間
+SESSION_CHECK_OFFSET = timedelta(seconds=-30)
+# 開搶前多久再掃描一次時刻表，只會重新抓有變動的頁面
+SCHEDULE_RESCAN_OFFSET = timedelta(seconds=-10)
+# 開搶前多久準備好所有請求，必須在最後一次確認登入狀態與掃描時刻表之後
+FIRING_PREPARE_OFFSET = timedelta(seconds=-5)
+# 多行程模式在開搶前多久啟動工作行程，必須留時間給工作行程啟動與預熱連線
+WORKER_START_OFFSET = timedelta(seconds=-8)
+# 運動中心清單來自 services/sports_centers.json，新增運動中心只需要修改設定檔
+WEBSERVICE_MAPPING = dict(enumerate(create_webservice_classes()))
+WEBSERVICE_BY_CENTER = {service.CENTER.key: service for service in WEBSERVICE_MAPPING.values()}
 
 
-async def main():
+async def main(args: argparse.Namespace):
     """搶球場主程式的進入點，倒數計時後搶球場"""
-    set_logger()
+    set_logger(json_log_path=args.log_json)
+
+    if args.trace:
+        tracer.enable()
+    if args.record:
+        recorder.enable()
+        if args.raw_socket or args.workers > 1:
+            logging.warning("直接寫入原始連線與工作行程送出的搶場地請求不會被記錄")
+    history = RunHistory(path=args.history)
+    try:
+        await book_courts(
+            low_jitter=args.low_jitter,
+            raw_socket=args.raw_socket,
+            workers=args.workers,
+            history=history,
+        )
+    finally:
+        history.close()
+        if args.trace:
+            trace_path = args.trace / f"trace-{datetime.now():%Y%m%d-%H%M%S}.json"
+            tracer.write(path=trace_path)
+            logging.info("各階段耗時已輸出至 %s", trace_path)
+        if args.record:
+            record_path = args.record / f"exchanges-{datetime.now():%Y%m%d-%H%M%S}.har"
+            recorder.write(path=record_path)
+            logging.info("%d 個 HTTP 請求已記錄至 %s", len(recorder.exchanges), record_path)
+
+
+async def book_courts(
+    low_jitter: bool = False,
+    raw_socket: bool = False,
+    workers: int = 1,
+    history: RunHistory | None = None,
+):
+    """輸入預約資訊，倒數計時後登入並搶球場
+
+    Args:
+        low_jitter (bool, optional): 開搶前後是否進入低抖動模式. Defaults to False.
+        raw_socket (bool, optional): 是否把預先序列化好的請求直接寫入原始連線. Defaults to False.
+        workers (int, optional): 分擔開搶請求的工作行程數，1 表示在主行程送出. Defaults to 1.
+        history (RunHistory | None, optional): 保存開搶結果的紀錄，有紀錄時會建議送出偏移與連發區間. Defaults to None.
+    """
 
     courts_list_message = ""
     for court_no, court_service in WEBSERVICE_MAPPING.items():
@@ -47,16 +139,29 @@ async def main():
         ),
         error_hint="請輸入正確的運動中心編號",
     )
-    national_id = get_valid_input(
-        prompt="請輸入你的身分證字號：", transform_func=lambda x: x
+    webservice = webservice_factory(court_no=input_court_no)
+    national_ids = get_valid_input(
+        prompt="請輸入你的身分證字號(多個帳號用 , 分隔，不要有空格)：",
+        transform_func=parse_input_national_ids_str,
+        error_hint="請輸入至少一個不重複的身分證字號",
+    )
+    accounts = tuple(
+        BookingAccount(
+            username=national_id,
+            password=get_valid_input(
+                prompt=f"請輸入 {national_id} 的密碼：", transform_func=lambda x: x
+            ),
+        )
+        for national_id in national_ids
     )
-    password = get_valid_input(prompt="請輸入密碼：", transform_func=lambda x: x)
     dev_mode = get_valid_input(
         prompt="是否要進入開發測試模式？ Y/N：",
         transform_func=transform_yes_no_input,
         error_hint="請輸入 Y/N 決定是否要進入開發測試模式",
     )
 
+    send_offset = timedelta()
+    window = FIRING_WINDOW
     if dev_mode:
         upcoming_booking_date = get_valid_input(
             prompt="\n指定開搶時間(輸入格式為 YYYY-mm-ddTHH:MM:SS.fff，例： 2025-04-12T15:00:00.000)\n：",
@@ -74,28 +179,61 @@ async def main():
             transform_func=parse_input_booking_periods_str,
             error_hint="輸入日期不正確，請重新輸入",
         )
+        base_url = get_valid_input(
+            prompt=(
+                "\n指定運動中心網站網址，例如本機的模擬伺服器 http://127.0.0.1:8080"
+                "(使用正式網站就不輸入)\n："
+            ),
+            transform_func=lambda x: x or None,
+        )
     else:
+        # 有足夠的開搶紀錄時，不輸入偏移就使用紀錄建議的送出偏移與連發區間
+        suggestion = (
+            FiringTuner(history=history, base_window=FIRING_WINDOW).suggest(
+                center=webservice.CENTER.key
+            )
+            if history is not None
+            else None
+        )
+        default_hint = (
+            f"不輸入則使用最近 {suggestion.run_count} 次開搶紀錄建議的 "
+            f"{suggestion.send_offset.total_seconds() * 1000:+.0f} 毫秒"
+            if suggestion
+            else "不想要偏移就不輸入"
+        )
         offset_milliseconds = get_valid_input(
             prompt=(
-                "請輸入想要偏移的毫秒數(輸入範圍為 -1000 ~ 1000，"
-                "想要提早就輸入負整數，延後就輸入正整數，不想要偏移就不輸入)："
+                "程式會自動依伺服器時鐘校時，"
+                "如需額外微調請輸入想要偏移的毫秒數(輸入範圍為 -1000 ~ 1000，"
+                f"想要提早就輸入負整數，延後就輸入正整數，{default_hint})："
             ),
-            transform_func=lambda x: transform_offset_milliseconds_param(
-                input_milliseconds_param=x
+            transform_func=lambda x: (
+                None
+                if x == "" and suggestion
+                else transform_offset_milliseconds_param(input_milliseconds_param=x)
             ),
             error_hint="輸入的偏移豪秒數不正確，請重新輸入",
         )
-        upcoming_booking_date = UPCOMING_BOOKING_DATE + timedelta(
-            milliseconds=offset_milliseconds
-        )
+        if offset_milliseconds is None:
+            send_offset, window = suggestion.send_offset, suggestion.window
+        else:
+            send_offset = timedelta(milliseconds=offset_milliseconds)
+        upcoming_booking_date = UPCOMING_BOOKING_DATE
         booking_periods = (FIRST_BOOKING_DATE, SECOND_BOOKING_DATE)
+        base_url = None
 
+    # 每個時段只分配給一個帳號，避免同一個程式中的帳號互相搶同一個時段
+    assignments = assign_booking_periods(accounts=accounts, booking_periods=booking_periods)
+    accounts_message = "".join(
+        f"身分證號碼：{account.username}\n"
+        f"密碼：{account.password}\n"
+        f"預計預約時段：{' & '.join(date.strftime('%Y-%m-%d %H:%M%:%S') for date in periods)}\n"
+        for account, periods in assignments.items()
+    )
     is_booking_info_confirmed = get_valid_input(
         prompt=(
-            f"\n身分證號碼：{national_id}\n"
-            f"密碼：{password}\n"
-            f"預定開搶時間：{upcoming_booking_date}\n"
-            f"預計預約時段：{' & '.join(date.strftime('%Y-%m-%d %H:%M%:%S') for date in booking_periods)}\n"
+            f"\n{accounts_message}"
+            f"預定開搶時間：{upcoming_booking_date + send_offset}\n"
             f"請確認以上搶球場資訊是否正確？ Y/N："
         ),
         transform_func=transform_yes_no_input,
@@ -108,70 +246,595 @@ async def main():
     else:
         logging.info("預約資訊已確認，繼續執行程式")
 
+    await run_booking(
+        webservice=webservice,
+        assignments=assignments,
+        server_booking_date=upcoming_booking_date,
+        base_url=base_url,
+        low_jitter=low_jitter,
+        raw_socket=raw_socket,
+        workers=workers,
+        send_offset=send_offset,
+        window=window,
+        history=history,
+    )
+
+
+async def run_booking(
+    webservice: type[SportsCenterWebService],
+    assignments: dict[BookingAccount, tuple[datetime, ...]],
+    server_booking_date: datetime,
+    base_url: str | None = None,
+    low_jitter: bool = False,
+    raw_socket: bool = False,
+    workers: int = 1,
+    send_offset: timedelta = timedelta(),
+    window: FiringWindow = FIRING_WINDOW,
+    history: RunHistory | None = None,
+) -> dict[str, list[SlotResult]]:
+    """倒數計時後讓所有帳號同時登入、預熱連線並在開搶時間搶各自分配到的時段
+
+    所有帳號共用同一個排程器與預熱好的連線池，但各自有獨立的 cookie jar 與 ClientSession。
+
+    Args:
+        webservice (type[SportsCenterWebService]): 要預約的運動中心服務類別
+        assignments (dict[BookingAccount, tuple[datetime, ...]]): 每個帳號分配到的時段
+        server_booking_date (datetime): 伺服器時間的開搶時間
+        base_url (str | None, optional): 運動中心網站網址，不指定則使用正式網站. Defaults to None.
+        low_jitter (bool, optional): 開搶前一秒到連發結束之間是否進入低抖動模式. Defaults to False.
+        raw_socket (bool, optional): 是否另外預熱原始連線，開搶時直接把預先序列化好的請求寫入連線，
+            其他請求仍使用 aiohttp. Defaults to False.
+        workers (int, optional): 大於 1 時把開搶的請求分散到多個工作行程，每個工作行程
+            各自預熱連線並從共享記憶體讀取開搶時間. Defaults to 1.
+        send_offset (timedelta, optional): 相對伺服器開搶時間的送出偏移. Defaults to timedelta().
+        window (FiringWindow, optional): 連發設定. Defaults to FIRING_WINDOW.
+        history (RunHistory | None, optional): 開搶後把每個請求的結果寫入這個紀錄. Defaults to None.
+
+    Returns:
+        dict[str, list[SlotResult]]: 以帳號為索引的每個預約時段結果，登入失敗的帳號為空串列
+    """
     # 時間倒數至開始搶票前的指定時間，再開始登入動作，避免登入太久導致 session 過期
-    count_down(booking_date=upcoming_booking_date, offset=timedelta(minutes=-3))
+    target_booking_date = server_booking_date + send_offset
+    scheduler = DeadlineScheduler(booking_date=target_booking_date)
+    await count_down(scheduler=scheduler, offset=PRE_LOGIN_OFFSET)
 
-    webservice = webservice_factory(court_no=input_court_no)
-    with webservice(username=national_id, password=password) as service:
-        if service.login_status:
-            cookies = service.get_cookies()
-            async with aiohttp.ClientSession(cookies=cookies) as session:
-                # 時間倒數至開始搶票的時間
-                count_down(booking_date=upcoming_booking_date)
-
-                # 非同步發送兩個請求
-                tasks = [
-                    service.booking_courts(
-                        session=session,
-                        year=booking_date.year,
-                        month=booking_date.month,
-                        day=booking_date.day,
-                        hour=booking_date.hour,
+    # 預設不開瀏覽器直接用 HTTP 登入，失敗時才向瀏覽器池借用 Chrome 登入，多個帳號可以同時登入
+    driver_pool = ChromeDriverPool(max_drivers=min(len(assignments), DEFAULT_MAX_DRIVERS))
+    services = {
+        account.username: webservice(
+            username=account.username,
+            password=account.password,
+            login_backend=LOGIN_BACKEND_HTTP,
+            base_url=base_url,
+            driver_pool=driver_pool,
+        )
+        for account in assignments
+    }
+    periods_by_username = {
+        account.username: periods for account, periods in assignments.items()
+    }
+    results = {username: [] for username in services}
+
+    # 登入前先估計伺服器時鐘，讓請求剛好在伺服器的開搶時間抵達
+    login_page_url = next(iter(services.values())).login_page_url
+    scheduler.booking_date = await sync_server_clock(
+        url=login_page_url, server_booking_date=target_booking_date
+    )
+
+    session_cache = SessionCache()
+    # 低抖動模式只持續到連發結束，不跟著登入與連線一起等到最後才還原
+    low_jitter_stack = ExitStack()
+    async with AsyncExitStack() as stack:
+        stack.callback(low_jitter_stack.close)
+        stack.push_async_callback(close_driver_pool, driver_pool=driver_pool)
+        # 所有帳號同時登入，單一帳號登入出錯只會讓該帳號視為登入失敗
+        login_results = await asyncio.gather(
+            *(
+                login_with_session_cache(
+                    service=service,
+                    session_cache=session_cache,
+                    username=username,
+                    stack=stack,
+                )
+                for username, service in services.items()
+            )
+        )
+        services = {
+            username: service
+            for (username, service), is_logged_in in zip(services.items(), login_results)
+            if is_logged_in
+        }
+        for username in results.keys() - services.keys():
+            logging.error("%s 登入失敗！", username)
+        if not services:
+            return results
+
+        # 每個預計送出的請求各預熱一條連線，所有帳號共用同一個連線池
+        pool_size = connection_pool_size(
+            window=window,
+            periods_by_username={username: periods_by_username[username] for username in services},
+            courts_per_slot=len(next(iter(services.values())).courts),
+        )
+        # 多行程模式由工作行程各自預熱送出請求的連線，主行程只需要掃描時刻表與取消場地用的連線
+        warmer = ConnectionWarmer(url=login_page_url, pool_size=pool_size if workers == 1 else 1)
+        connector = warmer.create_connector()
+        stack.push_async_callback(connector.close)
+        with tracer.span("create_session"):
+            sessions = {
+                username: await stack.enter_async_context(
+                    warmer.create_session(
+                        cookies=service.get_cookies(),
+                        trace_configs=[
+                            *([tracer.request_trace_config()] if tracer.enabled else []),
+                            *recorder.trace_configs(),
+                        ],
+                        connector=connector,
                     )
-                    for booking_date in booking_periods
-                ]
-                await asyncio.gather(*tasks)
+                )
+                for username, service in services.items()
+            }
+        # 預熱、掃描時刻表與維持連線只需要用其中一個帳號的 session
+        first_username = next(iter(services))
+        first_service, first_session = services[first_username], sessions[first_username]
+        with tracer.span("warm_up"):
+            await warmer.warm_up(session=first_session)
+        raw_pool = None
+        if raw_socket and workers == 1:
+            raw_pool = RawConnectionPool(url=login_page_url, pool_size=pool_size)
+            stack.push_async_callback(raw_pool.close)
+            with tracer.span("raw_warm_up"):
+                await raw_pool.warm_up()
+
+        # 趁連線預熱好時掃描時刻表，開搶時只對還有機會搶到的場地送出請求
+        all_periods = tuple(
+            period for username in services for period in periods_by_username[username]
+        )
+        scanner = AvailabilityScanner(service=first_service)
+        with tracer.span("availability_scan"):
+            await scanner.scan(session=first_session, booking_dates=all_periods)
+
+        # 每個帳號在連發區間內各自對分配到的時段分批送出請求，所有帳號共用 window.max_requests
+        windows = window.split(
+            target_counts={
+                username: len(periods_by_username[username]) * len(service.courts)
+                for username, service in services.items()
+            }
+        )
+        engines = {
+            username: FiringEngine(
+                service=service,
+                session=sessions[username],
+                scheduler=scheduler,
+                window=windows[username],
+                schedule_index=scanner.index,
+                raw_pool=raw_pool,
+            )
+            for username, service in services.items()
+        }
+
+        # 倒數期間定期確認每個帳號的登入狀態，開搶前再重新掃描一次時刻表
+        supervisors = [
+            SessionSupervisor(
+                service=service,
+                session=sessions[username],
+                username=username,
+                session_cache=session_cache,
+            )
+            for username, service in services.items()
+        ]
+        pre_firing_checks = [
+            *(
+                supervisor.run(scheduler=scheduler, stop_offset=SESSION_CHECK_OFFSET)
+                for supervisor in supervisors
+            ),
+            rescan_schedule_before_firing(
+                scanner=scanner,
+                session=first_session,
+                scheduler=scheduler,
+                booking_periods=all_periods,
+            ),
+        ]
+        if workers > 1:
+            from services.multiprocess_firing import MultiProcessFiring
+
+            # 最後一次確認後才啟動工作行程，讓工作行程拿到最新的 cookies 與時刻表
+            await count_down_with_tasks(
+                scheduler=scheduler, offset=WORKER_START_OFFSET, tasks=pre_firing_checks
+            )
+            results.update(
+                await fire_in_worker_processes(
+                    firing=MultiProcessFiring(
+                        center_key=webservice.CENTER.key,
+                        window=window,
+                        worker_count=workers,
+                        base_url=base_url,
+                        raw_socket=raw_socket,
+                        low_jitter=low_jitter,
+                    ),
+                    engines=engines,
+                    periods_by_username=periods_by_username,
+                    scheduler=scheduler,
+                    server_booking_date=target_booking_date,
+                    pool_size=pool_size,
+                    schedule_index=scanner.index,
+                )
+            )
         else:
-            logging.error("登入失敗！")
+            # 時間倒數至第一發請求的時間，倒數期間持續維持連線，開搶只取決於倒數
+            await count_down_with_tasks(
+                scheduler=scheduler,
+                offset=window.window_start,
+                tasks=[
+                    warmer.keep_alive(session=first_session, scheduler=scheduler),
+                    *([raw_pool.keep_alive(scheduler=scheduler)] if raw_pool else []),
+                    *pre_firing_checks,
+                    prepare_before_firing(
+                        engines=engines,
+                        scheduler=scheduler,
+                        periods_by_username=periods_by_username,
+                    ),
+                    *(
+                        [enter_low_jitter_mode(scheduler=scheduler, stack=low_jitter_stack)]
+                        if low_jitter
+                        else []
+                    ),
+                ],
+            )
 
+            fired = await asyncio.gather(
+                *(
+                    engine.fire(booking_periods=periods_by_username[username])
+                    for username, engine in engines.items()
+                )
+            )
+            low_jitter_stack.close()
+            results.update(zip(engines, fired))
+
+    for username, slot_results in results.items():
+        logging.info(
+            "%s 搶到 %d/%d 個時段",
+            username,
+            sum(result.is_success for result in slot_results),
+            len(periods_by_username[username]),
+        )
+    log_firing_overshoot(results=results, low_jitter=low_jitter)
+    if history is not None:
+        record_run_history(
+            history=history,
+            center=webservice.CENTER.key,
+            server_booking_date=server_booking_date,
+            clock_offset=scheduler.booking_date - target_booking_date,
+            send_offset=send_offset,
+            window=window,
+            results=results,
+        )
+    return results
 
-def set_logger(debug_mode: bool = False) -> None:
-    """set logging settings
+
+def connection_pool_size(
+    window: FiringWindow,
+    periods_by_username: dict[str, tuple[datetime, ...]],
+    courts_per_slot: int,
+) -> int:
+    """Count the booking requests of every account, one warmed up connection is
+    kept for each of them. The accounts share the request budget of the window.
+
+    Args:
+        window (FiringWindow): the firing window
+        periods_by_username (dict[str, tuple[datetime, ...]]): the periods assigned to each account
+        courts_per_slot (int): the number of courts requested for each period
+
+    Returns:
+        int: the number of connections to warm up
+    """
+    target_counts = {
+        username: len(periods) * courts_per_slot
+        for username, periods in periods_by_username.items()
+    }
+    windows = window.split(target_counts=target_counts)
+    return sum(
+        windows[username].request_count(target_count=target_count)
+        for username, target_count in target_counts.items()
+    )
+
+
+def record_run_history(
+    history: RunHistory,
+    center: str,
+    server_booking_date: datetime,
+    clock_offset: timedelta,
+    send_offset: timedelta,
+    window: FiringWindow,
+    results: dict[str, list[SlotResult]],
+) -> None:
+    """Save every shot of the run so the next run can be tuned, a failure to
+    write the history is logged and does not affect the booking results.
+
+    Args:
+        history (RunHistory): the run history store
+        center (str): the key of the sports center
+        server_booking_date (datetime): the booking date in server time without the send offset
+        clock_offset (timedelta): local send time minus the server send time
+        send_offset (timedelta): the send offset used in this run
+        window (FiringWindow): the firing window used in this run
+        results (dict[str, list[SlotResult]]): the slot results of each account
+    """
+    if not any(result.shots for slot_results in results.values() for result in slot_results):
+        return
+
+    try:
+        run_id = history.record_run(
+            center=center,
+            planned_booking_date=server_booking_date,
+            clock_offset=clock_offset,
+            send_offset=send_offset,
+            window=window,
+            results=results,
+        )
+    except sqlite3.Error:
+        logging.exception("無法保存開搶紀錄")
+    else:
+        logging.debug("已保存開搶紀錄 #%d", run_id)
+
+
+async def close_driver_pool(driver_pool: ChromeDriverPool) -> None:
+    """Log the login time of each browser and close the pool.
+
+    Args:
+        driver_pool (ChromeDriverPool): the pool used by the browser logins
+    """
+    driver_pool.log_stats()
+    await driver_pool.close()
+
+
+async def login_with_session_cache(
+    service: SportsCenterWebService,
+    session_cache: SessionCache,
+    username: str,
+    stack: AsyncExitStack,
+) -> bool:
+    """Restore the cached session if it is still valid, otherwise log in, and
+    save the cookies of the logged in session back to the cache. An error while
+    logging in (e.g. no Chrome driver for the browser fallback) is logged and the
+    account is treated as logged out, so the other accounts can still book.
+
+    Args:
+        service (SportsCenterWebService): the webservice of the account
+        session_cache (SessionCache): cache storing the cookies of each account
+        username (str): the account of the webservice
+        stack (AsyncExitStack): exit stack which leaves the webservice context at the end
+
+    Returns:
+        bool: whether the account is logged in
+    """
+    # 快取的登入狀態仍有效的話就不需要重新登入
+    cached_cookies = session_cache.load(
+        sports_center_name=service.sports_center_name(), username=username
+    )
+    if cached_cookies:
+        await service.restore_session(cookies=cached_cookies)
+    # 結束時不登出，保留 session 給下次執行沿用
+    service.keep_session_alive = True
+
+    try:
+        await stack.enter_async_context(service)
+    except Exception:
+        logging.exception("%s 登入時發生錯誤", username)
+        return False
+
+    if not service.login_status:
+        return False
+    session_cache.save(
+        sports_center_name=service.sports_center_name(),
+        username=username,
+        cookies=service.get_cookies(),
+    )
+    return True
+
+
+def set_logger(debug_mode: bool = False, json_log_path: Path | None = None) -> LogPipeline:
+    """set logging settings, the records are written by a background thread so
+    logging never blocks the event loop, the remaining records are flushed at exit
 
     Args:
         debug_mode (bool, optional): set log level to debug with debug_mode is True. Defaults to False.
+        json_log_path (Path | None, optional): also write JSON lines to this rotating file. Defaults to None.
+
+    Returns:
+        LogPipeline: the started logging pipeline
     """
     if debug_mode:
         log_level = logging.DEBUG
     else:
         log_level = logging.INFO
 
-    logging.basicConfig(
-        level=log_level, format="%(asctime)s - %(levelname)s - %(message)s"
+    pipeline = LogPipeline(level=log_level, json_log_path=json_log_path)
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    return pipeline
+
+
+async def count_down(
+    scheduler: DeadlineScheduler, offset: timedelta = timedelta()
+) -> None:
+    """Count down to the target_time (which is booking_date plus offset timedelta)
+    without blocking the event loop, but always show the remaining seconds to the
+    specified booking date.
+
+    Args:
+        scheduler (DeadlineScheduler): scheduler holding the specified booking date
+        offset (timedelta, optional): offset relative to the booking date. Defaults to timedelta().
+    """
+    overshoot_ns = await scheduler.wait_for_deadline(offset=offset)
+    tracer.instant("count_down_end", overshoot_ns=overshoot_ns)
+    logging.debug("倒數結束，超過目標時間 %.3f 毫秒", overshoot_ns / 1e6)
+
+
+async def count_down_with_tasks(
+    scheduler: DeadlineScheduler, offset: timedelta, tasks: list[Coroutine[Any, Any, Any]]
+) -> None:
+    """Count down to the offset while the tasks run in the background. Tasks still
+    running PRE_FIRING_TASK_MARGIN before the offset are cancelled, so a slow
+    request never delays the booking.
+
+    Args:
+        scheduler (DeadlineScheduler): scheduler holding the booking date
+        offset (timedelta): offset relative to the booking date to count down to
+        tasks (list[Coroutine[Any, Any, Any]]): the work to finish before the offset
+    """
+    await scheduler.wait_for_deadline_with_tasks(
+        offset=offset - PRE_FIRING_TASK_MARGIN, tasks=tasks
     )
+    await count_down(scheduler=scheduler, offset=offset)
 
 
-def count_down(booking_date: datetime, offset: timedelta = timedelta()) -> None:
-    """Count down to the target_time (which is booking_date plus offset timedelta),
-    but always show the remaining seconds to the specified booking date.
+async def fire_in_worker_processes(
+    firing: "MultiProcessFiring",
+    engines: dict[str, FiringEngine],
+    periods_by_username: dict[str, tuple[datetime, ...]],
+    scheduler: DeadlineScheduler,
+    server_booking_date: datetime,
+    pool_size: int,
+    schedule_index: ScheduleIndex,
+) -> dict[str, list[SlotResult]]:
+    """Fire the booking requests from several worker processes, then release the
+    courts won beyond the quota since the workers only release their own duplicates.
 
     Args:
-        booking_date (datetime): specified date to book the court
-        offset (timedelta, optional): _description_. Defaults to timedelta().
+        firing (MultiProcessFiring): the worker processes settings
+        engines (dict[str, FiringEngine]): the firing engine of each account in this process,
+            used to release the extra courts
+        periods_by_username (dict[str, tuple[datetime, ...]]): the periods assigned to each account
+        scheduler (DeadlineScheduler): scheduler holding the local send time
+        server_booking_date (datetime): the booking date in server time
+        pool_size (int): the number of connections to warm up across all workers
+        schedule_index (ScheduleIndex): the scanned schedule
+
+    Returns:
+        dict[str, list[SlotResult]]: the merged slot results of each account
     """
-    current_time = datetime.now()
-    count_down_target_time = booking_date + offset
-    while current_time < count_down_target_time:
-        if current_time.microsecond == 0:
-            delta_seconds = (booking_date - current_time).seconds
-            if delta_seconds >= 10 and delta_seconds % 5 == 0:
-                logging.info("倒數 %d 秒", delta_seconds)
-            elif delta_seconds < 10:
-                logging.info("倒數 %d 秒", delta_seconds)
-            else:
-                pass
+    from services.multiprocess_firing import WorkerAccount
+
+    results = await firing.fire(
+        accounts=tuple(
+            WorkerAccount(
+                username=username,
+                # 倒數期間可能重新登入或被伺服器更新過，以 session 中的 cookies 為準
+                cookies=get_session_cookies(
+                    session=engine.session, url=engine.service.login_page_url
+                ),
+                booking_periods=periods_by_username[username],
+            )
+            for username, engine in engines.items()
+        ),
+        booking_date=scheduler.booking_date,
+        clock_offset=scheduler.booking_date - server_booking_date,
+        pool_size=pool_size,
+        schedule_index=schedule_index,
+    )
+    await asyncio.gather(
+        *(
+            engines[username].release_extra_courts(result=result)
+            for username, slot_results in results.items()
+            for result in slot_results
+        )
+    )
+    return results
+
 
-        current_time = datetime.now()
+async def prepare_before_firing(
+    engines: dict[str, FiringEngine],
+    scheduler: DeadlineScheduler,
+    periods_by_username: dict[str, tuple[datetime, ...]],
+) -> None:
+    """Build the firing plan of every account after the last session check and
+    schedule rescan, so no url or request bytes are built at the booking time.
+
+    Args:
+        engines (dict[str, FiringEngine]): the firing engine of each account
+        scheduler (DeadlineScheduler): scheduler holding the booking date
+        periods_by_username (dict[str, tuple[datetime, ...]]): the periods assigned to each account
+    """
+    await scheduler.wait_for_deadline(offset=FIRING_PREPARE_OFFSET, log_count_down=False)
+    with tracer.span("prepare_firing"):
+        for username, engine in engines.items():
+            engine.prepare(booking_periods=periods_by_username[username])
+
+
+def log_firing_overshoot(results: dict[str, list[SlotResult]], low_jitter: bool) -> None:
+    """Log how late the shots were sent compared to their planned send time, so
+    runs with and without the low jitter mode can be compared.
+
+    Args:
+        results (dict[str, list[SlotResult]]): the slot results of each account
+        low_jitter (bool): whether the low jitter mode was used
+    """
+    overshoots_ms = [
+        shot.overshoot_ns / 1e6
+        for slot_results in results.values()
+        for result in slot_results
+        for shot in result.shots
+    ]
+    if not overshoots_ms:
+        return
+
+    logging.info(
+        "送出時間超過預計時間 (低抖動模式%s)：平均 %.3f 毫秒，最大 %.3f 毫秒，共 %d 個請求",
+        "開啟" if low_jitter else "關閉",
+        sum(overshoots_ms) / len(overshoots_ms),
+        max(overshoots_ms),
+        len(overshoots_ms),
+    )
+
+
+async def sync_server_clock(url: str, server_booking_date: datetime) -> datetime:
+    """Estimate the server clock offset and return the local time to send the
+    booking requests so that they arrive at the server right at server_booking_date.
+
+    Args:
+        url (str): url of the sports center website used to sample the server clock
+        server_booking_date (datetime): the booking date in server time
+
+    Returns:
+        datetime: the local time to send the booking requests, fall back to
+            server_booking_date if the server clock can not be estimated
+    """
+    async with aiohttp.ClientSession(trace_configs=recorder.trace_configs()) as session:
+        try:
+            estimate = await estimate_server_clock_offset(session=session, url=url)
+        except RuntimeError as e:
+            logging.error("%s，不調整開搶時間", e)
+            return server_booking_date
+
+    logging.info(
+        "伺服器時鐘差距 %.1f 毫秒 (誤差 ±%.1f 毫秒)，單程延遲 %.1f 毫秒",
+        estimate.offset.total_seconds() * 1000,
+        estimate.uncertainty.total_seconds() * 1000,
+        estimate.one_way_latency.total_seconds() * 1000,
+    )
+    local_send_time = estimate.local_send_time_for(server_time=server_booking_date)
+    logging.info("校時後的送出時間：%s", local_send_time)
+
+    return local_send_time
+
+
+async def rescan_schedule_before_firing(
+    scanner: AvailabilityScanner,
+    session: aiohttp.ClientSession,
+    scheduler: DeadlineScheduler,
+    booking_periods: tuple[datetime, ...],
+) -> None:
+    """Scan the schedule pages again shortly before firing so the slot index
+    reflects courts blocked during the count down.
+
+    Args:
+        scanner (AvailabilityScanner): the scanner holding the cached schedule pages
+        session (aiohttp.ClientSession): the booking session holding the login cookies
+        scheduler (DeadlineScheduler): scheduler holding the booking date
+        booking_periods (tuple[datetime, ...]): the periods to book
+    """
+    await scheduler.wait_for_deadline(offset=SCHEDULE_RESCAN_OFFSET, log_count_down=False)
+    await scanner.scan(session=session, booking_dates=booking_periods)
 
 
 def webservice_factory(court_no: int) -> SportsCenterWebService:
@@ -193,5 +856,86 @@ def webservice_factory(court_no: int) -> SportsCenterWebService:
         raise ValueError("無效的運動中心編號")
 
 
+def positive_int(value: str) -> int:
+    """parse a positive integer from the command line
+
+    Args:
+        value (str): the argument value
+
+    Raises:
+        argparse.ArgumentTypeError: if the value is not a positive integer
+
+    Returns:
+        int: the parsed integer
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("請輸入正整數")
+    if number < 1:
+        raise argparse.ArgumentTypeError("請輸入正整數")
+    return number
+
+
+def parse_args() -> argparse.Namespace:
+    """parse command line arguments
+
+    Returns:
+        argparse.Namespace: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="搶球場機器人")
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        default=None,
+        help="輸出各階段耗時的 Chrome trace JSON 到指定目錄，可用 Perfetto 開啟",
+    )
+    parser.add_argument(
+        "--record",
+        type=Path,
+        default=None,
+        help="把登入與搶場地的 HTTP 請求記錄成 HAR 檔輸出到指定目錄，帳密與 cookies 會被遮蔽，"
+        "可用 devtools.replay_server 離線重播",
+    )
+    parser.add_argument(
+        "--low-jitter",
+        action="store_true",
+        help="使用 uvloop (有安裝時)，並在開搶前後暫停 GC、綁定 CPU 與提高行程優先權",
+    )
+    parser.add_argument(
+        "--raw-socket",
+        action="store_true",
+        help="開搶時把預先序列化好的請求直接寫入預熱好的連線，不經過 aiohttp",
+    )
+    parser.add_argument(
+        "--log-json",
+        type=Path,
+        default=None,
+        help="另外把 log 以 JSON lines 格式寫入指定的檔案，檔案過大時自動輪替",
+    )
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        help="分擔開搶請求的工作行程數，每個工作行程各自預熱連線",
+    )
+    parser.add_argument(
+        "--history",
+        type=Path,
+        default=DEFAULT_RUN_HISTORY_PATH,
+        help="保存每次開搶結果的資料庫路徑，紀錄足夠時會建議送出偏移與連發區間",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="印出啟動時每個套件與模組的尋找、解開與執行時間後結束，不會開始搶場地",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.profile_startup:
+        print(profiler.report())
+    else:
+        run_event_loop(main(args=args), use_uvloop=args.low_jitter)
@@ -0,0 +1,45 @@
+"""把想要預約的時段分配給多個帳號，讓同一個程式中的帳號不會互相搶同一個時段"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+
+
+@dataclass(frozen=True)
+class BookingAccount:
+    """搶場地用的帳號
+
+    Attributes:
+        username (str): 身分證字號
+        password (str): 密碼
+    """
+
+    username: str
+    password: str = field(repr=False)
+
+
+def assign_booking_periods(
+    accounts: tuple[BookingAccount, ...],
+    booking_periods: tuple[datetime, ...],
+) -> dict[BookingAccount, tuple[datetime, ...]]:
+    """依序輪流把時段分配給帳號，每個時段只會分配給一個帳號
+
+    Args:
+        accounts (tuple[BookingAccount, ...]): 帳號，越前面越先分配
+        booking_periods (tuple[datetime, ...]): 想要預約的時段，越前面越先分配
+
+    Raises:
+        ValueError: 沒有任何帳號或同一個帳號重複出現時發出的例外
+
+    Returns:
+        dict[BookingAccount, tuple[datetime, ...]]: 每個帳號分配到的時段，沒有分配到時段的帳號不會出現
+    """
+    if not accounts:
+        raise ValueError("至少要有一個帳號")
+    if len({account.username for account in accounts}) != len(accounts):
+        raise ValueError("帳號重複")
+
+    assignments: dict[BookingAccount, list[datetime]] = {account: [] for account in accounts}
+    for index, period in enumerate(booking_periods):
+        assignments[accounts[index % len(accounts)]].append(period)
+
+    return {account: tuple(periods) for account, periods in assignments.items() if periods}
@@ -0,0 +1,196 @@
+"""開搶前掃描時刻表，建立各運動中心、場地、時段是否還能預約的索引"""
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterable
+
+import aiohttp
+
+from .sports_center_webservice import SportsCenterWebService
+
+# 開搶前才掃描時刻表，單一頁面太慢就放棄，沿用上一次的結果
+SCHEDULE_REQUEST_TIMEOUT_SECONDS = 3
+
+
+@dataclass(frozen=True)
+class _CachedPage:
+    """上一次抓到的時刻表頁面，用來發出條件式請求與略過沒有變動的頁面"""
+
+    etag: str | None
+    last_modified: str | None
+    digest: bytes
+    slots: frozenset[tuple[str, int]]
+
+
+class ScheduleIndex:
+    """以 (運動中心, 場地, 日期) 為索引記錄可預約的小時
+
+    只記錄掃描成功而且至少有一個可預約時段的頁面；沒有記錄的場地一律視為
+    可能搶得到，避免網站還沒公布時刻表或掃描失敗時把所有請求都過濾掉。
+    """
+
+    def __init__(self) -> None:
+        self._available_hours: dict[tuple[str, str, date], frozenset[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._available_hours)
+
+    def update(self, center: str, court: str, day: date, hours: frozenset[int]) -> None:
+        """更新某個場地某一天可預約的小時
+
+        Args:
+            center (str): 運動中心名稱
+            court (str): 場地編號
+            day (date): 日期
+            hours (frozenset[int]): 可預約的小時，空集合表示無法判斷
+        """
+        key = (center, court, day)
+        if hours:
+            self._available_hours[key] = hours
+        else:
+            self._available_hours.pop(key, None)
+
+    def is_winnable(self, center: str, court: str, booking_date: datetime) -> bool:
+        """判斷某個場地時段是否還有機會搶到
+
+        Args:
+            center (str): 運動中心名稱
+            court (str): 場地編號
+            booking_date (datetime): 預約時段
+
+        Returns:
+            bool: 時刻表上顯示已被預約時回傳 False，其餘情況回傳 True
+        """
+        hours = self._available_hours.get((center, court, booking_date.date()))
+        return hours is None or booking_date.hour in hours
+
+    def winnable_courts(
+        self, center: str, courts: tuple[str, ...], booking_date: datetime
+    ) -> tuple[str, ...]:
+        """依優先順序列出某個時段還有機會搶到的場地
+
+        Args:
+            center (str): 運動中心名稱
+            courts (tuple[str, ...]): 場地編號，依優先順序排列
+            booking_date (datetime): 預約時段
+
+        Returns:
+            tuple[str, ...]: 還有機會搶到的場地，順序和 courts 相同
+        """
+        return tuple(
+            court
+            for court in courts
+            if self.is_winnable(center=center, court=court, booking_date=booking_date)
+        )
+
+
+class AvailabilityScanner:
+    """趁連線已經預熱好時抓取各場地的時刻表並更新 ScheduleIndex
+
+    同一個 scanner 會記住每一頁的 ETag、Last-Modified 與內容雜湊，之後再掃描時
+    以條件式請求只抓有變動的頁面，內容沒變的頁面也不會重新解析。
+    """
+
+    def __init__(
+        self,
+        service: SportsCenterWebService,
+        index: ScheduleIndex | None = None,
+        courts: tuple[str, ...] | None = None,
+    ) -> None:
+        """
+        Args:
+            service (SportsCenterWebService): 已登入的運動中心服務
+            index (ScheduleIndex | None, optional): 要更新的索引，不指定則建立新的. Defaults to None.
+            courts (tuple[str, ...] | None, optional): 要掃描的場地，不指定則使用 service.courts. Defaults to None.
+        """
+        self.service = service
+        self.courts = courts or service.courts
+        self.index = index or ScheduleIndex()
+        self._pages: dict[str, _CachedPage] = {}
+
+    async def scan(
+        self, session: aiohttp.ClientSession, booking_dates: Iterable[datetime]
+    ) -> ScheduleIndex:
+        """掃描預約時段所在日期的所有場地時刻表
+
+        Args:
+            session (aiohttp.ClientSession): 輸入登入資訊相關 cookies 的非同步 session
+            booking_dates (Iterable[datetime]): 想要預約的時段
+
+        Returns:
+            ScheduleIndex: 更新後的索引
+        """
+        # 時刻表網址沒有場地欄位時所有場地共用同一頁，只抓一次
+        pages: dict[str, set[tuple[str, date]]] = {}
+        for booking_date in booking_dates:
+            for court in self.courts:
+                url = self.service.get_schedule_url(booking_date=booking_date, court=court)
+                if url is not None:
+                    pages.setdefault(url, set()).add((court, booking_date.date()))
+
+        if not pages:
+            return self.index
+
+        fetched = await asyncio.gather(*(self._fetch(session=session, url=url) for url in pages))
+
+        center = self.service.sports_center_name()
+        changed_count = 0
+        for targets, (slots, is_changed) in zip(pages.values(), fetched):
+            changed_count += is_changed
+            if slots is None:
+                continue
+            for court, day in targets:
+                hours = frozenset(hour for slot_court, hour in slots if slot_court == court)
+                self.index.update(center=center, court=court, day=day, hours=hours)
+
+        logging.info("掃描 %d 頁時刻表，其中 %d 頁有變動", len(pages), changed_count)
+        return self.index
+
+    async def _fetch(
+        self, session: aiohttp.ClientSession, url: str
+    ) -> tuple[frozenset[tuple[str, int]] | None, bool]:
+        cached = self._pages.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            async with session.get(
+                url,
+                headers=headers,
+                ssl=False,
+                allow_redirects=False,
+                timeout=aiohttp.ClientTimeout(total=SCHEDULE_REQUEST_TIMEOUT_SECONDS),
+            ) as response:
+                if response.status == 304 and cached is not None:
+                    return cached.slots, False
+                if response.status != 200:
+                    logging.warning("無法取得時刻表 (HTTP %d)： %s", response.status, url)
+                    return None, False
+                body = await response.read()
+                encoding = response.get_encoding()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning("掃描時刻表失敗： %s", e)
+            return None, False
+
+        digest = hashlib.sha256(body).digest()
+        if cached is not None and cached.digest == digest:
+            slots, is_changed = cached.slots, False
+        else:
+            slots = frozenset(
+                self.service.parse_available_slots(html=body.decode(encoding, errors="replace"))
+            )
+            is_changed = True
+
+        self._pages[url] = _CachedPage(
+            etag=etag, last_modified=last_modified, digest=digest, slots=slots
+        )
+        return slots, is_changed
@@ -0,0 +1,193 @@
+"""讀取批次設定檔，把多個運動中心、帳號與時段整理成一份開搶計畫
+
+設定檔是 JSON，例如：
+    {
+      "runs": [
+        {
+          "center": "zhongshan",
+          "opening_time": "2025-04-12T00:00:00.000",
+          "periods": ["2025-04-26T20:00:00", "2025-04-26T21:00:00"],
+          "accounts": [
+            {"username": "A123456789", "password_env": "BADMINTON_PASSWORD_A"},
+            {"username": "B123456789", "password": "..."}
+          ],
+          "send_offset_ms": 0,
+          "base_url": "http://127.0.0.1:8080"
+        }
+      ]
+    }
+
+periods 也可以是和互動輸入相同、用 , 分隔的字串。send_offset_ms 與 base_url 可以省略，
+密碼可以直接寫在 password，或用 password_env 指定存放密碼的環境變數。
+運動中心、開搶時間、網址與送出偏移都相同的項目會合併成同一次開搶，共用排程器與連線池。
+"""
+
+import json
+import os
+from collections.abc import Collection
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from utils.input_helper import (
+    check_if_target_datetime_is_outdated,
+    parse_input_booking_periods_str,
+    parse_input_national_ids_str,
+    transform_offset_milliseconds_param,
+)
+
+from .account_assignment import BookingAccount, assign_booking_periods
+
+
+@dataclass
+class BatchRun:
+    """同一個運動中心在同一個開搶時間的一次開搶
+
+    Attributes:
+        center (str): sports_centers.json 中的運動中心 key
+        server_booking_date (datetime): 伺服器時間的開搶時間
+        assignments (dict[BookingAccount, tuple[datetime, ...]]): 每個帳號分配到的時段
+        base_url (str | None): 運動中心網站網址，None 表示使用正式網站
+        send_offset (timedelta | None): 設定檔指定的送出偏移，None 表示沒有指定
+    """
+
+    center: str
+    server_booking_date: datetime
+    assignments: dict[BookingAccount, tuple[datetime, ...]]
+    base_url: str | None = None
+    send_offset: timedelta | None = None
+
+    @property
+    def booking_periods(self) -> tuple[datetime, ...]:
+        """所有帳號要搶的時段，依時間排序"""
+        return tuple(sorted(period for periods in self.assignments.values() for period in periods))
+
+
+def load_batch_plan(path: Path, centers: Collection[str]) -> tuple[BatchRun, ...]:
+    """讀取並檢查批次設定檔
+
+    Args:
+        path (Path): 設定檔路徑
+        centers (Collection[str]): 可以使用的運動中心 key
+
+    Raises:
+        ValueError: 設定檔格式不正確時發出的例外，訊息中會列出所有錯誤
+
+    Returns:
+        tuple[BatchRun, ...]: 依開搶時間排序的開搶計畫
+    """
+    try:
+        spec = json.loads(path.read_text())
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path} 不是有效的 JSON：{e}")
+    return parse_batch_spec(spec=spec, centers=centers)
+
+
+def parse_batch_spec(spec: dict[str, Any], centers: Collection[str]) -> tuple[BatchRun, ...]:
+    """檢查批次設定並合併成開搶計畫，所有項目檢查完才一次列出全部錯誤
+
+    Args:
+        spec (dict[str, Any]): 設定檔的內容
+        centers (Collection[str]): 可以使用的運動中心 key
+
+    Raises:
+        ValueError: 設定不正確時發出的例外，訊息中會列出所有錯誤
+
+    Returns:
+        tuple[BatchRun, ...]: 依開搶時間排序的開搶計畫
+    """
+    entries = spec.get("runs") if isinstance(spec, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("設定檔中沒有任何 runs")
+
+    errors: list[str] = []
+    runs: dict[tuple, BatchRun] = {}
+    for index, entry in enumerate(entries):
+        try:
+            run = _parse_entry(entry=entry, centers=centers)
+            key = (run.center, run.server_booking_date, run.base_url, run.send_offset)
+            if key in runs:
+                _merge_run(target=runs[key], run=run)
+            else:
+                runs[key] = run
+        except KeyError as e:
+            errors.append(f"runs[{index}]：缺少 {e} 欄位")
+        except (ValueError, AssertionError, TypeError) as e:
+            errors.append(f"runs[{index}]：{e}")
+
+    if errors:
+        raise ValueError("\n".join(errors))
+    return tuple(sorted(runs.values(), key=lambda run: (run.server_booking_date, run.center)))
+
+
+def _parse_entry(entry: dict[str, Any], centers: Collection[str]) -> BatchRun:
+    center = entry["center"]
+    if center not in centers:
+        raise ValueError(f"運動中心 {center} 不存在，可用的運動中心：{', '.join(sorted(centers))}")
+
+    server_booking_date = check_if_target_datetime_is_outdated(
+        target_datetime=datetime.fromisoformat(entry["opening_time"])
+    )
+    periods = entry["periods"]
+    booking_periods = parse_input_booking_periods_str(
+        ",".join(periods) if isinstance(periods, list) else periods
+    )
+    if len(set(booking_periods)) != len(booking_periods):
+        raise ValueError("時段重複")
+    if min(booking_periods) <= server_booking_date:
+        raise ValueError("預約時段必須晚於開搶時間")
+
+    raw_accounts = entry["accounts"]
+    usernames = parse_input_national_ids_str(
+        ",".join(account["username"] for account in raw_accounts)
+    )
+    if len(usernames) != len(raw_accounts):
+        raise ValueError("帳號不能是空白")
+    accounts = tuple(
+        BookingAccount(username=username, password=_read_password(account=account))
+        for username, account in zip(usernames, raw_accounts)
+    )
+
+    send_offset = None
+    if entry.get("send_offset_ms") is not None:
+        send_offset = timedelta(
+            milliseconds=transform_offset_milliseconds_param(str(entry["send_offset_ms"]))
+        )
+
+    return BatchRun(
+        center=center,
+        server_booking_date=server_booking_date,
+        assignments=assign_booking_periods(accounts=accounts, booking_periods=booking_periods),
+        base_url=entry.get("base_url") or None,
+        send_offset=send_offset,
+    )
+
+
+def _read_password(account: dict[str, str]) -> str:
+    if account.get("password"):
+        return account["password"]
+
+    env_name = account.get("password_env")
+    if not env_name:
+        raise ValueError(f"{account['username']} 沒有設定 password 或 password_env")
+    password = os.environ.get(env_name)
+    if not password:
+        raise ValueError(f"{account['username']} 的密碼環境變數 {env_name} 沒有設定")
+    return password
+
+
+def _merge_run(target: BatchRun, run: BatchRun) -> None:
+    # 同一次開搶中每個帳號與每個時段都只能出現一次，避免同一個程式中的帳號互相搶同一個時段
+    usernames = {account.username for account in target.assignments}
+    duplicated_usernames = usernames & {account.username for account in run.assignments}
+    if duplicated_usernames:
+        raise ValueError(f"帳號 {', '.join(sorted(duplicated_usernames))} 在同一次開搶中重複")
+    duplicated_periods = set(target.booking_periods) & set(run.booking_periods)
+    if duplicated_periods:
+        raise ValueError(
+            "時段 "
+            + ", ".join(f"{period:%Y-%m-%d %H:%M}" for period in sorted(duplicated_periods))
+            + " 在同一次開搶中重複"
+        )
+    target.assignments.update(run.assignments)
@@ -0,0 +1,156 @@
+"""依照 sports_centers.json 的設定與運動中心網站互動的通用服務"""
+
+from __future__ import annotations
+
+import types
+from typing import TYPE_CHECKING
+
+from utils.driver_pool import ChromeDriverPool
+
+from .sports_center_registry import SPORTS_CENTER_REGISTRY, SportsCenterConfig
+from .sports_center_webservice import LOGIN_BACKEND_SELENIUM, SportsCenterWebService
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
+
+# selenium 的 By 常數就是這些字串，直接使用就不必為了定位方式載入 selenium
+BY_ID = "id"
+BY_XPATH = "xpath"
+BY_CLASS_NAME = "class name"
+
+
+class ConfiguredSportsCenterWebService(SportsCenterWebService):
+    """網址、選擇器與場地編號都來自 SportsCenterConfig 的運動中心服務
+
+    子類別在宣告時指定設定，例如：
+        class MySportsCenterWebService(ConfiguredSportsCenterWebService, center=config):
+            pass
+    """
+
+    CENTER: SportsCenterConfig
+
+    def __init_subclass__(cls, center: SportsCenterConfig | None = None, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if center is None:
+            return
+
+        cls.CENTER = center
+        cls.DEFAULT_BASE_URL = center.base_url
+        cls.USERNAME_INPUT_ID = center.selectors.username_input_id
+        cls.PASSWORD_INPUT_ID = center.selectors.password_input_id
+        cls.LOGIN_USER_NAME_ID = center.selectors.login_user_name_id
+        cls.LOGIN_FAILED_MESSAGE_ID = center.selectors.login_failed_message_id
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        login_backend: str = LOGIN_BACKEND_SELENIUM,
+        base_url: str | None = None,
+        driver_pool: ChromeDriverPool | None = None,
+    ) -> None:
+        super().__init__(
+            username=username,
+            password=password,
+            login_backend=login_backend,
+            base_url=base_url,
+            driver_pool=driver_pool,
+        )
+
+    @classmethod
+    def sports_center_name(self) -> str:
+        return self.CENTER.name
+
+    @property
+    def login_page_url(self) -> str:
+        return f"{self.base_url}/{self.CENTER.login_page_path}"
+
+    @property
+    def courts(self) -> tuple[str, ...]:
+        return self.CENTER.courts
+
+    def _get_login_user_name_from_website(self) -> WebElement:
+        return self._driver.find_element(
+            BY_XPATH, f"//span[@id='{self.LOGIN_USER_NAME_ID}']"
+        )
+
+    def _find_checkbox_element(self) -> WebElement:
+        return self._driver.find_element(
+            BY_CLASS_NAME, self.CENTER.selectors.checkbox_class_name
+        )
+
+    def _find_username_input_box_element(self) -> WebElement:
+        return self._driver.find_element(BY_ID, self.USERNAME_INPUT_ID)
+
+    def _find_password_input_box_element(self) -> WebElement:
+        return self._driver.find_element(BY_ID, self.PASSWORD_INPUT_ID)
+
+    def _get_login_failed_message(self) -> WebElement:
+        return self._driver.find_element(BY_ID, self.LOGIN_FAILED_MESSAGE_ID)
+
+    def _get_logout_button(self) -> WebElement:
+        return self._driver.find_element(
+            BY_XPATH, self.CENTER.selectors.logout_button_xpath
+        )
+
+    def _is_logout_success(self) -> bool:
+        # 讀取重導向的登入頁面看是否有找到登入鈕來確認有確實登出
+        member_login = self._driver.find_element(
+            BY_ID, self.CENTER.selectors.member_login_id
+        )
+        return member_login.text == self.CENTER.selectors.member_login_text
+
+    def _generate_booking_url(
+        self, year: int, month: int, day: int, hour: int, court: str | None = None
+    ) -> str:
+        path = self.CENTER.booking_path_template.format(
+            court=court or self.courts[0], year=year, month=month, day=day, hour=hour
+        )
+        return f"{self.base_url}/{path}"
+
+    def _generate_cancel_url(
+        self, year: int, month: int, day: int, hour: int, court: str
+    ) -> str | None:
+        if self.CENTER.cancel_path_template is None:
+            return None
+
+        path = self.CENTER.cancel_path_template.format(
+            court=court, year=year, month=month, day=day, hour=hour
+        )
+        return f"{self.base_url}/{path}"
+
+    def _generate_schedule_url(self, year: int, month: int, day: int, court: str) -> str | None:
+        if self.CENTER.schedule_path_template is None:
+            return None
+
+        path = self.CENTER.schedule_path_template.format(
+            court=court, year=year, month=month, day=day
+        )
+        return f"{self.base_url}/{path}"
+
+    def parse_available_slots(self, html: str) -> set[tuple[str, int]]:
+        pattern = self.CENTER.available_slot_pattern
+        if pattern is None:
+            return set()
+
+        return {
+            (match.group("court"), int(match.group("hour")))
+            for match in pattern.finditer(html)
+        }
+
+
+def create_webservice_classes() -> list[type[ConfiguredSportsCenterWebService]]:
+    """為設定檔中的每個運動中心建立對應的服務類別
+
+    Returns:
+        list[type[ConfiguredSportsCenterWebService]]: 順序和設定檔相同的服務類別
+    """
+    return [
+        types.new_class(
+            f"{center.key.title()}SportsCenterWebService",
+            (ConfiguredSportsCenterWebService,),
+            {"center": center},
+            lambda namespace: namespace.update(__module__=__name__),
+        )
+        for center in SPORTS_CENTER_REGISTRY.values()
+    ]
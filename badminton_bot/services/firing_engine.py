@@ -0,0 +1,475 @@
+"""在開搶時間前後對每個預約時段的每個場地分批送出多個搶場地請求"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+import aiohttp
+from utils.deadline_scheduler import DeadlineScheduler
+from utils.raw_http import RawConnection, RawConnectionPool, build_request
+from yarl import URL
+
+from .availability_scanner import ScheduleIndex
+from .sports_center_webservice import BookingOutcome, SportsCenterWebService
+
+# 共享記憶體只有多行程模式才用到，單一行程執行時不載入 multiprocessing
+if TYPE_CHECKING:
+    from utils.success_board import SuccessBoard
+
+
+@dataclass(frozen=True)
+class FiringWindow:
+    """每個預約時段的連發設定
+
+    Attributes:
+        shots_per_slot (int): 每個時段最多送出幾個請求
+        window_start (timedelta): 第一發相對開搶時間的偏移
+        window_end (timedelta): 最後一發相對開搶時間的偏移
+        max_requests (int): 所有時段加起來最多送出幾個請求
+    """
+
+    shots_per_slot: int = 5
+    window_start: timedelta = timedelta(milliseconds=-30)
+    window_end: timedelta = timedelta(milliseconds=200)
+    max_requests: int = 10
+
+    def shots_for(self, slot_count: int, courts_per_slot: int = 1) -> int:
+        """在總請求數的限制下，計算每個時段的每個場地實際可以送出幾個請求
+
+        目標數超過 max_requests 時，超出的目標由 FiringEngine.prepare 依優先順序捨棄，
+        剩下的目標每個送出一個請求。
+
+        Args:
+            slot_count (int): 預約時段數
+            courts_per_slot (int, optional): 每個時段同時搶的場地數. Defaults to 1.
+
+        Returns:
+            int: 每個時段每個場地的請求數，至少為 1
+        """
+        targets = min(max(slot_count * courts_per_slot, 1), max(self.max_requests, 1))
+        return max(1, min(self.shots_per_slot, self.max_requests // targets))
+
+    def request_count(self, target_count: int) -> int:
+        """計算所有 (時段, 場地) 目標實際送出的請求數，不會超過 max_requests
+
+        Args:
+            target_count (int): (時段, 場地) 目標數
+
+        Returns:
+            int: 請求數
+        """
+        targets = min(target_count, self.max_requests)
+        if targets <= 0:
+            return 0
+        return self.shots_for(slot_count=targets) * targets
+
+    def shot_offsets(self, slot_count: int, courts_per_slot: int = 1) -> list[timedelta]:
+        """把每個時段的請求平均分散在連發區間內，並把最接近開搶時間的一發移到開搶時間
+
+        只有一發時就在開搶時間送出，開搶時間不在連發區間內時改在最接近的一端送出。
+
+        Args:
+            slot_count (int): 預約時段數
+            courts_per_slot (int, optional): 每個時段同時搶的場地數. Defaults to 1.
+
+        Returns:
+            list[timedelta]: 每一發相對開搶時間的偏移，由早到晚排列
+        """
+        opening = min(max(self.window_start, timedelta()), self.window_end)
+        shots = self.shots_for(slot_count=slot_count, courts_per_slot=courts_per_slot)
+        if shots == 1:
+            return [opening]
+
+        step = (self.window_end - self.window_start) / (shots - 1)
+        offsets = [self.window_start + step * i for i in range(shots)]
+        # 開搶時間落在最接近的一發與相鄰兩發之間，移過去不會打亂順序
+        nearest = min(range(shots), key=lambda i: abs(offsets[i] - opening))
+        offsets[nearest] = opening
+        return offsets
+
+    def split(self, target_counts: dict[str, int]) -> dict[str, "FiringWindow"]:
+        """把 max_requests 依目標數比例分給共用這個連發設定的多個帳號，
+        讓所有帳號加起來的請求數不超過 max_requests
+
+        Args:
+            target_counts (dict[str, int]): 每個帳號的 (時段, 場地) 目標數
+
+        Returns:
+            dict[str, FiringWindow]: 每個帳號分到的連發設定，順序和 target_counts 相同
+        """
+        total = sum(target_counts.values())
+        if total <= 0:
+            return {key: self for key in target_counts}
+
+        # 先依比例無條件捨去，剩下的請求數依捨去的大小分給前面的帳號
+        shares = {key: self.max_requests * count // total for key, count in target_counts.items()}
+        remainders = sorted(
+            target_counts,
+            key=lambda key: -(self.max_requests * target_counts[key] % total),
+        )
+        for key in remainders[: self.max_requests - sum(shares.values())]:
+            shares[key] += 1
+        return {key: replace(self, max_requests=share) for key, share in shares.items()}
+
+
+@dataclass
+class ShotResult:
+    """單一請求的結果
+
+    Attributes:
+        offset (timedelta): 預計送出時間相對開搶時間的偏移
+        court (str): 場地編號
+        overshoot_ns (int): 實際送出時間超過預計送出時間的奈秒數，使用原始連線時是寫入連線後的時間
+        outcome (BookingOutcome): 預約結果
+        response_ns (int): 從送出請求到收到回應的奈秒數
+    """
+
+    offset: timedelta
+    court: str
+    overshoot_ns: int
+    outcome: BookingOutcome
+    response_ns: int = 0
+
+    @property
+    def is_success(self) -> bool:
+        return self.outcome is BookingOutcome.SUCCESS
+
+
+@dataclass
+class SlotResult:
+    """單一預約時段的結果
+
+    Attributes:
+        booking_date (datetime): 預約時段
+        shots (list[ShotResult]): 實際送出的請求結果
+        winning_offset (timedelta | None): 第一個預約成功的請求的偏移，沒有成功則為 None
+        won_courts (list[str]): 保留下來的場地，依優先順序排列
+        released_courts (list[str]): 超過配額而釋出的場地
+    """
+
+    booking_date: datetime
+    shots: list[ShotResult] = field(default_factory=list)
+    winning_offset: timedelta | None = None
+    won_courts: list[str] = field(default_factory=list)
+    released_courts: list[str] = field(default_factory=list)
+
+    @property
+    def is_success(self) -> bool:
+        return self.winning_offset is not None
+
+
+class FiringEngine:
+    """依照 FiringWindow 在開搶時間前後連發搶場地請求
+
+    每一發會同時對所有場地送出，場地依優先順序排列。所有請求依預計送出時間
+    排序後由同一個迴圈依序等待送出，某個時段搶到的場地數達到配額後，該時段
+    還沒送出的請求就會取消；同時搶到超過配額的場地時保留優先順序高的，其餘釋出。
+    有提供 ScheduleIndex 時，時刻表上已被預約的場地時段不會送出請求。
+    有提供 RawConnectionPool 時，請求會預先序列化，開搶時直接寫入預熱好的原始連線，
+    原始連線不夠用時才改用 aiohttp 送出。
+    有提供 SuccessBoard 時，其他行程搶到的場地也算進配額，任何一個行程搶到後
+    所有行程都會停止對該時段送出請求。
+    """
+
+    def __init__(
+        self,
+        service: SportsCenterWebService,
+        session: aiohttp.ClientSession,
+        scheduler: DeadlineScheduler,
+        window: FiringWindow = FiringWindow(),
+        read_full_page: bool = False,
+        courts: tuple[str, ...] | None = None,
+        quota_per_slot: int = 1,
+        schedule_index: ScheduleIndex | None = None,
+        raw_pool: RawConnectionPool | None = None,
+        success_board: "SuccessBoard | None" = None,
+    ) -> None:
+        """
+        Args:
+            service (SportsCenterWebService): 已登入的運動中心服務
+            session (aiohttp.ClientSession): 已經預熱好連線的非同步 session
+            scheduler (DeadlineScheduler): 開搶時間的排程器
+            window (FiringWindow, optional): 連發設定. Defaults to FiringWindow().
+            read_full_page (bool, optional): 為 True 時跟隨重導向並讀取整個結果頁面來判斷結果. Defaults to False.
+            courts (tuple[str, ...] | None, optional): 要搶的場地，依優先順序排列，不指定則使用 service.courts. Defaults to None.
+            quota_per_slot (int, optional): 每個時段最多保留幾個場地. Defaults to 1.
+            schedule_index (ScheduleIndex | None, optional): 開搶前掃描的時刻表索引. Defaults to None.
+            raw_pool (RawConnectionPool | None, optional): 預熱好的原始連線池，read_full_page 為 True 時不會使用. Defaults to None.
+            success_board (SuccessBoard | None, optional): 多個行程共用的搶場地狀態. Defaults to None.
+        """
+        self.service = service
+        self.session = session
+        self.scheduler = scheduler
+        self.window = window
+        self.read_full_page = read_full_page
+        self.courts = courts or service.courts
+        self.quota_per_slot = quota_per_slot
+        self.schedule_index = schedule_index
+        self.raw_pool = None if read_full_page else raw_pool
+        self.success_board = success_board
+        self._prepared: tuple[tuple[datetime, ...], list[tuple]] | None = None
+
+    def prepare(
+        self,
+        booking_periods: tuple[datetime, ...],
+        shard_index: int = 0,
+        shard_count: int = 1,
+    ) -> int:
+        """預先產生所有請求的 url 與送出順序，有原始連線池時也序列化好每個請求，
+        開搶時不做多餘的工作
+
+        必須在開搶前最後一次確認登入狀態與掃描時刻表之後呼叫，之後更新的 cookies
+        與時刻表不會反映在已經準備好的請求上。
+
+        Args:
+            booking_periods (tuple[datetime, ...]): 想要預約的時段
+            shard_index (int, optional): 多個行程分擔請求時，這個行程負責第幾份. Defaults to 0.
+            shard_count (int, optional): 請求要分成幾份，同一時間送出的請求會分散到不同份. Defaults to 1.
+
+        Returns:
+            int: 準備好的請求數
+        """
+        targets = []
+        for slot_index, period in enumerate(booking_periods):
+            for court_index, court in enumerate(self._winnable_courts(booking_date=period)):
+                booking_url = self.service.get_booking_url(booking_date=period, court=court)
+                raw_request = None
+                if self.raw_pool is not None:
+                    cookies = self.session.cookie_jar.filter_cookies(URL(booking_url))
+                    raw_request = build_request(
+                        url=booking_url,
+                        cookies={name: morsel.value for name, morsel in cookies.items()},
+                    )
+                targets.append((slot_index, court_index, court, booking_url, raw_request))
+        if not targets:
+            logging.warning("時刻表上所有想要預約的時段都已被預約，不送出任何請求")
+        elif len(targets) > self.window.max_requests:
+            # 請求數不夠每個目標各送一發時，先捨棄各時段優先順序低的場地，再捨棄後面的時段
+            kept = sorted(targets, key=lambda target: (target[1], target[0]))
+            dropped = kept[self.window.max_requests :]
+            targets = sorted(kept[: self.window.max_requests])
+            logging.warning(
+                "請求數上限 %d 不夠每個場地各送一個請求，略過 %s",
+                self.window.max_requests,
+                ", ".join(
+                    f"{booking_periods[slot_index]:%Y-%m-%d %H:%M} 場地 {court}"
+                    for slot_index, _, court, _, _ in sorted(dropped)
+                ),
+            )
+
+        # 每個 (時段, 場地) 各算一個目標來分配請求數
+        offsets = self.window.shot_offsets(slot_count=len(targets))
+        # 同一個偏移的請求依時段、場地優先順序排在一起，一次送出
+        plan = sorted((offset, *target) for offset in offsets for target in targets)
+        plan = plan[shard_index::shard_count]
+        self._prepared = (booking_periods, plan)
+        return len(plan)
+
+    async def fire(self, booking_periods: tuple[datetime, ...]) -> list[SlotResult]:
+        """對每個預約時段連發請求，直到每個時段都搶到配額或是請求都送完
+
+        Args:
+            booking_periods (tuple[datetime, ...]): 想要預約的時段
+
+        Returns:
+            list[SlotResult]: 每個預約時段的結果，順序和 booking_periods 相同
+        """
+        results = [SlotResult(booking_date=period) for period in booking_periods]
+        if self._prepared is None or self._prepared[0] != booking_periods:
+            self.prepare(booking_periods=booking_periods)
+        _, plan = self._prepared
+        self._prepared = None
+        if not plan:
+            return results
+
+        in_flight = []
+        # aiohttp 的請求要經過好幾輪事件迴圈才會寫入連線，等待下一發時若不讓出事件迴圈，
+        # 前面建立的請求會全部擠到最後一發之後才送出
+        aiohttp_shots: list[asyncio.Task] = []
+        for offset, slot_index, _, court, booking_url, raw_request in plan:
+            result = results[slot_index]
+            if self._is_slot_done(result=result) or court in result.won_courts:
+                continue
+
+            await self.scheduler.wait_for_deadline(
+                offset=offset,
+                log_count_down=False,
+                yield_while_spinning=any(not task.done() for task in aiohttp_shots),
+            )
+            if self._is_slot_done(result=result) or court in result.won_courts:
+                continue
+
+            connection = self.raw_pool.acquire() if raw_request is not None else None
+            if connection is not None:
+                # 直接在迴圈中寫入連線，不用等到 task 被排程才送出
+                connection.send(request=raw_request)
+                shot = self._fire_raw_shot(
+                    result=result,
+                    connection=connection,
+                    offset=offset,
+                    court=court,
+                    overshoot_ns=self.scheduler.overshoot_ns(offset=offset),
+                    sent_ns=time.perf_counter_ns(),
+                )
+            else:
+                if raw_request is not None:
+                    logging.debug("原始連線不足，改用 aiohttp 送出請求")
+                shot = self._fire_shot(
+                    result=result,
+                    booking_url=booking_url,
+                    offset=offset,
+                    court=court,
+                )
+            task = asyncio.create_task(shot)
+            in_flight.append(task)
+            if connection is None:
+                aiohttp_shots.append(task)
+
+        # send_booking_request 不會拋出例外，這裡保險起見也不讓單一請求的例外中斷其他請求
+        for error in await asyncio.gather(*in_flight, return_exceptions=True):
+            if isinstance(error, Exception):
+                logging.error("搶場地請求發生未預期的錯誤： %r", error)
+
+        await asyncio.gather(*(self.release_extra_courts(result=r) for r in results))
+
+        for result in results:
+            if result.is_success:
+                logging.info(
+                    "%s 的場地預約成功，場地 %s，第一個成功的是偏移 %.0f 毫秒的請求 (共送出 %d 個請求)",
+                    result.booking_date.strftime("%Y-%m-%d %H:%M"),
+                    ", ".join(result.won_courts),
+                    result.winning_offset.total_seconds() * 1000,
+                    len(result.shots),
+                )
+            elif self.success_board is not None and self._is_slot_done(result=result):
+                # 其他工作行程已經搶到，這個行程沒有搶到或沒有送出請求都不算失敗
+                logging.info(
+                    "%s 的場地已由其他工作行程搶到 (這個行程送出 %d 個請求)",
+                    result.booking_date.strftime("%Y-%m-%d %H:%M"),
+                    len(result.shots),
+                )
+            else:
+                logging.info(
+                    "%s 的場地預約失敗 (共送出 %d 個請求)",
+                    result.booking_date.strftime("%Y-%m-%d %H:%M"),
+                    len(result.shots),
+                )
+
+        return results
+
+    def _winnable_courts(self, booking_date: datetime) -> tuple[str, ...]:
+        if self.schedule_index is None:
+            return self.courts
+
+        courts = self.schedule_index.winnable_courts(
+            center=self.service.sports_center_name(),
+            courts=self.courts,
+            booking_date=booking_date,
+        )
+        if len(courts) < len(self.courts):
+            logging.info(
+                "%s 略過時刻表上已被預約的場地 %s",
+                booking_date.strftime("%Y-%m-%d %H:%M"),
+                ", ".join(c for c in self.courts if c not in courts),
+            )
+        return courts
+
+    def _is_slot_done(self, result: SlotResult) -> bool:
+        won_count = len(result.won_courts)
+        if self.success_board is not None:
+            won_count = max(won_count, self.success_board.won_count(result.booking_date))
+        return won_count >= self.quota_per_slot
+
+    async def _fire_shot(
+        self, result: SlotResult, booking_url: str, offset: timedelta, court: str
+    ) -> None:
+        overshoot_ns = self.scheduler.overshoot_ns(offset=offset)
+        sent_ns = time.perf_counter_ns()
+        outcome = await self.service.send_booking_request(
+            session=self.session,
+            booking_url=booking_url,
+            read_full_page=self.read_full_page,
+        )
+
+        self._record_shot(
+            result=result,
+            shot=ShotResult(
+                offset=offset,
+                court=court,
+                overshoot_ns=overshoot_ns,
+                outcome=outcome,
+                response_ns=time.perf_counter_ns() - sent_ns,
+            ),
+        )
+
+    async def _fire_raw_shot(
+        self,
+        result: SlotResult,
+        connection: RawConnection,
+        offset: timedelta,
+        court: str,
+        overshoot_ns: int,
+        sent_ns: int,
+    ) -> None:
+        outcome = await self.service.read_raw_booking_response(connection=connection)
+        response_ns = time.perf_counter_ns() - sent_ns
+        self.raw_pool.release(connection=connection)
+        self._record_shot(
+            result=result,
+            shot=ShotResult(
+                offset=offset,
+                court=court,
+                overshoot_ns=overshoot_ns,
+                outcome=outcome,
+                response_ns=response_ns,
+            ),
+        )
+
+    def _record_shot(self, result: SlotResult, shot: ShotResult) -> None:
+        logging.debug(
+            "%s 場地 %s 偏移 %.0f 毫秒的請求：%s，超過預計時間 %.3f 毫秒，回應時間 %.1f 毫秒",
+            result.booking_date.strftime("%Y-%m-%d %H:%M"),
+            shot.court,
+            shot.offset.total_seconds() * 1000,
+            shot.outcome.value,
+            shot.overshoot_ns / 1e6,
+            shot.response_ns / 1e6,
+        )
+        result.shots.append(shot)
+        if shot.is_success and shot.court not in result.won_courts:
+            result.won_courts.append(shot.court)
+            if self.success_board is not None:
+                self.success_board.record_win(booking_date=result.booking_date)
+            if result.winning_offset is None:
+                result.winning_offset = shot.offset
+
+    async def release_extra_courts(self, result: SlotResult) -> None:
+        """同時送出的請求可能讓同一個時段搶到超過配額的場地，保留優先順序高的，其餘釋出
+
+        Args:
+            result (SlotResult): 預約時段的結果，會直接更新 won_courts 與 released_courts
+        """
+        result.won_courts.sort(key=self.courts.index)
+        extra_courts = result.won_courts[self.quota_per_slot :]
+        del result.won_courts[self.quota_per_slot :]
+
+        for court in extra_courts:
+            is_released = await self.service.cancel_booking(
+                session=self.session, booking_date=result.booking_date, court=court
+            )
+            if is_released:
+                result.released_courts.append(court)
+                logging.info(
+                    "已釋出 %s 重複搶到的場地 %s",
+                    result.booking_date.strftime("%Y-%m-%d %H:%M"),
+                    court,
+                )
+            else:
+                logging.warning(
+                    "%s 重複搶到場地 %s，無法自動取消，請手動到網站取消",
+                    result.booking_date.strftime("%Y-%m-%d %H:%M"),
+                    court,
+                )
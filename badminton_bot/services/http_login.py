@@ -0,0 +1,201 @@
+"""不開瀏覽器，直接用 HTTP 走 ASP.NET 登入表單流程"""
+
+import logging
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import aiohttp
+from utils.exchange_recorder import recorder
+
+
+@dataclass
+class LoginPage:
+    """從登入頁或登入後頁面解析出來的資訊
+
+    Attributes:
+        form_action (str | None): 登入表單送出的網址
+        fields (dict[str, str]): 表單中所有 input 的 name 與 value，包含隱藏欄位
+        field_names_by_id (dict[str, str]): input 的 id 對應到 name
+        element_texts (dict[str, str]): 指定 id 的元素的文字內容
+        logout_href (str | None): 登出連結的網址
+    """
+
+    form_action: str | None = None
+    fields: dict[str, str] = field(default_factory=dict)
+    field_names_by_id: dict[str, str] = field(default_factory=dict)
+    element_texts: dict[str, str] = field(default_factory=dict)
+    logout_href: str | None = None
+
+
+class LoginPageParser(HTMLParser):
+    """解析 ASP.NET 登入頁面，收集表單欄位與指定 id 元素的文字"""
+
+    def __init__(self, watched_element_ids: tuple[str, ...] = ()) -> None:
+        """
+        Args:
+            watched_element_ids (tuple[str, ...], optional): 要收集文字內容的元素 id. Defaults to ().
+        """
+        super().__init__(convert_charrefs=True)
+        self.page = LoginPage()
+        self._watched_element_ids = watched_element_ids
+        self._open_elements: list[tuple[str, str | None]] = []
+        self._current_href: str | None = None
+        self._current_anchor_text = ""
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        attributes = dict(attrs)
+        element_id = attributes.get("id")
+
+        if tag == "form" and self.page.form_action is None:
+            self.page.form_action = attributes.get("action") or ""
+        elif tag == "input" and attributes.get("name"):
+            self._add_input(attributes=attributes)
+        elif tag == "a":
+            self._current_href = attributes.get("href")
+            self._current_anchor_text = ""
+
+        if element_id in self._watched_element_ids:
+            self.page.element_texts.setdefault(element_id, "")
+        if tag not in ("input", "br", "img", "meta", "link"):
+            self._open_elements.append((tag, element_id))
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "a":
+            if "[登出]" in self._current_anchor_text and self._current_href:
+                self.page.logout_href = self._current_href
+            self._current_href = None
+
+        # 往回找到對應的開始標籤，容忍沒有正確關閉的標籤
+        for index in range(len(self._open_elements) - 1, -1, -1):
+            if self._open_elements[index][0] == tag:
+                del self._open_elements[index:]
+                break
+
+    def handle_data(self, data: str) -> None:
+        if self._current_href is not None:
+            self._current_anchor_text += data
+
+        for _, element_id in self._open_elements:
+            if element_id in self._watched_element_ids:
+                self.page.element_texts[element_id] += data
+
+    def _add_input(self, attributes: dict[str, str | None]) -> None:
+        input_type = (attributes.get("type") or "text").lower()
+        # 按鈕與沒有勾選的選項不會隨著表單送出
+        if input_type in ("submit", "button", "image", "reset"):
+            return
+        if input_type in ("checkbox", "radio") and "checked" not in attributes:
+            return
+
+        name = attributes["name"]
+        self.page.fields[name] = attributes.get("value") or ""
+        if attributes.get("id"):
+            self.page.field_names_by_id[attributes["id"]] = name
+
+
+def parse_login_page(html: str, watched_element_ids: tuple[str, ...] = ()) -> LoginPage:
+    """解析登入頁面
+
+    Args:
+        html (str): 頁面 html
+        watched_element_ids (tuple[str, ...], optional): 要收集文字內容的元素 id. Defaults to ().
+
+    Returns:
+        LoginPage: 解析結果
+    """
+    parser = LoginPageParser(watched_element_ids=watched_element_ids)
+    parser.feed(html)
+    parser.close()
+    return parser.page
+
+
+@dataclass
+class HttpLoginResult:
+    """HTTP 登入的結果
+
+    Attributes:
+        is_login (bool): 是否登入成功
+        message (str): 成功時為歡迎訊息，失敗時為錯誤訊息
+        cookies (dict[str, str]): 登入後 session 中的 cookies
+        logout_url (str | None): 登出連結的網址
+    """
+
+    is_login: bool
+    message: str
+    cookies: dict[str, str]
+    logout_url: str | None = None
+
+
+async def login_via_http(
+    session: aiohttp.ClientSession,
+    login_page_url: str,
+    username_input_id: str,
+    password_input_id: str,
+    login_user_name_id: str,
+    login_failed_message_id: str,
+    username: str,
+    password: str,
+) -> HttpLoginResult:
+    """讀取登入頁面的隱藏欄位，填入帳密後送出表單，再從回應判斷是否登入成功
+
+    Args:
+        session (aiohttp.ClientSession): 用來登入的 session，登入後的 cookies 會留在它的 cookie jar
+        login_page_url (str): 登入頁網址
+        username_input_id (str): 帳號輸入框的元素 id
+        password_input_id (str): 密碼輸入框的元素 id
+        login_user_name_id (str): 登入成功後顯示使用者名稱的元素 id
+        login_failed_message_id (str): 登入失敗時顯示錯誤訊息的元素 id
+        username (str): 帳號
+        password (str): 密碼
+
+    Raises:
+        ValueError: 登入頁面中找不到表單或帳密欄位時發出的例外
+
+    Returns:
+        HttpLoginResult: 登入結果
+    """
+    watched_element_ids = (login_user_name_id, login_failed_message_id)
+
+    async with session.get(login_page_url, ssl=False) as response:
+        login_page = parse_login_page(
+            html=await response.text(), watched_element_ids=watched_element_ids
+        )
+        page_url = str(response.url)
+
+    if login_page.form_action is None:
+        raise ValueError("登入頁面中找不到登入表單")
+
+    form_data = dict(login_page.fields)
+    for element_id, value in ((username_input_id, username), (password_input_id, password)):
+        field_name = login_page.field_names_by_id.get(element_id)
+        if field_name is None:
+            raise ValueError(f"登入頁面中找不到 {element_id} 欄位")
+        form_data[field_name] = value
+        recorder.add_secret_fields(field_name)
+
+    logging.info("登入中...")
+    form_url = urljoin(page_url, login_page.form_action)
+    async with session.post(form_url, data=form_data, ssl=False) as response:
+        result_page = parse_login_page(
+            html=await response.text(), watched_element_ids=watched_element_ids
+        )
+        result_url = str(response.url)
+
+    cookies = {cookie.key: cookie.value for cookie in session.cookie_jar}
+    welcome_message = result_page.element_texts.get(login_user_name_id, "").strip()
+    if login_user_name_id in result_page.element_texts:
+        logout_url = None
+        if result_page.logout_href and not result_page.logout_href.startswith(
+            "javascript:"
+        ):
+            logout_url = urljoin(result_url, result_page.logout_href)
+
+        return HttpLoginResult(
+            is_login=True, message=welcome_message, cookies=cookies, logout_url=logout_url
+        )
+
+    error_message = result_page.element_texts.get(login_failed_message_id, "").strip()
+    return HttpLoginResult(
+        is_login=False, message=error_message or "登入失敗，無法辨識登入結果", cookies=cookies
+    )
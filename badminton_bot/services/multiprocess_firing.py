@@ -0,0 +1,364 @@
+"""把開搶的請求分散到多個工作行程同時送出
+
+每個工作行程各自建立並預熱自己的連線，從共享記憶體讀取開搶時間後各自倒數並送出
+分配到的請求；任何一個行程搶到場地時會寫入共享的 SuccessBoard，所有行程都會立刻
+停止對該時段送出請求。主行程最後合併所有工作行程的結果與送出時間。
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack, ExitStack
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from utils.connection_warmer import ConnectionWarmer
+from utils.deadline_scheduler import PRE_FIRING_TASK_MARGIN, DeadlineScheduler
+from utils.log_pipeline import LogPipeline
+from utils.low_jitter import enter_low_jitter_mode, run_event_loop
+from utils.raw_http import RawConnectionPool
+from utils.success_board import SuccessBoard
+
+from .availability_scanner import ScheduleIndex
+from .configured_sports_center_webservice import create_webservice_classes
+from .firing_engine import FiringEngine, FiringWindow, SlotResult
+from .sports_center_webservice import LOGIN_BACKEND_HTTP
+
+WORKER_LOG_FORMAT = "%(asctime)s - %(levelname)s - [%(processName)s] %(message)s"
+
+
+@dataclass(frozen=True)
+class WorkerAccount:
+    """交給工作行程的已登入帳號
+
+    Attributes:
+        username (str): 身分證字號
+        cookies (dict[str, str]): 登入後的 cookies
+        booking_periods (tuple[datetime, ...]): 分配到的時段
+    """
+
+    username: str
+    cookies: dict[str, str] = field(repr=False)
+    booking_periods: tuple[datetime, ...]
+
+
+@dataclass(frozen=True)
+class WorkerSpec:
+    """單一工作行程需要的所有資訊，會被 pickle 傳給工作行程
+
+    Attributes:
+        worker_index (int): 工作行程的編號，也是負責的請求份數編號
+        worker_count (int): 工作行程數
+        center_key (str): 運動中心在 sports_centers.json 中的代號
+        base_url (str | None): 運動中心網站網址
+        accounts (tuple[WorkerAccount, ...]): 要搶場地的帳號
+        board (SuccessBoard): 共用的開搶時間與搶場地狀態
+        window (FiringWindow): 連發設定
+        pool_size (int): 這個工作行程要預熱的連線數
+        schedule_index (ScheduleIndex | None): 開搶前掃描的時刻表索引
+        raw_socket (bool): 是否把預先序列化好的請求直接寫入原始連線
+        low_jitter (bool): 開搶前後是否進入低抖動模式
+        log_level (int): 工作行程的 log 等級
+    """
+
+    worker_index: int
+    worker_count: int
+    center_key: str
+    base_url: str | None
+    accounts: tuple[WorkerAccount, ...]
+    board: SuccessBoard
+    window: FiringWindow
+    pool_size: int
+    schedule_index: ScheduleIndex | None = None
+    raw_socket: bool = False
+    low_jitter: bool = False
+    log_level: int = logging.INFO
+
+
+@dataclass
+class WorkerReport:
+    """工作行程回傳給主行程的結果
+
+    Attributes:
+        worker_index (int): 工作行程的編號
+        pid (int): 工作行程的 pid
+        connections (int): 開搶前可用的連線數
+        results (dict[str, list[SlotResult]]): 以帳號為索引的每個時段結果
+    """
+
+    worker_index: int
+    pid: int
+    connections: int
+    results: dict[str, list[SlotResult]]
+
+
+class MultiProcessFiring:
+    """在多個工作行程中同時倒數並送出搶場地請求"""
+
+    def __init__(
+        self,
+        center_key: str,
+        window: FiringWindow,
+        worker_count: int,
+        base_url: str | None = None,
+        raw_socket: bool = False,
+        low_jitter: bool = False,
+    ) -> None:
+        """
+        Args:
+            center_key (str): 運動中心在 sports_centers.json 中的代號
+            window (FiringWindow): 連發設定
+            worker_count (int): 工作行程數
+            base_url (str | None, optional): 運動中心網站網址，不指定則使用正式網站. Defaults to None.
+            raw_socket (bool, optional): 是否把預先序列化好的請求直接寫入原始連線. Defaults to False.
+            low_jitter (bool, optional): 開搶前後是否進入低抖動模式，每個工作行程綁定不同的 CPU. Defaults to False.
+        """
+        self.center_key = center_key
+        self.window = window
+        self.worker_count = worker_count
+        self.base_url = base_url
+        self.raw_socket = raw_socket
+        self.low_jitter = low_jitter
+        self.reports: list[WorkerReport] = []
+
+    async def fire(
+        self,
+        accounts: tuple[WorkerAccount, ...],
+        booking_date: datetime,
+        clock_offset: timedelta,
+        pool_size: int,
+        schedule_index: ScheduleIndex | None = None,
+    ) -> dict[str, list[SlotResult]]:
+        """啟動工作行程，等待所有工作行程開搶結束後合併結果
+
+        Args:
+            accounts (tuple[WorkerAccount, ...]): 已登入的帳號與分配到的時段
+            booking_date (datetime): 校時後的本機送出時間
+            clock_offset (timedelta): 本機送出時間相對伺服器開搶時間的偏移
+            pool_size (int): 所有工作行程加起來要預熱的連線數
+            schedule_index (ScheduleIndex | None, optional): 開搶前掃描的時刻表索引. Defaults to None.
+
+        Returns:
+            dict[str, list[SlotResult]]: 以帳號為索引、合併所有工作行程後的每個時段結果
+        """
+        board = SuccessBoard(
+            booking_periods=tuple(
+                period for account in accounts for period in account.booking_periods
+            ),
+            worker_count=self.worker_count,
+        )
+        board.publish_deadline(booking_date=booking_date, clock_offset=clock_offset)
+        specs = [
+            WorkerSpec(
+                worker_index=worker_index,
+                worker_count=self.worker_count,
+                center_key=self.center_key,
+                base_url=self.base_url,
+                accounts=accounts,
+                board=board,
+                window=self.window,
+                pool_size=-(-pool_size // self.worker_count),
+                schedule_index=schedule_index,
+                raw_socket=self.raw_socket,
+                low_jitter=self.low_jitter,
+                log_level=logging.getLogger().getEffectiveLevel(),
+            )
+            for worker_index in range(self.worker_count)
+        ]
+
+        loop = asyncio.get_running_loop()
+        # 用 spawn 啟動乾淨的行程，不複製主行程的 event loop 與瀏覽器池的執行緒
+        executor = ProcessPoolExecutor(
+            max_workers=self.worker_count,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        try:
+            logging.info("啟動 %d 個工作行程", self.worker_count)
+            self.reports = await asyncio.gather(
+                *(loop.run_in_executor(executor, run_worker, spec) for spec in specs)
+            )
+        finally:
+            executor.shutdown(wait=True)
+            board.close()
+            board.unlink()
+
+        for report in self.reports:
+            shots = [
+                shot
+                for slot_results in report.results.values()
+                for result in slot_results
+                for shot in result.shots
+            ]
+            logging.info(
+                "工作行程 #%d (pid %d)：%d 條連線可用，送出 %d 個請求，最大超過預計時間 %.3f 毫秒",
+                report.worker_index,
+                report.pid,
+                report.connections,
+                len(shots),
+                max((shot.overshoot_ns for shot in shots), default=0) / 1e6,
+            )
+
+        return {
+            account.username: merge_slot_results(
+                [report.results[account.username] for report in self.reports]
+            )
+            for account in accounts
+        }
+
+
+def merge_slot_results(results_by_worker: list[list[SlotResult]]) -> list[SlotResult]:
+    """合併多個工作行程對同一組時段的結果
+
+    Args:
+        results_by_worker (list[list[SlotResult]]): 每個工作行程的結果，每個串列的時段順序都相同
+
+    Returns:
+        list[SlotResult]: 合併後的結果，請求依預計送出時間排序
+    """
+    merged = []
+    for slot_results in zip(*results_by_worker):
+        result = SlotResult(booking_date=slot_results[0].booking_date)
+        for worker_result in slot_results:
+            result.shots.extend(worker_result.shots)
+            result.won_courts.extend(
+                court for court in worker_result.won_courts if court not in result.won_courts
+            )
+            result.released_courts.extend(worker_result.released_courts)
+        result.shots.sort(key=lambda shot: shot.offset)
+        result.winning_offset = min(
+            (r.winning_offset for r in slot_results if r.winning_offset is not None),
+            default=None,
+        )
+        merged.append(result)
+    return merged
+
+
+def run_worker(spec: WorkerSpec) -> WorkerReport:
+    """工作行程的進入點
+
+    Args:
+        spec (WorkerSpec): 工作行程需要的所有資訊
+
+    Returns:
+        WorkerReport: 工作行程的結果
+    """
+    # 工作行程結束時不會執行 atexit，所以在回傳前自行停止 log 管線
+    log_pipeline = LogPipeline(level=spec.log_level, log_format=WORKER_LOG_FORMAT)
+    log_pipeline.start()
+    spec.board.worker_index = spec.worker_index
+    try:
+        return run_event_loop(_run_worker(spec=spec), use_uvloop=spec.low_jitter)
+    finally:
+        spec.board.close()
+        log_pipeline.stop()
+
+
+async def _run_worker(spec: WorkerSpec) -> WorkerReport:
+    webservice = {cls.CENTER.key: cls for cls in create_webservice_classes()}[spec.center_key]
+    # 工作行程不需要登入，只用主行程登入後的 cookies 送出請求
+    services = {
+        account.username: webservice(
+            username=account.username,
+            password="",
+            login_backend=LOGIN_BACKEND_HTTP,
+            base_url=spec.base_url,
+        )
+        for account in spec.accounts
+    }
+    login_page_url = next(iter(services.values())).login_page_url
+
+    low_jitter_stack = ExitStack()
+    async with AsyncExitStack() as stack:
+        stack.callback(low_jitter_stack.close)
+        warmer = ConnectionWarmer(url=login_page_url, pool_size=spec.pool_size)
+        connector = warmer.create_connector()
+        stack.push_async_callback(connector.close)
+        sessions = {
+            account.username: await stack.enter_async_context(
+                warmer.create_session(cookies=account.cookies, connector=connector)
+            )
+            for account in spec.accounts
+        }
+        first_session = next(iter(sessions.values()))
+        connections = await warmer.warm_up(session=first_session)
+
+        raw_pool = None
+        if spec.raw_socket:
+            raw_pool = RawConnectionPool(url=login_page_url, pool_size=spec.pool_size)
+            stack.push_async_callback(raw_pool.close)
+            connections = await raw_pool.warm_up()
+
+        # 開搶時間是主行程啟動工作行程前校時的結果，之後不會再更新
+        scheduler = DeadlineScheduler(booking_date=spec.board.booking_date)
+        logging.info(
+            "工作行程 #%d 開搶時間 %s (時鐘偏移 %.1f 毫秒)",
+            spec.worker_index,
+            scheduler.booking_date,
+            spec.board.clock_offset.total_seconds() * 1000,
+        )
+        # 和主行程一樣讓所有帳號共用 window.max_requests
+        windows = spec.window.split(
+            target_counts={
+                account.username: len(account.booking_periods)
+                * len(services[account.username].courts)
+                for account in spec.accounts
+            }
+        )
+        engines = {
+            account.username: FiringEngine(
+                service=services[account.username],
+                session=sessions[account.username],
+                scheduler=scheduler,
+                window=windows[account.username],
+                schedule_index=spec.schedule_index,
+                raw_pool=raw_pool,
+                success_board=spec.board,
+            )
+            for account in spec.accounts
+        }
+        for account in spec.accounts:
+            engines[account.username].prepare(
+                booking_periods=account.booking_periods,
+                shard_index=spec.worker_index,
+                shard_count=spec.worker_count,
+            )
+
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else [None]
+        # 開搶只取決於倒數，來不及在開搶前完成的維持連線請求會被取消
+        await scheduler.wait_for_deadline_with_tasks(
+            offset=spec.window.window_start - PRE_FIRING_TASK_MARGIN,
+            tasks=[
+                warmer.keep_alive(session=first_session, scheduler=scheduler),
+                *([raw_pool.keep_alive(scheduler=scheduler)] if raw_pool else []),
+                *(
+                    [
+                        enter_low_jitter_mode(
+                            scheduler=scheduler,
+                            stack=low_jitter_stack,
+                            # 每個工作行程綁定不同的 CPU
+                            cpu=cpus[spec.worker_index % len(cpus)],
+                        )
+                    ]
+                    if spec.low_jitter
+                    else []
+                ),
+            ],
+            log_count_down=False,
+        )
+        await scheduler.wait_for_deadline(offset=spec.window.window_start, log_count_down=False)
+        fired = await asyncio.gather(
+            *(
+                engines[account.username].fire(booking_periods=account.booking_periods)
+                for account in spec.accounts
+            )
+        )
+        low_jitter_stack.close()
+
+    return WorkerReport(
+        worker_index=spec.worker_index,
+        pid=os.getpid(),
+        connections=connections,
+        results={account.username: results for account, results in zip(spec.accounts, fired)},
+    )
@@ -0,0 +1,362 @@
+"""以 SQLite 保存每次開搶的結果，並依歷史紀錄調整每個運動中心的送出偏移與連發區間
+
+每一發請求都會記錄相對伺服器開搶時間的實際送出時間與結果，同一次開搶中最後一個
+X=2 (還沒開放) 與第一個 X=1 (預約成功) 之間就是伺服器實際開放預約的時間點。
+累積幾次紀錄後，把送出時間對準這個時間點，連發區間則依每次的差異與網路延遲的抖動決定。
+"""
+
+import dataclasses
+import logging
+import sqlite3
+import statistics
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .firing_engine import FiringWindow, SlotResult
+from .sports_center_webservice import BookingOutcome
+
+DEFAULT_RUN_HISTORY_PATH = Path.home() / ".badminton_bot" / "history.sqlite3"
+# 至少要有幾次可以判斷開放時間的紀錄才提供建議
+MIN_TUNING_RUNS = 3
+# 只參考最近幾次的紀錄，網站或網路環境改變後可以較快反映
+TUNING_RUN_LIMIT = 10
+# 連發區間在歷史差異與網路抖動之外再多保留的時間
+TUNING_MARGIN = timedelta(milliseconds=10)
+# 和手動輸入的偏移毫秒數使用相同的範圍
+MAX_SEND_OFFSET = timedelta(milliseconds=1000)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    center TEXT NOT NULL,
+    planned_booking_date TEXT NOT NULL,
+    clock_offset_us INTEGER NOT NULL,
+    send_offset_us INTEGER NOT NULL,
+    window_start_us INTEGER NOT NULL,
+    window_end_us INTEGER NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shots (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    username TEXT NOT NULL,
+    booking_date TEXT NOT NULL,
+    court TEXT NOT NULL,
+    offset_us INTEGER NOT NULL,
+    overshoot_ns INTEGER NOT NULL,
+    response_ns INTEGER NOT NULL,
+    outcome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_center ON runs (center, planned_booking_date);
+CREATE INDEX IF NOT EXISTS shots_run ON shots (run_id);
+"""
+
+
+@dataclass(frozen=True)
+class ShotRecord:
+    """保存下來的單一請求
+
+    Attributes:
+        username (str): 送出請求的帳號
+        booking_date (datetime): 預約時段
+        court (str): 場地編號
+        offset (timedelta): 預計送出時間相對本機送出時間的偏移
+        overshoot_ns (int): 實際送出時間超過預計送出時間的奈秒數
+        response_ns (int): 從送出請求到收到回應的奈秒數
+        outcome (BookingOutcome): 預約結果
+    """
+
+    username: str
+    booking_date: datetime
+    court: str
+    offset: timedelta
+    overshoot_ns: int
+    response_ns: int
+    outcome: BookingOutcome
+
+
+@dataclass(frozen=True)
+class RunRecord:
+    """保存下來的一次開搶
+
+    Attributes:
+        center (str): sports_centers.json 中的運動中心 key
+        planned_booking_date (datetime): 伺服器時間的開搶時間，不含送出偏移
+        clock_offset (timedelta): 校時後的本機送出時間相對 planned_booking_date 加上送出偏移的差距
+        send_offset (timedelta): 這次使用的送出偏移
+        window (tuple[timedelta, timedelta]): 這次使用的連發區間
+        shots (tuple[ShotRecord, ...]): 實際送出的請求
+        run_id (int | None): 資料庫中的編號
+    """
+
+    center: str
+    planned_booking_date: datetime
+    clock_offset: timedelta
+    send_offset: timedelta
+    window: tuple[timedelta, timedelta]
+    shots: tuple[ShotRecord, ...]
+    run_id: int | None = None
+
+    def arrival_offset(self, shot: ShotRecord) -> timedelta:
+        """請求實際送出時間相對伺服器開搶時間的偏移，校時已經扣掉網路單程延遲
+
+        Args:
+            shot (ShotRecord): 這次開搶的請求
+
+        Returns:
+            timedelta: 相對 planned_booking_date 的偏移
+        """
+        return self.send_offset + shot.offset + timedelta(microseconds=shot.overshoot_ns / 1e3)
+
+    def opening_bracket(self) -> tuple[timedelta, timedelta] | None:
+        """依請求的結果推算伺服器實際開放預約的時間範圍
+
+        只參考和第一個成功的請求相同時段、相同場地的請求，其他時段或場地的失敗可能是已經被別人搶走，
+        不代表當時還沒開放。
+
+        Returns:
+            tuple[timedelta, timedelta] | None: 最後一個還沒開放的請求與第一個成功的請求相對
+                planned_booking_date 的偏移，沒有搶到場地或成功的請求之前沒有失敗的請求時無法判斷，回傳 None
+        """
+        wins = [shot for shot in self.shots if shot.outcome is BookingOutcome.SUCCESS]
+        if not wins:
+            return None
+
+        first_win = min(wins, key=self.arrival_offset)
+        first_win_offset = self.arrival_offset(first_win)
+        early_failures = [
+            self.arrival_offset(shot)
+            for shot in self.shots
+            if shot.outcome is BookingOutcome.FAILED
+            and (shot.booking_date, shot.court) == (first_win.booking_date, first_win.court)
+            and self.arrival_offset(shot) < first_win_offset
+        ]
+        if not early_failures:
+            # 第一發就成功只知道開放時間不晚於第一發，例如倒數太晚才開始時整批請求都晚送出
+            return None
+        return max(early_failures), first_win_offset
+
+
+@dataclass(frozen=True)
+class TuningSuggestion:
+    """依歷史紀錄建議的送出設定
+
+    Attributes:
+        center (str): sports_centers.json 中的運動中心 key
+        send_offset (timedelta): 建議的送出偏移，取代手動輸入的偏移毫秒數
+        window (FiringWindow): 建議的連發設定
+        run_count (int): 參考的開搶次數
+    """
+
+    center: str
+    send_offset: timedelta
+    window: FiringWindow
+    run_count: int
+
+
+class RunHistory:
+    """保存每次開搶結果的 SQLite 資料庫"""
+
+    def __init__(self, path: Path = DEFAULT_RUN_HISTORY_PATH) -> None:
+        """
+        Args:
+            path (Path, optional): 資料庫檔案路徑. Defaults to DEFAULT_RUN_HISTORY_PATH.
+        """
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def record_run(
+        self,
+        center: str,
+        planned_booking_date: datetime,
+        clock_offset: timedelta,
+        send_offset: timedelta,
+        window: FiringWindow,
+        results: dict[str, list[SlotResult]],
+    ) -> int:
+        """保存一次開搶的所有請求
+
+        Args:
+            center (str): sports_centers.json 中的運動中心 key
+            planned_booking_date (datetime): 伺服器時間的開搶時間，不含送出偏移
+            clock_offset (timedelta): 校時後的本機送出時間相對伺服器送出時間的差距
+            send_offset (timedelta): 這次使用的送出偏移
+            window (FiringWindow): 這次使用的連發設定
+            results (dict[str, list[SlotResult]]): 以帳號為索引的每個時段結果
+
+        Returns:
+            int: 這次開搶的 run_id
+        """
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (center, planned_booking_date, clock_offset_us, send_offset_us, "
+                "window_start_us, window_end_us, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    center,
+                    planned_booking_date.isoformat(),
+                    _to_us(clock_offset),
+                    _to_us(send_offset),
+                    _to_us(window.window_start),
+                    _to_us(window.window_end),
+                    datetime.now().isoformat(),
+                ),
+            )
+            run_id = cursor.lastrowid
+            self._connection.executemany(
+                "INSERT INTO shots (run_id, username, booking_date, court, offset_us, "
+                "overshoot_ns, response_ns, outcome) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        username,
+                        result.booking_date.isoformat(),
+                        shot.court,
+                        _to_us(shot.offset),
+                        shot.overshoot_ns,
+                        shot.response_ns,
+                        shot.outcome.value,
+                    )
+                    for username, slot_results in results.items()
+                    for result in slot_results
+                    for shot in result.shots
+                ],
+            )
+        return run_id
+
+    def recent_runs(self, center: str, limit: int = TUNING_RUN_LIMIT) -> list[RunRecord]:
+        """讀取某個運動中心最近幾次的開搶紀錄
+
+        Args:
+            center (str): sports_centers.json 中的運動中心 key
+            limit (int, optional): 最多讀取幾次. Defaults to TUNING_RUN_LIMIT.
+
+        Returns:
+            list[RunRecord]: 由新到舊排序的紀錄
+        """
+        rows = self._connection.execute(
+            "SELECT * FROM runs WHERE center = ? ORDER BY planned_booking_date DESC, run_id DESC "
+            "LIMIT ?",
+            (center, limit),
+        ).fetchall()
+        return [self._to_run(row=row) for row in rows]
+
+    def centers(self) -> list[str]:
+        """列出有紀錄的運動中心"""
+        rows = self._connection.execute("SELECT DISTINCT center FROM runs ORDER BY center").fetchall()
+        return [row["center"] for row in rows]
+
+    def _to_run(self, row: sqlite3.Row) -> RunRecord:
+        shot_rows = self._connection.execute(
+            "SELECT * FROM shots WHERE run_id = ? ORDER BY offset_us", (row["run_id"],)
+        ).fetchall()
+        return RunRecord(
+            center=row["center"],
+            planned_booking_date=datetime.fromisoformat(row["planned_booking_date"]),
+            clock_offset=timedelta(microseconds=row["clock_offset_us"]),
+            send_offset=timedelta(microseconds=row["send_offset_us"]),
+            window=(
+                timedelta(microseconds=row["window_start_us"]),
+                timedelta(microseconds=row["window_end_us"]),
+            ),
+            shots=tuple(
+                ShotRecord(
+                    username=shot["username"],
+                    booking_date=datetime.fromisoformat(shot["booking_date"]),
+                    court=shot["court"],
+                    offset=timedelta(microseconds=shot["offset_us"]),
+                    overshoot_ns=shot["overshoot_ns"],
+                    response_ns=shot["response_ns"],
+                    outcome=BookingOutcome(shot["outcome"]),
+                )
+                for shot in shot_rows
+            ),
+            run_id=row["run_id"],
+        )
+
+
+class FiringTuner:
+    """依 RunHistory 中的紀錄建議下一次開搶的送出偏移與連發區間"""
+
+    def __init__(self, history: RunHistory, base_window: FiringWindow = FiringWindow()) -> None:
+        """
+        Args:
+            history (RunHistory): 開搶紀錄
+            base_window (FiringWindow, optional): 只調整連發區間，其他連發設定沿用這個設定. Defaults to FiringWindow().
+        """
+        self.history = history
+        self.base_window = base_window
+
+    def suggest(self, center: str) -> TuningSuggestion | None:
+        """依最近的紀錄建議送出設定
+
+        送出偏移對準歷次開放時間的中位數，連發區間涵蓋歷次開放時間與中位數的最大差距，
+        再加上單次推算的誤差、網路延遲在歷次開搶間的變化與 TUNING_MARGIN。連發區間會隨著紀錄
+        累積、每次推算的範圍變窄而縮小。
+
+        Args:
+            center (str): sports_centers.json 中的運動中心 key
+
+        Returns:
+            TuningSuggestion | None: 建議的設定，可以判斷開放時間的紀錄不足 MIN_TUNING_RUNS 次時回傳 None
+        """
+        runs = self.history.recent_runs(center=center)
+        brackets = [bracket for run in runs if (bracket := run.opening_bracket()) is not None]
+        edges = [(lower + upper) / 2 for lower, upper in brackets]
+        if len(edges) < MIN_TUNING_RUNS:
+            logging.info(
+                "%s 只有 %d 次可以判斷開放時間的紀錄，至少需要 %d 次才能建議送出設定",
+                center,
+                len(edges),
+                MIN_TUNING_RUNS,
+            )
+            return None
+
+        edge = statistics.median(edges)
+        spread = max(abs(e - edge) for e in edges)
+        uncertainty = max((upper - lower) / 2 for lower, upper in brackets)
+        # 每次開搶最快的回應最接近純網路延遲，不受伺服器開搶時排隊處理的影響
+        fastest_responses = [
+            min(shot.response_ns for shot in run.shots if shot.response_ns > 0)
+            for run in runs
+            if any(shot.response_ns > 0 for shot in run.shots)
+        ]
+        jitter = timedelta()
+        if fastest_responses:
+            # 回應時間的變化有一半來自去程
+            jitter = timedelta(
+                microseconds=(max(fastest_responses) - min(fastest_responses)) / 2 / 1e3
+            )
+        half_window = _round_to_ms(spread + uncertainty + jitter + TUNING_MARGIN)
+
+        suggestion = TuningSuggestion(
+            center=center,
+            send_offset=max(-MAX_SEND_OFFSET, min(MAX_SEND_OFFSET, _round_to_ms(edge))),
+            window=dataclasses.replace(
+                self.base_window, window_start=-half_window, window_end=half_window
+            ),
+            run_count=len(edges),
+        )
+        logging.info(
+            "%s 依最近 %d 次紀錄建議送出偏移 %+.0f 毫秒，連發區間 %.0f ~ %.0f 毫秒",
+            center,
+            suggestion.run_count,
+            suggestion.send_offset.total_seconds() * 1000,
+            suggestion.window.window_start.total_seconds() * 1000,
+            suggestion.window.window_end.total_seconds() * 1000,
+        )
+        return suggestion
+
+
+def _to_us(value: timedelta) -> int:
+    return value // timedelta(microseconds=1)
+
+
+def _round_to_ms(value: timedelta) -> timedelta:
+    return timedelta(milliseconds=round(value.total_seconds() * 1000))
@@ -0,0 +1,129 @@
+"""倒數期間在背景定期確認登入狀態，登出時重新登入並把新的 cookies 換進使用中的 session"""
+
+import logging
+from datetime import datetime, timedelta
+
+import aiohttp
+from utils.deadline_scheduler import DeadlineScheduler
+from utils.session_cache import SessionCache
+from yarl import URL
+
+from .sports_center_webservice import SportsCenterWebService
+
+# 多久確認一次登入狀態，必須比網站 session 逾時的時間短
+DEFAULT_SESSION_CHECK_INTERVAL = timedelta(seconds=60)
+# 開搶前多久做最後一次確認，之後不再送出額外的請求
+DEFAULT_SESSION_CHECK_STOP_OFFSET = timedelta(seconds=-30)
+
+
+def get_session_cookies(session: aiohttp.ClientSession, url: str) -> dict[str, str]:
+    """取得 session 目前會對 url 送出的 cookies，包含伺服器在登入後更新的 cookies
+
+    Args:
+        session (aiohttp.ClientSession): 使用中的 session
+        url (str): 運動中心網站的網址
+
+    Returns:
+        dict[str, str]: cookies
+    """
+    return {name: morsel.value for name, morsel in session.cookie_jar.filter_cookies(URL(url)).items()}
+
+
+class SessionSupervisor:
+    """在倒數期間和其他工作一起執行，定期讀取需要登入的頁面確認 session 仍有效
+
+    確認登入狀態的請求使用搶場地的 session，所以同時也會讓預熱好的連線保持使用中；
+    發現已被登出時重新登入，並在同一個 session 中換上新的 cookies，不需要重建
+    session 也不會關閉預熱好的連線。
+    """
+
+    def __init__(
+        self,
+        service: SportsCenterWebService,
+        session: aiohttp.ClientSession,
+        username: str,
+        session_cache: SessionCache | None = None,
+        interval: timedelta = DEFAULT_SESSION_CHECK_INTERVAL,
+    ) -> None:
+        """
+        Args:
+            service (SportsCenterWebService): 已登入的運動中心服務
+            session (aiohttp.ClientSession): 搶場地用的 session
+            username (str): session 的帳號
+            session_cache (SessionCache | None, optional): 重新登入或伺服器更新 cookies 後
+                寫回的快取，不指定則不寫回. Defaults to None.
+            interval (timedelta, optional): 確認登入狀態的間隔. Defaults to DEFAULT_SESSION_CHECK_INTERVAL.
+        """
+        self.service = service
+        self.session = session
+        self.username = username
+        self.session_cache = session_cache
+        self.interval = interval
+        self.relogin_count = 0
+        self._cookies = get_session_cookies(session=session, url=service.login_page_url)
+
+    @property
+    def cookies(self) -> dict[str, str]:
+        """最近一次確認登入狀態後 session 中的 cookies"""
+        return dict(self._cookies)
+
+    async def run(
+        self,
+        scheduler: DeadlineScheduler,
+        stop_offset: timedelta = DEFAULT_SESSION_CHECK_STOP_OFFSET,
+    ) -> None:
+        """每隔 interval 確認一次登入狀態，最後一次確認在開搶時間加上 stop_offset
+
+        Args:
+            scheduler (DeadlineScheduler): 開搶時間的排程器
+            stop_offset (timedelta, optional): 相對開搶時間何時做最後一次確認. Defaults to DEFAULT_SESSION_CHECK_STOP_OFFSET.
+        """
+        stop_time = scheduler.booking_date + stop_offset
+        while True:
+            check_time = min(datetime.now() + self.interval, stop_time)
+            await scheduler.wait_until(target_time=check_time, log_count_down=False)
+            await self.check()
+            if check_time >= stop_time:
+                return
+
+    async def check(self) -> bool:
+        """確認一次登入狀態，已被登出時重新登入
+
+        Returns:
+            bool: 確認後是否為登入狀態
+        """
+        if await self.service.is_session_valid(session=self.session):
+            logging.debug("%s 仍是登入狀態", self.username)
+            self._sync_cookies()
+            return True
+
+        logging.warning("%s 的登入狀態已失效，重新登入", self.username)
+        try:
+            await self.service.relogin()
+        except Exception:
+            # 例如 HTTP 登入失敗後找不到瀏覽器，下一次確認時會再重試
+            logging.exception("%s 重新登入時發生錯誤", self.username)
+            return False
+        if not self.service.login_status:
+            logging.error("%s 重新登入失敗！", self.username)
+            return False
+
+        # 只換掉 cookie jar 的內容，session 與 connector 中預熱好的連線都不受影響
+        self.relogin_count += 1
+        self.session.cookie_jar.clear()
+        self.session.cookie_jar.update_cookies(self.service.get_cookies())
+        self._sync_cookies()
+        return True
+
+    def _sync_cookies(self) -> None:
+        cookies = get_session_cookies(session=self.session, url=self.service.login_page_url)
+        if cookies == self._cookies:
+            return
+
+        self._cookies = cookies
+        if self.session_cache is not None:
+            self.session_cache.save(
+                sports_center_name=self.service.sports_center_name(),
+                username=self.username,
+                cookies=cookies,
+            )
@@ -0,0 +1,104 @@
+"""讀取 sports_centers.json 中的運動中心設定"""
+
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+DEFAULT_REGISTRY_PATH = Path(__file__).parent / "sports_centers.json"
+
+
+@dataclass(frozen=True)
+class SportsCenterSelectors:
+    """登入與登出流程中用來找出頁面元素的選擇器"""
+
+    username_input_id: str
+    password_input_id: str
+    login_user_name_id: str
+    login_failed_message_id: str
+    checkbox_class_name: str
+    logout_button_xpath: str
+    member_login_id: str
+    member_login_text: str
+
+
+@dataclass(frozen=True)
+class SportsCenterConfig:
+    """單一運動中心的設定
+
+    Attributes:
+        key (str): 運動中心的識別名稱
+        name (str): 運動中心名稱
+        base_url (str): 網站網址
+        login_page_path (str): 登入頁相對 base_url 的路徑
+        booking_path_template (str): 搶場地網址相對 base_url 的路徑樣板，
+            可用的欄位有 court、year、month、day、hour
+        cancel_path_template (str | None): 取消預約網址的路徑樣板，沒有的話無法自動釋出重複搶到的場地
+        schedule_path_template (str | None): 場地時刻表頁面的路徑樣板，可用的欄位有 court、year、month、day，
+            沒有 court 欄位表示同一頁就列出所有場地
+        available_slot_pattern (re.Pattern | None): 在時刻表頁面中找出可預約時段的正規表示式，
+            需要有 court 與 hour 兩個具名群組
+        courts (tuple[str, ...]): 場地編號(QPid)，越前面優先順序越高
+        selectors (SportsCenterSelectors): 頁面元素的選擇器
+    """
+
+    key: str
+    name: str
+    base_url: str
+    login_page_path: str
+    booking_path_template: str
+    cancel_path_template: str | None
+    schedule_path_template: str | None
+    available_slot_pattern: re.Pattern | None
+    courts: tuple[str, ...]
+    selectors: SportsCenterSelectors
+
+
+def load_sports_center_registry(
+    path: Path = DEFAULT_REGISTRY_PATH,
+) -> dict[str, SportsCenterConfig]:
+    """讀取運動中心設定檔
+
+    Args:
+        path (Path, optional): 設定檔路徑. Defaults to DEFAULT_REGISTRY_PATH.
+
+    Raises:
+        ValueError: 設定檔格式不正確時發出的例外
+
+    Returns:
+        dict[str, SportsCenterConfig]: 以 key 為索引的運動中心設定，順序和設定檔相同
+    """
+    raw = json.loads(path.read_text(encoding="utf-8"))
+
+    registry = {}
+    for center in raw["centers"]:
+        try:
+            available_slot_pattern = center.get("available_slot_pattern")
+            config = SportsCenterConfig(
+                key=center["key"],
+                name=center["name"],
+                base_url=center["base_url"],
+                login_page_path=center["login_page_path"],
+                booking_path_template=center["booking_path_template"],
+                cancel_path_template=center.get("cancel_path_template"),
+                schedule_path_template=center.get("schedule_path_template"),
+                available_slot_pattern=(
+                    re.compile(available_slot_pattern) if available_slot_pattern else None
+                ),
+                courts=tuple(str(court) for court in center["courts"]),
+                selectors=SportsCenterSelectors(**center["selectors"]),
+            )
+        except (KeyError, TypeError, re.error) as e:
+            raise ValueError(f"運動中心設定格式不正確： {center.get('key')} ({e})")
+
+        if not config.courts:
+            raise ValueError(f"運動中心 {config.key} 至少要設定一個場地")
+        pattern = config.available_slot_pattern
+        if pattern is not None and not {"court", "hour"} <= set(pattern.groupindex):
+            raise ValueError(f"運動中心 {config.key} 的 available_slot_pattern 需要 court 與 hour 群組")
+        registry[config.key] = config
+
+    return registry
+
+
+SPORTS_CENTER_REGISTRY = load_sports_center_registry()
@@ -1,45 +1,97 @@
 """Service to interacte with Sports Center Website"""
 
+from __future__ import annotations
+
+import asyncio
 import logging
 from abc import ABC, abstractmethod
+from datetime import datetime
+from enum import Enum
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin
 
 import aiohttp
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.support.ui import WebDriverWait
+from utils.deadline_scheduler import DeadlineScheduler
+from utils.driver_pool import ChromeDriverPool, get_default_driver_pool, is_browser_available
+from utils.exchange_recorder import recorder
+from utils.raw_http import RAW_HTTP_ERRORS, RAW_RESPONSE_TIMEOUT_SECONDS, RawConnection
+from utils.tracing import tracer
+
+from .http_login import login_via_http, parse_login_page
+
+# selenium 只有瀏覽器登入時才載入，HTTP 登入與搶場地的流程都用不到
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+    from selenium.webdriver.remote.webelement import WebElement
+
+LOGIN_BACKEND_SELENIUM = "selenium"
+LOGIN_BACKEND_HTTP = "http"
+# 串流讀取回應內容時每次讀取的大小
+BOOKING_RESPONSE_CHUNK_SIZE = 4096
+# 登入頁載入時會跳出的公告視窗數量，以及等待每個視窗的上限與檢查間隔
+LOGIN_PAGE_ALERT_COUNT = 2
+LOGIN_ALERT_TIMEOUT_SECONDS = 2
+LOGIN_ALERT_POLL_SECONDS = 0.05
+# 倒數期間檢查登入狀態的請求等待回應的上限
+SESSION_PROBE_TIMEOUT_SECONDS = 5
+
+
+class BookingOutcome(Enum):
+    """搶場地請求的結果"""
+
+    SUCCESS = "success"
+    FAILED = "failed"
+    # 回應中找不到預約結果，例如 session 過期被導回登入頁
+    UNKNOWN = "unknown"
+    # 請求本身失敗，例如連線中斷或逾時
+    ERROR = "error"
 
 
 class SportsCenterWebService(ABC):
-    def __init__(self, username: str, password: str) -> None:
+    # 登入頁面上各個元素的 id，HTTP 登入時用來找出表單欄位與判斷登入結果
+    USERNAME_INPUT_ID = "ContentPlaceHolder1_loginid"
+    PASSWORD_INPUT_ID = "loginpw"
+    LOGIN_USER_NAME_ID = "lab_Name"
+    LOGIN_FAILED_MESSAGE_ID = "showerror3"
+    # 搶場地後重導向網址中代表預約成功與失敗的參數
+    BOOKING_SUCCESS_MARKER = "PT=1&X=1"
+    BOOKING_FAILED_MARKER = "PT=1&X=2"
+    # 運動中心網站的網址，子類別需要覆寫
+    DEFAULT_BASE_URL = ""
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        login_backend: str = LOGIN_BACKEND_SELENIUM,
+        base_url: str | None = None,
+        driver_pool: ChromeDriverPool | None = None,
+    ) -> None:
+        """
+        Args:
+            username (str): 帳號(身分證字號)
+            password (str): 密碼
+            login_backend (str, optional): 登入方式，LOGIN_BACKEND_HTTP 不需要開啟瀏覽器，
+                失敗時才改用 LOGIN_BACKEND_SELENIUM. Defaults to LOGIN_BACKEND_SELENIUM.
+            base_url (str | None, optional): 覆寫運動中心網站的網址，例如指向本機的模擬伺服器，
+                不指定則使用 DEFAULT_BASE_URL. Defaults to None.
+            driver_pool (ChromeDriverPool | None, optional): 用瀏覽器登入時使用的瀏覽器池，
+                不指定則使用共用的瀏覽器池. Defaults to None.
+        """
+        self.base_url = (base_url or self.DEFAULT_BASE_URL).rstrip("/")
         self.__is_login = False
         self.__username = username
         self.__password = password
-        options = self.get_default_chrome_options()
-
-        logging.info("開啟 Chrome 瀏覽器")
-        self._driver = webdriver.Chrome(options=options)
-
-        logging.info("開啟%s登入頁", self.sports_center_name())
-        self._driver.get(self.login_page_url)
-
-    def get_default_chrome_options(self) -> Options:
-        """Setting default chrome browser options and return
-
-        Returns:
-            Options: Chrome options object
-        """
-        options = webdriver.ChromeOptions()
-
-        # run chrome browser without UI
-        options.add_argument("--headless")
-
-        # 模擬真實瀏覽器
-        options.add_argument(
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36"
-        )
-
-        return options
+        recorder.add_secrets(username, password)
+        self.__login_backend = login_backend
+        self.__http_cookies: dict[str, str] = {}
+        self.__http_logout_url: str | None = None
+        self.__driver_pool = driver_pool
+        self.__is_browser_login = False
+        # 只有在瀏覽器池的工作執行期間才會有值，登入結束後瀏覽器就還給瀏覽器池
+        self._driver: WebDriver | None = None
+        # 設為 True 時離開 context manager 不會登出，保留 session 給下次執行沿用
+        self.keep_session_alive = False
 
     @classmethod
     @abstractmethod
@@ -61,19 +113,210 @@ class SportsCenterWebService(ABC):
         """
         pass
 
-    def __del__(self) -> None:
-        logging.info("關閉瀏覽器")
-        self._driver.quit()
-
-    def __enter__(self):
-        self.login()
+    async def __aenter__(self):
+        await self.async_login()
         return self
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        self.logout()
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        # 要保留 session 給下次執行使用時就不登出
+        if self.keep_session_alive:
+            return
+
+        # 瀏覽器登入後也會保存 cookies 與登出連結，只有找不到登出連結時才需要再借用瀏覽器登出
+        if self.__is_login and self.__http_logout_url is None and self.__is_browser_login:
+            await self.browser_logout()
+        else:
+            await self.http_logout()
+
+    async def async_login(self) -> None:
+        """依照登入方式登入網路預約平台，已經登入(例如由快取還原 session)時不做任何事"""
+        if self.__is_login:
+            return
+
+        if self.__login_backend == LOGIN_BACKEND_HTTP:
+            await self.http_login()
+
+            if not self.__is_login:
+                logging.info("HTTP 登入失敗，改用瀏覽器登入")
+                await self.browser_login()
+        else:
+            await self.browser_login()
+
+    async def browser_login(self) -> None:
+        """向瀏覽器池借一個 Chrome 在背景執行緒中登入，登入後保存 cookies 並歸還瀏覽器"""
+        if not is_browser_available():
+            logging.error("沒有安裝 selenium，無法用瀏覽器登入%s", self.sports_center_name())
+            return
+
+        driver_pool = self.__driver_pool or get_default_driver_pool()
+        await driver_pool.run(self._login_with_driver)
+
+    def _login_with_driver(self, driver: WebDriver) -> None:
+        self._driver = driver
+        try:
+            logging.info("開啟%s登入頁", self.sports_center_name())
+            with tracer.span("open_login_page"):
+                driver.get(self.login_page_url)
+
+            self.login()
+            if not self.__is_login:
+                return
+            self.__is_browser_login = True
+
+            # 瀏覽器要還給瀏覽器池，之後的請求與登出都改用 cookies 直接送出
+            with tracer.span("get_cookies"):
+                self.__http_cookies = {
+                    cookie["name"]: cookie["value"] for cookie in driver.get_cookies()
+                }
+            page = parse_login_page(html=driver.page_source, watched_element_ids=())
+            if page.logout_href and not page.logout_href.startswith("javascript:"):
+                self.__http_logout_url = urljoin(driver.current_url, page.logout_href)
+        finally:
+            self._driver = None
+
+    async def browser_logout(self) -> None:
+        """向瀏覽器池借一個 Chrome，放回登入時的 cookies 後按下登出鈕"""
+        if not is_browser_available():
+            logging.error("沒有安裝 selenium，無法用瀏覽器登出%s", self.sports_center_name())
+            return
+
+        driver_pool = self.__driver_pool or get_default_driver_pool()
+        await driver_pool.run(self._logout_with_driver)
+
+    def _logout_with_driver(self, driver: WebDriver) -> None:
+        self._driver = driver
+        try:
+            # 瀏覽器只能替目前所在網域加入 cookies，先開啟登入頁再加入
+            driver.get(self.login_page_url)
+            for name, value in self.__http_cookies.items():
+                driver.add_cookie({"name": name, "value": value})
+            driver.get(self.login_page_url)
+            self.logout()
+        finally:
+            self._driver = None
+            self.__http_cookies = {}
+
+    async def relogin(self) -> None:
+        """session 失效時重新登入"""
+        logging.info("重新登入%s", self.sports_center_name())
+        self.__is_login = False
+        self.__http_cookies = {}
+        await self.async_login()
+
+    @property
+    def session_probe_url(self) -> str:
+        """檢查 session 是否有效時要讀取的頁面，登入狀態下頁面上會有使用者名稱
+
+        Returns:
+            str: 檢查 session 用的網址
+        """
+        return self.login_page_url
+
+    async def is_session_valid(self, session: aiohttp.ClientSession) -> bool:
+        """讀取 session_probe_url，檢查 session 中的 cookies 是否仍是登入狀態
+
+        Args:
+            session (aiohttp.ClientSession): 帶有登入 cookies 的非同步 session
+
+        Returns:
+            bool: 仍是登入狀態回傳 True
+        """
+        try:
+            async with session.get(
+                self.session_probe_url,
+                ssl=False,
+                timeout=aiohttp.ClientTimeout(total=SESSION_PROBE_TIMEOUT_SECONDS),
+            ) as response:
+                page = parse_login_page(
+                    html=await response.text(),
+                    watched_element_ids=(self.LOGIN_USER_NAME_ID,),
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error("檢查登入狀態失敗： %s", e)
+            return False
+
+        return self.LOGIN_USER_NAME_ID in page.element_texts
+
+    async def restore_session(self, cookies: dict[str, str]) -> bool:
+        """用快取的 cookies 還原登入狀態，cookies 已經失效時不會改變登入狀態
+
+        Args:
+            cookies (dict[str, str]): 快取的 cookies
+
+        Returns:
+            bool: 還原成功回傳 True
+        """
+        async with aiohttp.ClientSession(
+            cookies=cookies, trace_configs=recorder.trace_configs()
+        ) as session:
+            is_valid = await self.is_session_valid(session=session)
+
+        if is_valid:
+            self.__http_cookies = dict(cookies)
+            self.__is_login = True
+            logging.info("沿用快取的登入狀態，不需要重新登入")
+        else:
+            logging.info("快取的登入狀態已失效")
+
+        return is_valid
+
+    async def http_login(self) -> None:
+        """不開啟瀏覽器，直接送出登入表單登入網路預約平台"""
+        if self.__is_login:
+            logging.error("您已經登入%s網路預約系統", self.sports_center_name())
+
+            return
+
+        async with aiohttp.ClientSession(
+            cookie_jar=aiohttp.CookieJar(unsafe=True), trace_configs=recorder.trace_configs()
+        ) as session:
+            try:
+                with tracer.span("http_login"):
+                    result = await login_via_http(
+                        session=session,
+                        login_page_url=self.login_page_url,
+                        username_input_id=self.USERNAME_INPUT_ID,
+                        password_input_id=self.PASSWORD_INPUT_ID,
+                        login_user_name_id=self.LOGIN_USER_NAME_ID,
+                        login_failed_message_id=self.LOGIN_FAILED_MESSAGE_ID,
+                        username=self.__username,
+                        password=self.__password,
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logging.error("HTTP 登入失敗： %s", e)
+                return
+
+        if result.is_login:
+            self.__http_cookies = result.cookies
+            self.__http_logout_url = result.logout_url
+            self.__is_login = True
+            logging.info("%s 登入成功!", result.message)
+        else:
+            logging.error("%s", result.message)
+
+    async def http_logout(self) -> None:
+        """登出 HTTP 登入的 session，沒有登出連結時就只清除 cookies 讓 session 自然過期"""
+        if not self.__is_login:
+            logging.error("已是登出狀態")
+
+            return
+
+        if self.__http_logout_url:
+            async with aiohttp.ClientSession(
+                cookies=self.__http_cookies, trace_configs=recorder.trace_configs()
+            ) as session:
+                try:
+                    async with session.get(self.__http_logout_url, ssl=False) as response:
+                        await response.read()
+                    logging.info("登出成功")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logging.info("登出失敗： %s", e)
+
+        self.__http_cookies = {}
+        self.__is_login = False
 
     def login(self) -> None:
-        """輸入帳密並且登入網路預約平台"""
+        """在已經開啟登入頁的瀏覽器中輸入帳密並且登入網路預約平台"""
         if self.__is_login:
             welcome_message = self._get_login_user_name_from_website()
             logging.error(
@@ -82,15 +325,25 @@ class SportsCenterWebService(ABC):
 
             return
 
-        wait = WebDriverWait(self._driver, timeout=2)
-        alert = wait.until(lambda d: d.switch_to.alert)
-        logging.debug("第一個彈出視窗訊息： %s", alert.text)
-        alert.accept()
-
-        wait = WebDriverWait(self._driver, timeout=2)
-        alert = wait.until(lambda d: d.switch_to.alert)
-        logging.debug("第二個彈出視窗訊息： %s", alert.text)
-        alert.accept()
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        # 登入頁載入時會依序跳出公告視窗，出現就立刻關掉，不等固定秒數
+        for index in range(1, LOGIN_PAGE_ALERT_COUNT + 1):
+            with tracer.span("login_alert_wait", index=index):
+                wait = WebDriverWait(
+                    self._driver,
+                    timeout=LOGIN_ALERT_TIMEOUT_SECONDS,
+                    poll_frequency=LOGIN_ALERT_POLL_SECONDS,
+                )
+                try:
+                    alert = wait.until(expected_conditions.alert_is_present())
+                except TimeoutException:
+                    logging.debug("沒有第 %d 個彈出視窗", index)
+                    break
+            logging.debug("第 %d 個彈出視窗訊息： %s", index, alert.text)
+            alert.accept()
 
         checkbox = self._find_checkbox_element()
         checkbox.click()
@@ -102,7 +355,8 @@ class SportsCenterWebService(ABC):
         password_input_box.send_keys(self.__password)
 
         try:
-            self._driver.execute_script("DoSubmit()")
+            with tracer.span("do_submit"):
+                self._driver.execute_script("DoSubmit()")
 
             welcome_message = self._get_login_user_name_from_website()
             self.__is_login = True
@@ -133,7 +387,7 @@ class SportsCenterWebService(ABC):
         pass
 
     def logout(self) -> None:
-        """登出網路預約平台"""
+        """在已經登入的瀏覽器中按下登出鈕登出網路預約平台"""
         if not self.__is_login:
             logging.error("已是登出狀態")
 
@@ -174,11 +428,16 @@ class SportsCenterWebService(ABC):
         if not self.__is_login:
             logging.error("未登入，無法取得 cookies")
 
-        cookies = self._driver.get_cookies()
-        return {cookie["name"]: cookie["value"] for cookie in cookies}
+        return dict(self.__http_cookies)
 
     async def booking_courts(
-        self, session: aiohttp.ClientSession, year: int, month: int, day: int, hour: int
+        self,
+        session: aiohttp.ClientSession,
+        year: int,
+        month: int,
+        day: int,
+        hour: int,
+        scheduler: DeadlineScheduler | None = None,
     ) -> None:
         """發出搶場地的請求，並且檢查回傳的內容中重導向的網址中的參數來判斷是否預約成功
 
@@ -188,9 +447,8 @@ class SportsCenterWebService(ABC):
             month (int): 指定要搶的場地的月份
             day (int): 指定要搶的場地的日期
             hour (int): 指定要搶的場地的小時
+            scheduler (DeadlineScheduler | None, optional): 有指定的話會記錄請求送出時超過開搶時間多久. Defaults to None.
 
-        Raises:
-            RuntimeError: 判斷不出來搶場地的結果時發出的例外
         """
         logging.info("搶 %d/%d/%d %d ~ %d 的場地", year, month, day, hour, hour + 1)
 
@@ -199,22 +457,252 @@ class SportsCenterWebService(ABC):
             year=year, month=month, day=day, hour=hour
         )
 
-        async with session.get(booking_url, ssl=False) as response:
-            text = await response.text()
+        # 送出前才取時間，log 留到收到回應後再印，避免拖慢送出時間
+        overshoot_ns = scheduler.overshoot_ns() if scheduler else None
+        outcome = await self.send_booking_request(
+            session=session, booking_url=booking_url
+        )
 
-            if self._is_booking_success(text=text):
-                logging.info(
-                    "%d/%d/%d %d ~ %d 的場地預約成功", year, month, day, hour, hour + 1
-                )
-            else:
-                logging.info(
-                    "%d/%d/%d %d ~ %d 的場地預約失敗", year, month, day, hour, hour + 1
+        if overshoot_ns is not None:
+            logging.info(
+                "%d/%d/%d %d ~ %d 的請求送出時超過開搶時間 %.3f 毫秒",
+                year,
+                month,
+                day,
+                hour,
+                hour + 1,
+                overshoot_ns / 1e6,
+            )
+
+        if outcome is BookingOutcome.SUCCESS:
+            logging.info(
+                "%d/%d/%d %d ~ %d 的場地預約成功", year, month, day, hour, hour + 1
+            )
+        elif outcome is BookingOutcome.FAILED:
+            logging.info(
+                "%d/%d/%d %d ~ %d 的場地預約失敗", year, month, day, hour, hour + 1
+            )
+        else:
+            logging.error(
+                "%d/%d/%d %d ~ %d 的場地預約結果未知", year, month, day, hour, hour + 1
+            )
+
+    async def send_booking_request(
+        self,
+        session: aiohttp.ClientSession,
+        booking_url: str,
+        read_full_page: bool = False,
+    ) -> BookingOutcome:
+        """送出一次搶場地的請求並判斷預約結果，任何錯誤都會轉成 BookingOutcome 而不會拋出例外
+
+        預設不跟隨重導向，直接從 Location header 判斷結果；沒有重導向時才串流讀取
+        回應內容，讀到結果就停止，不需要下載整個頁面。
+
+        Args:
+            session (aiohttp.ClientSession): 輸入登入資訊相關 cookies 的非同步 session
+            booking_url (str): 由 get_booking_url 產生的搶場地 url
+            read_full_page (bool, optional): 為 True 時跟隨重導向並讀取整個結果頁面. Defaults to False.
+
+        Returns:
+            BookingOutcome: 預約結果
+        """
+        try:
+            with tracer.span("booking_request", url=booking_url):
+                if read_full_page:
+                    async with session.get(booking_url, ssl=False) as response:
+                        text = await response.text()
+                    return self._classify_booking_result(text=text)
+
+                async with session.get(
+                    booking_url, ssl=False, allow_redirects=False
+                ) as response:
+                    location = response.headers.get("Location")
+                    if location is not None:
+                        outcome = self._classify_booking_result(text=location)
+                        if outcome is BookingOutcome.UNKNOWN:
+                            logging.error("搶場地被重導向到未知的網址： %s", location)
+                        return outcome
+
+                    return await self._classify_booking_response_stream(
+                        response=response
+                    )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error("搶場地請求失敗： %s", e)
+            return BookingOutcome.ERROR
+
+    async def read_raw_booking_response(self, connection: RawConnection) -> BookingOutcome:
+        """讀取已經用 RawConnection.send 送出的搶場地請求的回應並判斷預約結果，
+        任何錯誤都會轉成 BookingOutcome 而不會拋出例外
+
+        和 send_booking_request 一樣不跟隨重導向，優先從 Location header 判斷結果。
+
+        Args:
+            connection (RawConnection): 已送出搶場地請求的連線
+
+        Returns:
+            BookingOutcome: 預約結果
+        """
+        try:
+            with tracer.span("raw_booking_response"):
+                response = await asyncio.wait_for(
+                    connection.read_response(), timeout=RAW_RESPONSE_TIMEOUT_SECONDS
                 )
+        except RAW_HTTP_ERRORS as e:
+            logging.error("搶場地請求失敗： %s", e)
+            connection.close()
+            return BookingOutcome.ERROR
+
+        location = response.headers.get("location")
+        if location is not None:
+            outcome = self._classify_booking_result(text=location)
+            if outcome is BookingOutcome.UNKNOWN:
+                logging.error("搶場地被重導向到未知的網址： %s", location)
+            return outcome
+
+        outcome = self._classify_booking_result(
+            text=response.body.decode("ascii", errors="ignore")
+        )
+        if outcome is BookingOutcome.UNKNOWN:
+            logging.error("搶場地的回應中找不到預約結果 (HTTP %d)", response.status)
+        return outcome
+
+    async def _classify_booking_response_stream(
+        self, response: aiohttp.ClientResponse
+    ) -> BookingOutcome:
+        """串流讀取回應內容，一找到預約結果就停止讀取"""
+        markers = (
+            self.BOOKING_SUCCESS_MARKER.encode(),
+            self.BOOKING_FAILED_MARKER.encode(),
+        )
+        # 保留上一段結尾，避免結果剛好被切在兩段之間
+        overlap = max(len(marker) for marker in markers) - 1
+        buffer = b""
+        async for chunk in response.content.iter_chunked(BOOKING_RESPONSE_CHUNK_SIZE):
+            buffer = buffer[-overlap:] + chunk
+            outcome = self._classify_booking_result(
+                text=buffer.decode("ascii", errors="ignore")
+            )
+            if outcome is not BookingOutcome.UNKNOWN:
+                return outcome
+
+        logging.error("搶場地的回應中找不到預約結果 (HTTP %d)", response.status)
+        return BookingOutcome.UNKNOWN
+
+    def _classify_booking_result(self, text: str) -> BookingOutcome:
+        """從重導向網址或頁面內容中的參數判斷預約結果
+
+        Args:
+            text (str): 重導向網址或頁面內容
+
+        Returns:
+            BookingOutcome: 找不到結果時回傳 BookingOutcome.UNKNOWN
+        """
+        if self.BOOKING_FAILED_MARKER in text:
+            return BookingOutcome.FAILED
+        elif self.BOOKING_SUCCESS_MARKER in text:
+            return BookingOutcome.SUCCESS
+        else:
+            return BookingOutcome.UNKNOWN
 
+    def get_booking_url(self, booking_date: datetime, court: str | None = None) -> str:
+        """產生指定時段的搶場地 url
+
+        Args:
+            booking_date (datetime): 指定要搶的場地的時段
+            court (str | None, optional): 場地編號，不指定則使用優先順序最高的場地. Defaults to None.
+
+        Returns:
+            str: 搶場地 url
+        """
+        return self._generate_booking_url(
+            year=booking_date.year,
+            month=booking_date.month,
+            day=booking_date.day,
+            hour=booking_date.hour,
+            court=court,
+        )
+
+    async def cancel_booking(
+        self, session: aiohttp.ClientSession, booking_date: datetime, court: str
+    ) -> bool:
+        """取消已經預約到的場地，用來釋出重複搶到的場地
+
+        Args:
+            session (aiohttp.ClientSession): 輸入登入資訊相關 cookies 的非同步 session
+            booking_date (datetime): 預約的時段
+            court (str): 場地編號
+
+        Returns:
+            bool: 有送出取消請求並且成功回傳 True，沒有設定取消網址或取消失敗回傳 False
+        """
+        cancel_url = self._generate_cancel_url(
+            year=booking_date.year,
+            month=booking_date.month,
+            day=booking_date.day,
+            hour=booking_date.hour,
+            court=court,
+        )
+        if cancel_url is None:
+            return False
+
+        try:
+            async with session.get(cancel_url, ssl=False) as response:
+                await response.read()
+                return response.status < 400
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error("取消預約失敗： %s", e)
+            return False
+
+    def get_schedule_url(self, booking_date: datetime, court: str) -> str | None:
+        """產生指定日期與場地的時刻表 url，用來在開搶前掃描哪些時段還能預約
+
+        Args:
+            booking_date (datetime): 要查詢的日期
+            court (str): 場地編號
+
+        Returns:
+            str | None: 時刻表 url，網站不支援時回傳 None
+        """
+        return self._generate_schedule_url(
+            year=booking_date.year,
+            month=booking_date.month,
+            day=booking_date.day,
+            court=court,
+        )
+
+    def parse_available_slots(self, html: str) -> set[tuple[str, int]]:
+        """從時刻表頁面找出可預約的 (場地編號, 小時)
+
+        Args:
+            html (str): 時刻表頁面
+
+        Returns:
+            set[tuple[str, int]]: 可預約的時段，網站不支援時回傳空集合
+        """
+        return set()
+
+    @property
     @abstractmethod
-    def _generate_booking_url(self, year: int, month: int, day: int, hour: int) -> str:
+    def courts(self) -> tuple[str, ...]:
+        """Return the court ids (QPid) in priority order
+
+        Returns:
+            tuple[str, ...]: court ids, the first one has the highest priority
+        """
         pass
 
     @abstractmethod
-    def _is_booking_success(self, text: str) -> bool:
+    def _generate_booking_url(
+        self, year: int, month: int, day: int, hour: int, court: str | None = None
+    ) -> str:
         pass
+
+    def _generate_cancel_url(
+        self, year: int, month: int, day: int, hour: int, court: str
+    ) -> str | None:
+        """產生取消預約的 url，網站不支援時回傳 None"""
+        return None
+
+    def _generate_schedule_url(self, year: int, month: int, day: int, court: str) -> str | None:
+        """產生時刻表的 url，網站不支援時回傳 None"""
+        return None
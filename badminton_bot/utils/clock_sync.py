@@ -0,0 +1,142 @@
+"""估計運動中心伺服器時鐘與本機時鐘的差距"""
+
+import asyncio
+import logging
+import math
+import statistics
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+
+@dataclass(frozen=True)
+class ClockOffsetEstimate:
+    """伺服器時鐘估計結果
+
+    Attributes:
+        offset (timedelta): 伺服器時間減去本機時間
+        one_way_latency (timedelta): 請求從本機送到伺服器的單程延遲估計
+        uncertainty (timedelta): offset 估計值的誤差範圍(正負)
+        samples (int): 有效的取樣次數
+    """
+
+    offset: timedelta
+    one_way_latency: timedelta
+    uncertainty: timedelta
+    samples: int
+
+    def local_send_time_for(self, server_time: datetime) -> datetime:
+        """計算要讓請求剛好在伺服器時間 server_time 抵達，本機應該在什麼時間送出
+
+        Args:
+            server_time (datetime): 希望請求抵達伺服器時的伺服器時間
+
+        Returns:
+            datetime: 本機應該送出請求的時間
+        """
+        return server_time - self.offset - self.one_way_latency
+
+
+async def estimate_server_clock_offset(
+    session: aiohttp.ClientSession, url: str, samples: int = 8
+) -> ClockOffsetEstimate:
+    """NTP 風格估計伺服器時鐘差距
+
+    伺服器回應的 Date header 只有秒的解析度，每次取樣可以得到 offset 的一個區間：
+    伺服器蓋上 Date 的時間點落在送出與收到回應之間，而當下伺服器時間落在
+    [Date, Date + 1 秒) 之內。每次取樣都刻意在預估的伺服器整秒交界附近抵達，
+    用二分逼近的方式把區間縮小到接近單程延遲的大小。
+
+    Args:
+        session (aiohttp.ClientSession): 用來取樣的非同步 session
+        url (str): 要取樣的伺服器網址
+        samples (int, optional): 取樣次數. Defaults to 8.
+
+    Raises:
+        RuntimeError: 沒有任何一次取樣成功時發出的例外
+
+    Returns:
+        ClockOffsetEstimate: 伺服器時鐘估計結果
+    """
+    lower_ns, upper_ns = -math.inf, math.inf
+    midpoints_ns = []
+    rtts_ns = []
+
+    for _ in range(samples):
+        if rtts_ns and math.isfinite(lower_ns) and math.isfinite(upper_ns):
+            await _sleep_until_next_server_second_boundary(
+                offset_ns=(lower_ns + upper_ns) / 2,
+                one_way_ns=statistics.median(rtts_ns) / 2,
+            )
+
+        try:
+            sent_ns, received_ns, server_second = await _sample_server_date(
+                session=session, url=url
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logging.debug("校時取樣失敗： %s", e)
+            continue
+
+        rtts_ns.append(received_ns - sent_ns)
+        sample_lower_ns = server_second * 1_000_000_000 - received_ns
+        sample_upper_ns = (server_second + 1) * 1_000_000_000 - sent_ns
+        midpoints_ns.append((sample_lower_ns + sample_upper_ns) / 2)
+
+        if max(lower_ns, sample_lower_ns) <= min(upper_ns, sample_upper_ns):
+            lower_ns = max(lower_ns, sample_lower_ns)
+            upper_ns = min(upper_ns, sample_upper_ns)
+        else:
+            # 網路抖動造成區間沒有交集，丟掉這次取樣的區間
+            logging.debug("校時取樣區間與先前結果不一致，略過")
+
+    if not rtts_ns:
+        raise RuntimeError(f"無法從 {url} 取得伺服器時間")
+
+    if math.isfinite(lower_ns) and math.isfinite(upper_ns):
+        offset_ns = (lower_ns + upper_ns) / 2
+        uncertainty_ns = (upper_ns - lower_ns) / 2
+    else:
+        offset_ns = statistics.median(midpoints_ns)
+        uncertainty_ns = 500_000_000
+
+    return ClockOffsetEstimate(
+        offset=timedelta(microseconds=offset_ns / 1000),
+        one_way_latency=timedelta(microseconds=statistics.median(rtts_ns) / 2 / 1000),
+        uncertainty=timedelta(microseconds=uncertainty_ns / 1000),
+        samples=len(rtts_ns),
+    )
+
+
+async def _sample_server_date(
+    session: aiohttp.ClientSession, url: str
+) -> tuple[int, int, int]:
+    """送出一次請求並讀取伺服器的 Date header
+
+    Returns:
+        tuple[int, int, int]: 送出時間(ns)、收到回應時間(ns)、伺服器時間(epoch 秒)
+    """
+    sent_ns = time.time_ns()
+    async with session.head(url, ssl=False, allow_redirects=False) as response:
+        received_ns = time.time_ns()
+        date_header = response.headers.get("Date")
+
+    if not date_header:
+        raise ValueError("回應中沒有 Date header")
+
+    server_second = int(parsedate_to_datetime(date_header).timestamp())
+    return sent_ns, received_ns, server_second
+
+
+async def _sleep_until_next_server_second_boundary(
+    offset_ns: float, one_way_ns: float
+) -> None:
+    """睡到讓下一個請求預計在伺服器整秒交界時抵達的時間點"""
+    arrival_ns = time.time_ns() + one_way_ns
+    server_arrival_ns = arrival_ns + offset_ns
+    # 至少保留 200ms 的準備時間，避免算出的時間點已經過去
+    next_boundary_ns = math.ceil((server_arrival_ns + 200_000_000) / 1e9) * 1e9
+    send_at_ns = next_boundary_ns - offset_ns - one_way_ns
+    await asyncio.sleep(max(0.0, (send_at_ns - time.time_ns()) / 1e9))
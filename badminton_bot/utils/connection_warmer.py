@@ -0,0 +1,177 @@
+"""開搶前預先建立並維持 keep-alive 連線，讓搶場地的請求不用在關鍵時刻做 DNS/TCP/TLS"""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import aiohttp
+from utils.deadline_scheduler import DeadlineScheduler
+
+# 連線閒置多久才會被關閉，必須比維持連線的間隔長
+KEEPALIVE_TIMEOUT_SECONDS = 75
+DEFAULT_KEEP_ALIVE_INTERVAL = timedelta(seconds=10)
+# 開搶前多久停止維持連線，讓所有連線在開搶時都是閒置可用的狀態
+DEFAULT_KEEP_ALIVE_STOP_OFFSET = timedelta(seconds=-2)
+# 預熱的 HEAD 請求等待回應的上限，最後一次預熱必須在開搶前結束
+PING_TIMEOUT_SECONDS = 1.5
+
+
+class ConnectionWarmer:
+    """管理搶場地用的 ClientSession 連線池
+
+    DNS 查詢結果會被永久快取，並且在開搶前用輕量的 HEAD 請求開好
+    每個預計送出的請求各自一條 keep-alive 連線，定期重送以維持連線，
+    失效的連線會被丟棄並由下一次預熱重新建立。
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int,
+        keep_alive_interval: timedelta = DEFAULT_KEEP_ALIVE_INTERVAL,
+    ) -> None:
+        """
+        Args:
+            url (str): 用來預熱連線的網址，必須和搶場地的網址同一個主機
+            pool_size (int): 要維持的連線數，通常等於預計送出的請求數
+            keep_alive_interval (timedelta, optional): 維持連線的間隔. Defaults to DEFAULT_KEEP_ALIVE_INTERVAL.
+        """
+        self.url = url
+        self.pool_size = pool_size
+        self.keep_alive_interval = keep_alive_interval
+        self.created_connections = 0
+        self.reused_connections = 0
+
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        self.trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+
+    def create_connector(self) -> aiohttp.TCPConnector:
+        """建立連線數上限等於連線池大小的 connector，可以讓多個帳號的 session 共用
+
+        Returns:
+            aiohttp.TCPConnector: 搶場地用的連線池
+        """
+        return aiohttp.TCPConnector(
+            limit=self.pool_size,
+            ttl_dns_cache=None,
+            keepalive_timeout=KEEPALIVE_TIMEOUT_SECONDS,
+            ssl=False,
+        )
+
+    def create_session(
+        self,
+        cookies: dict[str, str] | None = None,
+        trace_configs: list[aiohttp.TraceConfig] | None = None,
+        connector: aiohttp.TCPConnector | None = None,
+    ) -> aiohttp.ClientSession:
+        """建立只使用預熱好的連線池的 ClientSession，確保搶場地時只會用到預熱好的連線
+
+        每個 session 有自己的 cookie jar，傳入共用的 connector 時多個帳號可以共用
+        同一組預熱好的連線而不會互相影響登入狀態，connector 需要由呼叫端關閉。
+
+        Args:
+            cookies (dict[str, str] | None, optional): 登入後取得的 cookies. Defaults to None.
+            trace_configs (list[aiohttp.TraceConfig] | None, optional): 額外要掛上的 TraceConfig. Defaults to None.
+            connector (aiohttp.TCPConnector | None, optional): 由 create_connector 建立的共用連線池，
+                不指定則建立 session 專用的連線池. Defaults to None.
+
+        Returns:
+            aiohttp.ClientSession: 搶場地用的非同步 session
+        """
+        return aiohttp.ClientSession(
+            cookies=cookies,
+            connector=connector or self.create_connector(),
+            connector_owner=connector is None,
+            cookie_jar=aiohttp.CookieJar(),
+            trace_configs=[self.trace_config, *(trace_configs or [])],
+        )
+
+    async def warm_up(self, session: aiohttp.ClientSession) -> int:
+        """同時送出和連線池大小一樣多的 HEAD 請求，讓每條連線都被建立或確認仍可使用
+
+        Args:
+            session (aiohttp.ClientSession): 由 create_session 建立的 session
+
+        Returns:
+            int: 可用的連線數
+        """
+        self.created_connections = 0
+        self.reused_connections = 0
+        results = await asyncio.gather(
+            *(self._ping(session=session) for _ in range(self.pool_size))
+        )
+        healthy = sum(results)
+
+        # 失效的連線已經被丟棄，補上新的連線
+        if healthy < self.pool_size:
+            retry_results = await asyncio.gather(
+                *(self._ping(session=session) for _ in range(self.pool_size - healthy))
+            )
+            healthy += sum(retry_results)
+
+        logging.info(
+            "連線池 %d/%d 條連線可用 (新建 %d 條，重用 %d 條)",
+            healthy,
+            self.pool_size,
+            self.created_connections,
+            self.reused_connections,
+        )
+        return healthy
+
+    async def keep_alive(
+        self,
+        session: aiohttp.ClientSession,
+        scheduler: DeadlineScheduler,
+        stop_offset: timedelta = DEFAULT_KEEP_ALIVE_STOP_OFFSET,
+    ) -> None:
+        """定期預熱連線直到開搶時間加上 stop_offset，最後一次預熱後就不再使用連線
+
+        Args:
+            session (aiohttp.ClientSession): 由 create_session 建立的 session
+            scheduler (DeadlineScheduler): 開搶時間的排程器
+            stop_offset (timedelta, optional): 相對開搶時間何時停止維持連線. Defaults to DEFAULT_KEEP_ALIVE_STOP_OFFSET.
+        """
+        stop_ns = scheduler.to_perf_counter_ns(scheduler.booking_date + stop_offset)
+        interval_ns = int(self.keep_alive_interval.total_seconds() * 1e9)
+
+        while True:
+            remaining_ns = stop_ns - time.perf_counter_ns()
+            if remaining_ns <= 0:
+                break
+
+            await asyncio.sleep(min(interval_ns, remaining_ns) / 1e9)
+            await self.warm_up(session=session)
+
+    async def _ping(self, session: aiohttp.ClientSession) -> bool:
+        try:
+            # ssl 參數必須和搶場地的請求一致，否則會被視為不同的連線而無法重用
+            async with session.head(
+                self.url,
+                allow_redirects=False,
+                ssl=False,
+                timeout=aiohttp.ClientTimeout(total=PING_TIMEOUT_SECONDS),
+            ) as response:
+                await response.read()
+                return response.status < 500
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.debug("預熱連線失敗： %s", e)
+            return False
+
+    async def _on_connection_create_end(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceConnectionCreateEndParams,
+    ) -> None:
+        self.created_connections += 1
+
+    async def _on_connection_reuseconn(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceConnectionReuseconnParams,
+    ) -> None:
+        self.reused_connections += 1
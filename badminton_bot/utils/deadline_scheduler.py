@@ -0,0 +1,165 @@
+"""低 CPU 佔用、高精度的倒數計時排程器"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Coroutine
+from datetime import datetime, timedelta
+from typing import Any
+
+# 距離目標時間超過這個值時用 asyncio.sleep 粗略等待，之後才改為短暫忙等
+DEFAULT_SPIN_THRESHOLD = timedelta(milliseconds=20)
+# 開搶前的背景工作最晚在第一發之前多久完成，來不及完成的會被取消，不讓慢的請求拖延開搶
+PRE_FIRING_TASK_MARGIN = timedelta(milliseconds=500)
+
+
+class DeadlineScheduler:
+    """把指定的 datetime 換算成 perf_counter_ns 的時間點，提供可 await 的倒數計時
+
+    先用 asyncio.sleep 讓出事件迴圈直到接近目標時間，最後一小段才用
+    time.perf_counter_ns 忙等，兼顧低 CPU 佔用與觸發精度。
+    """
+
+    def __init__(
+        self,
+        booking_date: datetime,
+        spin_threshold: timedelta = DEFAULT_SPIN_THRESHOLD,
+    ) -> None:
+        """
+        Args:
+            booking_date (datetime): 開搶時間，倒數的秒數都以這個時間為準
+            spin_threshold (timedelta, optional): 距離目標時間多久以內改為忙等. Defaults to DEFAULT_SPIN_THRESHOLD.
+        """
+        self.booking_date = booking_date
+        self._spin_threshold_ns = int(spin_threshold.total_seconds() * 1e9)
+        # 同一時刻取得牆上時間與單調時間，之後都以單調時間計算避免系統校時造成跳動
+        self._anchor_wall_ns = time.time_ns()
+        self._anchor_perf_ns = time.perf_counter_ns()
+
+    def to_perf_counter_ns(self, target_time: datetime) -> int:
+        """把 datetime 換算成對應的 perf_counter_ns 數值
+
+        Args:
+            target_time (datetime): 要換算的時間
+
+        Returns:
+            int: 對應的 perf_counter_ns 時間點
+        """
+        target_wall_ns = int(target_time.timestamp() * 1e9)
+        return self._anchor_perf_ns + (target_wall_ns - self._anchor_wall_ns)
+
+    @property
+    def deadline_ns(self) -> int:
+        """開搶時間對應的 perf_counter_ns 時間點"""
+        return self.to_perf_counter_ns(self.booking_date)
+
+    async def wait_until(
+        self,
+        target_time: datetime,
+        log_count_down: bool = True,
+        yield_while_spinning: bool = False,
+    ) -> int:
+        """非同步等待到 target_time，等待期間事件迴圈可以處理其他工作
+
+        Args:
+            target_time (datetime): 要等待到的時間
+            log_count_down (bool, optional): 是否印出距離開搶時間的倒數秒數. Defaults to True.
+            yield_while_spinning (bool, optional): 忙等時是否每一圈都讓出事件迴圈，
+                讓已經建立的請求在等待期間繼續送出. Defaults to False.
+
+        Returns:
+            int: 實際醒來時超過 target_time 的奈秒數
+        """
+        target_ns = self.to_perf_counter_ns(target_time)
+        last_logged_seconds = None
+
+        while True:
+            now_ns = time.perf_counter_ns()
+            remaining_ns = target_ns - now_ns
+            if remaining_ns <= self._spin_threshold_ns:
+                break
+
+            if log_count_down:
+                delta_seconds = round((self.deadline_ns - now_ns) / 1e9)
+                if delta_seconds != last_logged_seconds and (
+                    delta_seconds < 10 or delta_seconds % 5 == 0
+                ):
+                    logging.info("倒數 %d 秒", delta_seconds)
+                    last_logged_seconds = delta_seconds
+
+            # 最多睡到下一個整秒，確保倒數訊息不會漏印
+            next_second_ns = (self.deadline_ns - now_ns) % 1_000_000_000 or 1_000_000_000
+            sleep_ns = min(remaining_ns - self._spin_threshold_ns, next_second_ns)
+            await asyncio.sleep(sleep_ns / 1e9)
+
+        # 最後一小段忙等，預設不讓出事件迴圈以免被其他工作延遲
+        while time.perf_counter_ns() < target_ns:
+            if yield_while_spinning:
+                await asyncio.sleep(0)
+
+        return time.perf_counter_ns() - target_ns
+
+    async def wait_for_deadline(
+        self,
+        offset: timedelta = timedelta(),
+        log_count_down: bool = True,
+        yield_while_spinning: bool = False,
+    ) -> int:
+        """等待到開搶時間加上 offset 的時間點
+
+        Args:
+            offset (timedelta, optional): 相對開搶時間的偏移. Defaults to timedelta().
+            log_count_down (bool, optional): 是否印出倒數秒數. Defaults to True.
+            yield_while_spinning (bool, optional): 忙等時是否每一圈都讓出事件迴圈. Defaults to False.
+
+        Returns:
+            int: 實際醒來時超過目標時間的奈秒數
+        """
+        return await self.wait_until(
+            target_time=self.booking_date + offset,
+            log_count_down=log_count_down,
+            yield_while_spinning=yield_while_spinning,
+        )
+
+    async def wait_for_deadline_with_tasks(
+        self,
+        offset: timedelta,
+        tasks: list[Coroutine[Any, Any, Any]],
+        log_count_down: bool = True,
+    ) -> None:
+        """等待到開搶時間加上 offset 的時間點，等待期間在背景執行 tasks
+
+        時間到還沒完成的 task 會被取消，發生例外的 task 只會記錄下來，
+        等待的時間只取決於倒數，不會被任何 task 拖延。
+
+        Args:
+            offset (timedelta): 相對開搶時間的偏移
+            tasks (list[Coroutine[Any, Any, Any]]): 要在時間到之前完成的工作
+            log_count_down (bool, optional): 是否印出倒數秒數. Defaults to True.
+        """
+        background = [asyncio.ensure_future(task) for task in tasks]
+        try:
+            await self.wait_for_deadline(offset=offset, log_count_down=log_count_down)
+        finally:
+            pending = [task for task in background if not task.done()]
+            for task in pending:
+                task.cancel()
+            outcomes = await asyncio.gather(*background, return_exceptions=True)
+
+        for task, outcome in zip(background, outcomes):
+            name = task.get_coro().__qualname__
+            if task in pending:
+                logging.warning("%s 沒有在開搶前完成，已取消", name)
+            elif isinstance(outcome, Exception):
+                logging.error("%s 發生錯誤", name, exc_info=outcome)
+
+    def overshoot_ns(self, offset: timedelta = timedelta()) -> int:
+        """計算現在距離開搶時間加上 offset 已經超過多少奈秒，提早則為負數
+
+        Args:
+            offset (timedelta, optional): 相對開搶時間的偏移. Defaults to timedelta().
+
+        Returns:
+            int: 目前超過目標時間的奈秒數
+        """
+        return time.perf_counter_ns() - self.to_perf_counter_ns(self.booking_date + offset)
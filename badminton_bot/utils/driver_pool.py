@@ -0,0 +1,377 @@
+"""有上限而且可以重複使用的 headless Chrome 池，讓多個帳號或運動中心同時用瀏覽器登入
+
+selenium 只在真的要啟動 Chrome 時才載入，只用 HTTP 登入的執行與不含 selenium 的精簡版
+打包都不需要它。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import importlib.util
+import logging
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, TypeVar
+
+from .tracing import tracer
+
+if TYPE_CHECKING:
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+# 每個 Chrome 大約佔用數百 MB 記憶體，預設最多同時開兩個
+DEFAULT_MAX_DRIVERS = 2
+# 每個 Chrome 的使用者資料目錄都建立在這個目錄下，關閉 Chrome 時刪除
+DEFAULT_PROFILE_DIR = Path.home() / ".badminton_bot" / "chrome_profile"
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36"
+)
+# 登入只需要 html 與 javascript，圖片、樣式、字型與追蹤程式都不載入
+BLOCKED_URL_PATTERNS = (
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.svg",
+    "*.ico",
+    "*.webp",
+    "*.css",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*fonts.googleapis.com*",
+    "*fonts.gstatic.com*",
+)
+# 登入用不到的背景功能
+DISABLED_FEATURES = (
+    "Translate",
+    "OptimizationHints",
+    "MediaRouter",
+    "DialMediaRouteProvider",
+    "AutofillServerCommunication",
+    "InterestFeedContentSuggestions",
+)
+
+T = TypeVar("T")
+
+# lean_chrome_options 建立的使用者資料目錄，只有這些目錄會在關閉 Chrome 時刪除
+_temporary_profile_dirs: set[str] = set()
+_temporary_profile_dirs_lock = threading.Lock()
+
+
+def is_browser_available() -> bool:
+    """是否安裝了 selenium，不含 selenium 的精簡版打包無法用瀏覽器登入
+
+    Returns:
+        bool: 可以啟動 Chrome 時為 True
+    """
+    return importlib.util.find_spec("selenium") is not None
+
+
+def default_chrome_options(index: int = 1) -> Options:
+    """Setting default chrome browser options and return
+
+    Args:
+        index (int, optional): index of the driver in the pool. Defaults to 1.
+
+    Returns:
+        Options: Chrome options object
+    """
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+
+    # run chrome browser without UI
+    options.add_argument("--headless")
+
+    # 模擬真實瀏覽器
+    options.add_argument(f"--user-agent={USER_AGENT}")
+
+    return options
+
+
+def lean_chrome_options(index: int = 1, profile_dir: Path = DEFAULT_PROFILE_DIR) -> Options:
+    """只保留登入需要的功能的 Chrome 設定，縮短啟動與登入時間並減少記憶體用量
+
+    Args:
+        index (int, optional): index of the driver in the pool. Defaults to 1.
+        profile_dir (Path, optional): 在這個目錄下為每個 Chrome 建立新的使用者資料目錄. Defaults to DEFAULT_PROFILE_DIR.
+
+    Returns:
+        Options: Chrome options object
+    """
+    options = default_chrome_options(index=index)
+
+    # DOMContentLoaded 後就回傳，不等圖片等子資源載入完成
+    options.page_load_strategy = "eager"
+    # 同一個使用者資料目錄不能同時給兩個 Chrome 使用，而同一個行程中的多個瀏覽器池或其他行程
+    # 都可能開啟相同編號的 Chrome，所以每個 Chrome 都用新的目錄，也不會留下上一個帳號的 cookies
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    user_data_dir = tempfile.mkdtemp(prefix=f"driver-{index}-", dir=profile_dir)
+    with _temporary_profile_dirs_lock:
+        _temporary_profile_dirs.add(user_data_dir)
+    options.add_argument(f"--user-data-dir={user_data_dir}")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument(f"--disable-features={','.join(DISABLED_FEATURES)}")
+    for argument in (
+        "--disable-gpu",
+        "--disable-extensions",
+        "--disable-background-networking",
+        "--disable-component-update",
+        "--disable-default-apps",
+        "--disable-sync",
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--mute-audio",
+    ):
+        options.add_argument(argument)
+
+    return options
+
+
+def start_chrome(options: Options) -> WebDriver:
+    """啟動 Chrome，第一次呼叫時才載入 selenium
+
+    Args:
+        options (Options): Chrome options object
+
+    Returns:
+        WebDriver: 啟動好的 Chrome
+    """
+    from selenium import webdriver
+
+    return webdriver.Chrome(options=options)
+
+
+def block_heavy_resources(driver: WebDriver) -> None:
+    """透過 DevTools protocol 擋下圖片、樣式、字型與第三方追蹤程式的請求
+
+    Args:
+        driver (WebDriver): 剛啟動的 Chrome
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(BLOCKED_URL_PATTERNS)})
+
+
+@dataclass
+class DriverStats:
+    """單一 Chrome 的使用紀錄
+
+    Attributes:
+        index (int): Chrome 的編號
+        startup_seconds (float): 啟動 Chrome 花費的秒數
+        jobs (int): 執行過的工作數
+        total_job_seconds (float): 所有工作加總的秒數
+        last_job_seconds (float): 最近一次工作的秒數
+    """
+
+    index: int
+    startup_seconds: float
+    jobs: int = 0
+    total_job_seconds: float = 0.0
+    last_job_seconds: float = 0.0
+
+
+class ChromeDriverPool:
+    """最多同時開啟 max_drivers 個 Chrome 的瀏覽器池
+
+    每個工作在獨立的執行緒中執行，不會阻塞 event loop；Chrome 在第一次需要時
+    才啟動，工作結束後清除 cookies 並放回池中給下一個工作使用，直到 close 才關閉。
+    WebDriver 物件無法跨行程傳遞，而工作大多在等待 chromedriver 回應，所以使用執行緒池。
+    """
+
+    def __init__(
+        self,
+        max_drivers: int = DEFAULT_MAX_DRIVERS,
+        options_factory: Callable[[int], Options] = lean_chrome_options,
+        driver_factory: Callable[[Options], WebDriver] = start_chrome,
+        driver_setup: Callable[[WebDriver], None] | None = block_heavy_resources,
+    ) -> None:
+        """
+        Args:
+            max_drivers (int, optional): 最多同時開啟幾個 Chrome. Defaults to DEFAULT_MAX_DRIVERS.
+            options_factory (Callable[[int], Options], optional): 依 Chrome 編號產生 Chrome 設定的函式. Defaults to lean_chrome_options.
+            driver_factory (Callable[[Options], WebDriver], optional): 啟動瀏覽器的函式. Defaults to start_chrome.
+            driver_setup (Callable[[WebDriver], None] | None, optional): Chrome 啟動後要執行的設定. Defaults to block_heavy_resources.
+        """
+        self.max_drivers = max_drivers
+        self._options_factory = options_factory
+        self._driver_factory = driver_factory
+        self._driver_setup = driver_setup
+        # 執行緒數等於 Chrome 數上限，同時執行的工作數不會超過 Chrome 數
+        self._executor = ThreadPoolExecutor(max_workers=max_drivers, thread_name_prefix="chrome")
+        self._lock = threading.Lock()
+        self._idle: list[WebDriver] = []
+        self._drivers: dict[int, tuple[WebDriver, DriverStats]] = {}
+        self._profile_dirs: dict[int, str] = {}
+        self._created_count = 0
+
+    async def run(self, job: Callable[[WebDriver], T]) -> T:
+        """取得一個 Chrome 並在背景執行緒中執行 job，沒有空閒的 Chrome 時會等待
+
+        Args:
+            job (Callable[[WebDriver], T]): 使用 Chrome 的工作
+
+        Returns:
+            T: job 的回傳值
+        """
+        return await asyncio.wrap_future(self._executor.submit(self._run_job, job))
+
+    def stats(self) -> list[DriverStats]:
+        """所有開過的 Chrome 的使用紀錄
+
+        Returns:
+            list[DriverStats]: 依編號排序的使用紀錄
+        """
+        with self._lock:
+            return sorted((stats for _, stats in self._drivers.values()), key=lambda s: s.index)
+
+    def log_stats(self) -> None:
+        for stats in self.stats():
+            logging.info(
+                "Chrome #%d：啟動 %.2f 秒，執行 %d 次登入，平均 %.2f 秒，最近一次 %.2f 秒",
+                stats.index,
+                stats.startup_seconds,
+                stats.jobs,
+                stats.total_job_seconds / max(stats.jobs, 1),
+                stats.last_job_seconds,
+            )
+
+    async def close(self) -> None:
+        """關閉所有 Chrome 與執行緒"""
+        await asyncio.get_running_loop().run_in_executor(None, self.close_sync)
+
+    def close_sync(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            drivers = [driver for driver, _ in self._drivers.values()]
+            self._drivers.clear()
+            self._idle.clear()
+
+        if drivers:
+            logging.info("關閉 %d 個瀏覽器", len(drivers))
+        for driver in drivers:
+            self._quit(driver=driver)
+
+    def _run_job(self, job: Callable[[WebDriver], T]) -> T:
+        from selenium.common.exceptions import WebDriverException
+
+        driver = self._acquire()
+        _, stats = self._drivers[id(driver)]
+        start = time.perf_counter()
+        is_reusable = True
+        try:
+            return job(driver)
+        except WebDriverException:
+            # 瀏覽器本身出錯時不放回池中，下一個工作會重新開一個
+            is_reusable = False
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.jobs += 1
+            stats.total_job_seconds += elapsed
+            stats.last_job_seconds = elapsed
+            self._release(driver=driver, is_reusable=is_reusable)
+
+    def _acquire(self) -> WebDriver:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self._created_count += 1
+            index = self._created_count
+
+        logging.info("開啟 Chrome 瀏覽器 #%d", index)
+        start = time.perf_counter()
+        with tracer.span("chrome_startup", index=index):
+            options = self._options_factory(index)
+            profile_dir = _temporary_profile_dir(options=options)
+            try:
+                driver = self._driver_factory(options=options)
+            except BaseException:
+                _remove_profile_dir(profile_dir=profile_dir)
+                raise
+            if self._driver_setup is not None:
+                self._driver_setup(driver)
+        stats = DriverStats(index=index, startup_seconds=time.perf_counter() - start)
+
+        with self._lock:
+            self._drivers[id(driver)] = (driver, stats)
+            if profile_dir is not None:
+                self._profile_dirs[id(driver)] = profile_dir
+        return driver
+
+    def _release(self, driver: WebDriver, is_reusable: bool) -> None:
+        from selenium.common.exceptions import WebDriverException
+
+        if is_reusable:
+            try:
+                # 清掉上一個帳號的登入狀態再給下一個工作使用，delete_all_cookies 只會清掉目前網域的 cookies
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+                driver.get("about:blank")
+            except WebDriverException:
+                is_reusable = False
+
+        with self._lock:
+            if is_reusable:
+                self._idle.append(driver)
+                return
+            self._drivers.pop(id(driver), None)
+        self._quit(driver=driver)
+
+    def _quit(self, driver: WebDriver) -> None:
+        from selenium.common.exceptions import WebDriverException
+
+        try:
+            driver.quit()
+        except WebDriverException as e:
+            logging.debug("關閉瀏覽器失敗： %s", e)
+        with self._lock:
+            profile_dir = self._profile_dirs.pop(id(driver), None)
+        _remove_profile_dir(profile_dir=profile_dir)
+
+
+def _temporary_profile_dir(options: Options) -> str | None:
+    for argument in options.arguments:
+        name, _, value = argument.partition("=")
+        if name == "--user-data-dir":
+            with _temporary_profile_dirs_lock:
+                return value if value in _temporary_profile_dirs else None
+    return None
+
+
+def _remove_profile_dir(profile_dir: str | None) -> None:
+    if profile_dir is None:
+        return
+    with _temporary_profile_dirs_lock:
+        _temporary_profile_dirs.discard(profile_dir)
+    shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+_default_pool: ChromeDriverPool | None = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_driver_pool() -> ChromeDriverPool:
+    """沒有指定瀏覽器池時共用的瀏覽器池，程式結束時自動關閉
+
+    Returns:
+        ChromeDriverPool: 共用的瀏覽器池
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ChromeDriverPool()
+            atexit.register(_default_pool.close_sync)
+        return _default_pool
@@ -0,0 +1,325 @@
+"""把 aiohttp 送出的每個 HTTP 請求與回應記錄成 HAR 格式的檔案，離線時交給 devtools.replay_server 重播
+
+只會記錄掛上 recorder.trace_configs() 的 ClientSession，沒有啟用時不會掛上任何 TraceConfig，
+不影響搶場地的速度。寫入檔案前會遮蔽帳號、密碼與所有 cookie 的值，cookie 名稱與屬性會保留，
+重播時登入流程仍能取得同名的 cookies。登入表單的帳密依欄位名稱遮蔽，其他地方只遮蔽
+完整出現且夠長的帳密，太短的密碼(例如 x 或 2025)不會把 .aspx 或日期一起遮蔽。用瀏覽器登入與直接寫入原始連線的請求不會被記錄。
+"""
+
+import base64
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Iterable
+from urllib.parse import quote, quote_plus, unquote_plus
+
+import aiohttp
+
+REDACTED = "REDACTED"
+HAR_VERSION = "1.2"
+# 這些 header 的值整個遮蔽
+_REDACTED_HEADERS = {"authorization", "proxy-authorization"}
+# 至少這個長度的帳密與 cookie 值才會在網址與內容中遮蔽，避免把 x、2025、true 之類的短字串全部遮蔽
+MIN_SECRET_LENGTH = 8
+
+# 表單內容或 query string 中的一個 name=value，name 前面必須是開頭、? 或 &
+_FORM_FIELD_PATTERN = re.compile(r"(?P<prefix>^|[?&])(?P<name>[^=&?#\s]+)=[^&#\s]*")
+
+
+@dataclass
+class RecordedExchange:
+    """一次請求與回應，重新導向的每一步各自是一個 RecordedExchange
+
+    Attributes:
+        started_at (datetime): 開始送出請求的時間
+        method (str): HTTP method
+        url (str): 請求的網址
+        request_headers (list[tuple[str, str]]): 實際送出的 header
+        request_body (bytearray): 請求內容
+        status (int): HTTP 狀態碼
+        reason (str): 狀態碼說明
+        response_headers (list[tuple[str, str]]): 回應的 header
+        response_body (bytearray): 已讀取的回應內容，沒有讀取內容的回應為空
+        send_ns (int): 從開始到送出 header 的奈秒數
+        wait_ns (int): 從送出 header 到收到回應 header 的奈秒數
+        receive_ns (int): 從收到回應 header 到讀完內容的奈秒數
+    """
+
+    started_at: datetime
+    method: str
+    url: str
+    request_headers: list[tuple[str, str]] = field(default_factory=list)
+    request_body: bytearray = field(default_factory=bytearray)
+    status: int = 0
+    reason: str = ""
+    response_headers: list[tuple[str, str]] = field(default_factory=list)
+    response_body: bytearray = field(default_factory=bytearray)
+    send_ns: int = 0
+    wait_ns: int = 0
+    receive_ns: int = 0
+
+
+class ExchangeRecorder:
+    """收集 HTTP 請求與回應並輸出成遮蔽過帳密的 HAR 檔案"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.exchanges: list[RecordedExchange] = []
+        self._secrets: set[str] = set()
+        self._secret_fields: set[str] = set()
+
+    def enable(self) -> None:
+        """開始記錄，之後建立的 ClientSession 才會被記錄"""
+        self.enabled = True
+        self.exchanges.clear()
+
+    def add_secrets(self, *secrets: str) -> None:
+        """登記寫入檔案前要遮蔽的字串，例如帳號與密碼，網址編碼後的形式也會遮蔽
+
+        只遮蔽前後不是英數字的完整字串，短於 MIN_SECRET_LENGTH 的字串會被忽略，
+        這類短密碼要靠 add_secret_fields 依表單欄位名稱遮蔽。
+
+        Args:
+            secrets (str): 要遮蔽的字串
+        """
+        self._secrets.update(secret for secret in secrets if len(secret) >= MIN_SECRET_LENGTH)
+
+    def add_secret_fields(self, *names: str) -> None:
+        """登記要遮蔽值的表單欄位名稱，請求內容與網址的 query string 中這些欄位的值都會遮蔽
+
+        Args:
+            names (str): 表單欄位名稱，例如登入表單的帳號與密碼欄位
+        """
+        self._secret_fields.update(name for name in names if name)
+
+    def trace_configs(self) -> list[aiohttp.TraceConfig]:
+        """要掛到 ClientSession 上的 TraceConfig
+
+        Returns:
+            list[aiohttp.TraceConfig]: 沒有啟用時為空串列
+        """
+        if not self.enabled:
+            return []
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_request_chunk_sent.append(self._on_request_chunk_sent)
+        trace_config.on_request_headers_sent.append(self._on_request_headers_sent)
+        trace_config.on_request_redirect.append(self._on_request_redirect)
+        trace_config.on_request_end.append(self._on_request_end)
+        trace_config.on_response_chunk_received.append(self._on_response_chunk_received)
+        return [trace_config]
+
+    def to_har(self) -> dict[str, Any]:
+        """轉成遮蔽過帳密的 HAR
+
+        Returns:
+            dict[str, Any]: HAR 的 JSON 物件
+        """
+        return {
+            "log": {
+                "version": HAR_VERSION,
+                "creator": {"name": "badminton_bot", "version": HAR_VERSION},
+                "entries": [self._to_entry(exchange=exchange) for exchange in self.exchanges],
+            }
+        }
+
+    def write(self, path: Path) -> None:
+        """把記錄到的請求寫成 HAR 檔
+
+        Args:
+            path (Path): 輸出的檔案路徑
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_har(), ensure_ascii=False, indent=1))
+
+    def _to_entry(self, exchange: RecordedExchange) -> dict[str, Any]:
+        send, wait, receive = (
+            ns / 1e6 for ns in (exchange.send_ns, exchange.wait_ns, exchange.receive_ns)
+        )
+        response_headers = dict(
+            (name.lower(), value) for name, value in exchange.response_headers
+        )
+        request_entry = {
+            "method": exchange.method,
+            "url": self._redact(exchange.url),
+            "httpVersion": "HTTP/1.1",
+            "headers": self._redact_headers(headers=exchange.request_headers),
+            "queryString": [],
+            "cookies": [],
+            "headersSize": -1,
+            "bodySize": len(exchange.request_body),
+        }
+        if exchange.request_body:
+            request_entry["postData"] = {
+                "mimeType": dict(
+                    (name.lower(), value) for name, value in exchange.request_headers
+                ).get("content-type", ""),
+                **self._body_content(body=exchange.request_body),
+            }
+
+        return {
+            "startedDateTime": exchange.started_at.isoformat(),
+            "time": send + wait + receive,
+            "request": request_entry,
+            "response": {
+                "status": exchange.status,
+                "statusText": exchange.reason,
+                "httpVersion": "HTTP/1.1",
+                "headers": self._redact_headers(headers=exchange.response_headers),
+                "cookies": [],
+                "content": {
+                    "size": len(exchange.response_body),
+                    "mimeType": response_headers.get("content-type", ""),
+                    **self._body_content(body=exchange.response_body),
+                },
+                "redirectURL": self._redact(response_headers.get("location", "")),
+                "headersSize": -1,
+                "bodySize": len(exchange.response_body),
+            },
+            "cache": {},
+            "timings": {"send": send, "wait": wait, "receive": receive},
+        }
+
+    def _body_content(self, body: bytearray) -> dict[str, str]:
+        try:
+            return {"text": self._redact(bytes(body).decode("utf-8"))}
+        except UnicodeDecodeError:
+            return {"text": base64.b64encode(body).decode("ascii"), "encoding": "base64"}
+
+    def _redact_headers(self, headers: Iterable[tuple[str, str]]) -> list[dict[str, str]]:
+        redacted = []
+        for name, value in headers:
+            lower_name = name.lower()
+            if lower_name in _REDACTED_HEADERS:
+                value = REDACTED
+            elif lower_name == "cookie":
+                value = "; ".join(
+                    f"{pair.partition('=')[0].strip()}={REDACTED}" for pair in value.split(";")
+                )
+            elif lower_name == "set-cookie":
+                cookie, _, attributes = value.partition(";")
+                value = f"{cookie.partition('=')[0].strip()}={REDACTED}"
+                if attributes:
+                    value += f";{attributes}"
+            else:
+                value = self._redact(value)
+            redacted.append({"name": name, "value": value})
+        return redacted
+
+    def _redact(self, text: str) -> str:
+        if self._secret_fields:
+            text = _FORM_FIELD_PATTERN.sub(self._redact_form_field, text)
+        for secret in self._secrets:
+            for encoded in {secret, quote(secret, safe=""), quote_plus(secret)}:
+                text = re.sub(
+                    rf"(?<![0-9A-Za-z]){re.escape(encoded)}(?![0-9A-Za-z])", REDACTED, text
+                )
+        return text
+
+    def _redact_form_field(self, match: re.Match) -> str:
+        if unquote_plus(match["name"]) not in self._secret_fields:
+            return match[0]
+        return f"{match['prefix']}{match['name']}={REDACTED}"
+
+    async def _on_request_start(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestStartParams,
+    ) -> None:
+        self._start_exchange(
+            trace_config_ctx=trace_config_ctx, method=params.method, url=params.url
+        )
+
+    async def _on_request_chunk_sent(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestChunkSentParams,
+    ) -> None:
+        trace_config_ctx.exchange.request_body.extend(params.chunk)
+
+    async def _on_request_headers_sent(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestHeadersSentParams,
+    ) -> None:
+        trace_config_ctx.headers_sent_ns = time.perf_counter_ns()
+        exchange = trace_config_ctx.exchange
+        exchange.request_headers = list(params.headers.items())
+        exchange.send_ns = trace_config_ctx.headers_sent_ns - trace_config_ctx.start_ns
+
+    async def _on_request_redirect(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestRedirectParams,
+    ) -> None:
+        # 重新導向的回應內容不會被讀取，記錄後換成下一步的請求
+        self._finish_exchange(trace_config_ctx=trace_config_ctx, response=params.response)
+        self._start_exchange(
+            trace_config_ctx=trace_config_ctx, method=params.method, url=params.url
+        )
+
+    async def _on_request_end(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        # 重新導向後的網址與 method 以實際送出的請求為準
+        trace_config_ctx.exchange.method = params.method
+        trace_config_ctx.exchange.url = str(params.url)
+        self._finish_exchange(trace_config_ctx=trace_config_ctx, response=params.response)
+
+    async def _on_response_chunk_received(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceResponseChunkReceivedParams,
+    ) -> None:
+        exchange = trace_config_ctx.exchange
+        exchange.response_body.extend(params.chunk)
+        exchange.receive_ns = time.perf_counter_ns() - trace_config_ctx.response_ns
+
+    def _start_exchange(self, trace_config_ctx: SimpleNamespace, method: str, url: Any) -> None:
+        trace_config_ctx.start_ns = time.perf_counter_ns()
+        trace_config_ctx.headers_sent_ns = trace_config_ctx.start_ns
+        trace_config_ctx.exchange = RecordedExchange(
+            started_at=datetime.now(timezone.utc).astimezone(),
+            method=method,
+            url=str(url),
+        )
+
+    def _finish_exchange(
+        self, trace_config_ctx: SimpleNamespace, response: aiohttp.ClientResponse
+    ) -> None:
+        trace_config_ctx.response_ns = time.perf_counter_ns()
+        exchange = trace_config_ctx.exchange
+        exchange.status = response.status
+        exchange.reason = response.reason or ""
+        exchange.response_headers = list(response.headers.items())
+        exchange.wait_ns = trace_config_ctx.response_ns - trace_config_ctx.headers_sent_ns
+        self.exchanges.append(exchange)
+
+        # session id 之類的 cookie 值也可能出現在網址或頁面中
+        cookie_values = [
+            pair.partition("=")[2].strip()
+            for name, value in exchange.request_headers
+            if name.lower() == "cookie"
+            for pair in value.split(";")
+        ] + [
+            value.partition(";")[0].partition("=")[2].strip()
+            for name, value in exchange.response_headers
+            if name.lower() == "set-cookie"
+        ]
+        self.add_secrets(*cookie_values)
+
+
+recorder = ExchangeRecorder()
@@ -49,6 +49,27 @@ def parse_input_booking_periods_str(
     return tuple(datetime_list)
 
 
+def parse_input_national_ids_str(input_national_ids_str: str) -> tuple[str, ...]:
+    """parse multiple national ids seperated by comma
+
+    Args:
+        input_national_ids_str (str): user input string of national ids
+
+    Raises:
+        ValueError: if no national id is given or any national id is duplicated, raise this error
+
+    Returns:
+        tuple[str, ...]: national ids in input order
+    """
+    national_ids = tuple(x for x in input_national_ids_str.split(",") if x)
+    if not national_ids:
+        raise ValueError("沒有輸入身分證字號")
+    if len(set(national_ids)) != len(national_ids):
+        raise ValueError("身分證字號重複")
+
+    return national_ids
+
+
 def check_if_target_datetime_is_outdated(target_datetime: datetime) -> datetime:
     """check if the input datetime is in the pass and raise error
 
@@ -0,0 +1,204 @@
+"""以 SQLite 保存每週固定執行的搶場地排程，讓常駐程式重新啟動後可以接續執行"""
+
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from cryptography.fernet import Fernet
+
+from .session_cache import DEFAULT_CACHE_DIR, load_or_create_key
+
+DEFAULT_JOB_STORE_PATH = Path.home() / ".badminton_bot" / "jobs.sqlite3"
+# 預設預約兩週後的場地
+DEFAULT_DAYS_AHEAD = 14
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS booking_jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    center TEXT NOT NULL,
+    username TEXT NOT NULL,
+    encrypted_password BLOB NOT NULL,
+    weekday INTEGER NOT NULL,
+    opening_time TEXT NOT NULL,
+    hours TEXT NOT NULL,
+    days_ahead INTEGER NOT NULL,
+    enabled INTEGER NOT NULL DEFAULT 1,
+    last_booking_date TEXT,
+    last_result TEXT
+)
+"""
+
+
+@dataclass(frozen=True)
+class BookingJob:
+    """每週固定執行一次的搶場地排程
+
+    Attributes:
+        center (str): sports_centers.json 中的運動中心 key
+        username (str): 身分證字號
+        password (str): 密碼
+        weekday (int): 每週開搶的星期幾(ISO 格式，1 為星期一)
+        hours (tuple[int, ...]): 想要預約的小時
+        opening_time (time): 伺服器時間的開搶時刻
+        days_ahead (int): 預約開搶日之後第幾天的場地
+        enabled (bool): 是否啟用
+        job_id (int | None): 資料庫中的編號，尚未保存時為 None
+        last_booking_date (datetime | None): 上一次執行的開搶時間
+        last_result (str | None): 上一次執行的結果摘要
+    """
+
+    center: str
+    username: str
+    password: str = field(repr=False)
+    weekday: int
+    hours: tuple[int, ...]
+    opening_time: time = time(0, 0)
+    days_ahead: int = DEFAULT_DAYS_AHEAD
+    enabled: bool = True
+    job_id: int | None = None
+    last_booking_date: datetime | None = None
+    last_result: str | None = None
+
+    def next_booking_date(self, now: datetime) -> datetime:
+        """計算 now 之後下一次的開搶時間
+
+        Args:
+            now (datetime): 目前時間
+
+        Returns:
+            datetime: 下一次的開搶時間
+        """
+        candidate = datetime.combine(
+            now.date() + timedelta(days=(self.weekday - now.isoweekday()) % 7),
+            self.opening_time,
+        )
+        if candidate <= now:
+            candidate += timedelta(days=7)
+        return candidate
+
+    def booking_periods(self, booking_date: datetime) -> tuple[datetime, ...]:
+        """計算某次開搶要預約的時段
+
+        Args:
+            booking_date (datetime): 開搶時間
+
+        Returns:
+            tuple[datetime, ...]: 想要預約的時段
+        """
+        day = booking_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
+            days=self.days_ahead
+        )
+        return tuple(day.replace(hour=hour) for hour in self.hours)
+
+
+class JobStore:
+    """保存 BookingJob 的 SQLite 資料庫，密碼以和登入快取相同的金鑰加密"""
+
+    def __init__(self, path: Path = DEFAULT_JOB_STORE_PATH, key_dir: Path = DEFAULT_CACHE_DIR) -> None:
+        """
+        Args:
+            path (Path, optional): 資料庫檔案路徑. Defaults to DEFAULT_JOB_STORE_PATH.
+            key_dir (Path, optional): 加密金鑰存放的目錄. Defaults to DEFAULT_CACHE_DIR.
+        """
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+        self._fernet = Fernet(load_or_create_key(key_dir=key_dir))
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def add(self, job: BookingJob) -> BookingJob:
+        """新增排程
+
+        Args:
+            job (BookingJob): 要新增的排程
+
+        Returns:
+            BookingJob: 帶有 job_id 的排程
+        """
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO booking_jobs (center, username, encrypted_password, weekday, "
+                "opening_time, hours, days_ahead, enabled) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.center,
+                    job.username,
+                    self._fernet.encrypt(job.password.encode()),
+                    job.weekday,
+                    job.opening_time.isoformat(),
+                    ",".join(str(hour) for hour in job.hours),
+                    job.days_ahead,
+                    int(job.enabled),
+                ),
+            )
+        return self.get(job_id=cursor.lastrowid)
+
+    def get(self, job_id: int) -> BookingJob | None:
+        row = self._connection.execute(
+            "SELECT * FROM booking_jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return self._to_job(row=row) if row else None
+
+    def list(self, enabled_only: bool = False) -> list[BookingJob]:
+        """列出所有排程
+
+        Args:
+            enabled_only (bool, optional): 只列出啟用中的排程. Defaults to False.
+
+        Returns:
+            list[BookingJob]: 依 job_id 排序的排程
+        """
+        query = "SELECT * FROM booking_jobs"
+        if enabled_only:
+            query += " WHERE enabled = 1"
+        rows = self._connection.execute(query + " ORDER BY job_id").fetchall()
+        return [self._to_job(row=row) for row in rows]
+
+    def remove(self, job_id: int) -> bool:
+        with self._connection:
+            cursor = self._connection.execute("DELETE FROM booking_jobs WHERE job_id = ?", (job_id,))
+        return cursor.rowcount > 0
+
+    def set_enabled(self, job_id: int, enabled: bool) -> bool:
+        with self._connection:
+            cursor = self._connection.execute(
+                "UPDATE booking_jobs SET enabled = ? WHERE job_id = ?", (int(enabled), job_id)
+            )
+        return cursor.rowcount > 0
+
+    def record_run(self, job_id: int, booking_date: datetime, result: str) -> None:
+        """記錄排程最近一次執行的開搶時間與結果
+
+        Args:
+            job_id (int): 排程編號
+            booking_date (datetime): 這次的開搶時間
+            result (str): 結果摘要
+        """
+        with self._connection:
+            self._connection.execute(
+                "UPDATE booking_jobs SET last_booking_date = ?, last_result = ? WHERE job_id = ?",
+                (booking_date.isoformat(), result, job_id),
+            )
+
+    def _to_job(self, row: sqlite3.Row) -> BookingJob:
+        return BookingJob(
+            center=row["center"],
+            username=row["username"],
+            password=self._fernet.decrypt(row["encrypted_password"]).decode(),
+            weekday=row["weekday"],
+            hours=tuple(int(hour) for hour in row["hours"].split(",")),
+            opening_time=time.fromisoformat(row["opening_time"]),
+            days_ahead=row["days_ahead"],
+            enabled=bool(row["enabled"]),
+            job_id=row["job_id"],
+            last_booking_date=(
+                datetime.fromisoformat(row["last_booking_date"])
+                if row["last_booking_date"]
+                else None
+            ),
+            last_result=row["last_result"],
+        )
@@ -0,0 +1,111 @@
+"""不阻塞 event loop 的 log 管線
+
+呼叫 logging 的執行緒只把組好訊息的 record 放進佇列，寫入終端機與檔案都由
+背景執行緒的 QueueListener 處理，開搶前後的 log 不會因為 I/O 延遲請求的送出。
+"""
+
+import json
+import logging
+import queue
+import sys
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import TextIO
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# JSON lines 檔案輪替的大小與保留的舊檔數
+JSON_LOG_MAX_BYTES = 10 * 2**20
+JSON_LOG_BACKUP_COUNT = 5
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """把每筆 log 轉成一行 JSON，方便事後用程式分析每次開搶的紀錄"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(
+            {
+                "time": datetime.fromtimestamp(record.created).isoformat(timespec="microseconds"),
+                "level": record.levelname,
+                "logger": record.name,
+                "process": record.process,
+                "thread": record.threadName,
+                "message": record.getMessage(),
+            },
+            ensure_ascii=False,
+        )
+
+
+class LogPipeline:
+    """把 root logger 的輸出改為經由佇列交給背景執行緒寫入
+
+    QueueHandler 在呼叫端只會把訊息與參數組成字串後放進佇列，時間格式、
+    JSON 序列化與實際的 I/O 都在背景執行緒中進行。
+    """
+
+    def __init__(
+        self,
+        level: int = logging.INFO,
+        stream: TextIO | None = None,
+        json_log_path: Path | None = None,
+        log_format: str = LOG_FORMAT,
+    ) -> None:
+        """
+        Args:
+            level (int, optional): root logger 的等級. Defaults to logging.INFO.
+            stream (TextIO | None, optional): 文字 log 的輸出，不指定則使用 sys.stderr. Defaults to None.
+            json_log_path (Path | None, optional): 另外輸出 JSON lines 的檔案，會自動輪替. Defaults to None.
+            log_format (str, optional): 文字 log 的格式. Defaults to LOG_FORMAT.
+        """
+        self.level = level
+        self.log_format = log_format
+        self.stream = stream
+        self.json_log_path = json_log_path
+        self._listener: QueueListener | None = None
+        self._queue_handler: QueueHandler | None = None
+
+    def start(self) -> None:
+        """取代 root logger 原本的 handler 並啟動背景執行緒"""
+        if self._listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler(self.stream or sys.stderr)
+        stream_handler.setFormatter(logging.Formatter(self.log_format))
+        handlers: list[logging.Handler] = [stream_handler]
+        if self.json_log_path is not None:
+            self.json_log_path.parent.mkdir(parents=True, exist_ok=True)
+            file_handler = RotatingFileHandler(
+                self.json_log_path,
+                maxBytes=JSON_LOG_MAX_BYTES,
+                backupCount=JSON_LOG_BACKUP_COUNT,
+                encoding="utf-8",
+            )
+            file_handler.setFormatter(JsonLinesFormatter())
+            handlers.append(file_handler)
+
+        # SimpleQueue 沒有大小上限也不需要 task_done，放入時不會等待
+        log_queue = queue.SimpleQueue()
+        self._queue_handler = QueueHandler(log_queue)
+        self._listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(self._queue_handler)
+        root.setLevel(self.level)
+        self._listener.start()
+
+    def stop(self) -> None:
+        """寫完佇列中剩下的 log 後停止背景執行緒，並把 root logger 改回直接輸出"""
+        if self._listener is None:
+            return
+
+        self._listener.stop()
+        root = logging.getLogger()
+        root.removeHandler(self._queue_handler)
+        for handler in self._listener.handlers:
+            handler.close()
+        self._listener = None
+        self._queue_handler = None
+        # 程式結束前的 log 不再經過佇列，避免遺失
+        logging.basicConfig(level=self.level, format=self.log_format, stream=self.stream)
@@ -0,0 +1,158 @@
+"""開搶前後降低延遲抖動的設定：uvloop、凍結 GC、綁定 CPU 與提高行程優先權
+
+所有設定都是盡力而為，沒有安裝 uvloop、作業系統不支援或沒有權限時就略過該項設定。
+"""
+
+import asyncio
+import gc
+import logging
+import os
+import threading
+from contextlib import ExitStack
+from datetime import timedelta
+from typing import Any, Coroutine, TypeVar
+
+from .deadline_scheduler import DeadlineScheduler
+
+# 提高優先權時要設定的 nice 值，需要 root 或 CAP_SYS_NICE 權限
+DEFAULT_NICE = -10
+# 開搶前多久開始關閉 GC 並綁定 CPU，這段期間內不能有大量配置記憶體的工作
+LOW_JITTER_OFFSET = timedelta(seconds=-1)
+
+T = TypeVar("T")
+
+# 同一個行程中的多次開搶可能同時進入低抖動模式，只有第一個進入時套用設定，最後一個離開時才還原
+_active_count = 0
+_active_mode: "LowJitterMode | None" = None
+_active_lock = threading.Lock()
+
+
+def run_event_loop(main: Coroutine[Any, Any, T], use_uvloop: bool = False) -> T:
+    """執行 main，use_uvloop 為 True 而且有安裝 uvloop 時改用 uvloop 的 event loop
+
+    Args:
+        main (Coroutine[Any, Any, T]): 要執行的 coroutine
+        use_uvloop (bool, optional): 是否使用 uvloop. Defaults to False.
+
+    Returns:
+        T: main 的回傳值
+    """
+    if use_uvloop:
+        try:
+            import uvloop
+        except ImportError:
+            logging.warning("沒有安裝 uvloop，使用預設的 event loop")
+        else:
+            with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+                return runner.run(main)
+
+    return asyncio.run(main)
+
+
+class LowJitterMode:
+    """在開搶前後暫時關閉 GC、把行程綁在單一 CPU 並提高優先權的 context manager
+
+    進入時先做一次完整的 GC 並凍結現有物件，之後直到離開前都不會有 GC 暫停；
+    離開時依相反順序還原所有設定。可以重複進入，已經在低抖動模式中時只會計數，
+    設定沿用第一個進入的，直到最後一個離開時才還原。
+    """
+
+    def __init__(self, cpu: int | None = None, nice: int = DEFAULT_NICE) -> None:
+        """
+        Args:
+            cpu (int | None, optional): 要綁定的 CPU，不指定則使用目前可用的最後一顆. Defaults to None.
+            nice (int, optional): 要設定的 nice 值. Defaults to DEFAULT_NICE.
+        """
+        self.cpu = cpu
+        self.nice = nice
+        self._was_gc_enabled = True
+        self._original_affinity: set[int] | None = None
+        self._original_priority: int | None = None
+
+    def __enter__(self):
+        global _active_count, _active_mode
+        with _active_lock:
+            _active_count += 1
+            if _active_count > 1:
+                logging.info("已經在低抖動模式中 (%d 次開搶同時使用)", _active_count)
+                return self
+            _active_mode = self
+
+        self._was_gc_enabled = gc.isenabled()
+        gc.collect()
+        # 之後新建立的物件不多，凍結現有物件讓之後就算觸發 GC 也不用掃描它們
+        gc.freeze()
+        gc.disable()
+
+        self._pin_cpu()
+        self._raise_priority()
+        logging.info("進入低抖動模式")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active_count, _active_mode
+        with _active_lock:
+            _active_count -= 1
+            if _active_count > 0:
+                return
+            # 還原最先進入的那一次保存的設定，它不一定是最後離開的
+            mode, _active_mode = _active_mode, None
+        mode._restore()
+
+    def _restore(self) -> None:
+        if self._original_priority is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, 0, self._original_priority)
+            except OSError as e:
+                logging.debug("無法還原行程優先權： %s", e)
+            self._original_priority = None
+
+        if self._original_affinity is not None:
+            os.sched_setaffinity(0, self._original_affinity)
+            self._original_affinity = None
+
+        gc.unfreeze()
+        if self._was_gc_enabled:
+            gc.enable()
+        logging.info("離開低抖動模式")
+
+    def _pin_cpu(self) -> None:
+        if not hasattr(os, "sched_setaffinity"):
+            return
+
+        affinity = os.sched_getaffinity(0)
+        cpu = self.cpu if self.cpu is not None else max(affinity)
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except OSError as e:
+            logging.debug("無法綁定 CPU %d： %s", cpu, e)
+            return
+        self._original_affinity = affinity
+
+    def _raise_priority(self) -> None:
+        if not hasattr(os, "setpriority"):
+            return
+
+        priority = os.getpriority(os.PRIO_PROCESS, 0)
+        if priority <= self.nice:
+            return
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, self.nice)
+        except PermissionError:
+            logging.debug("沒有權限提高行程優先權")
+            return
+        self._original_priority = priority
+
+
+async def enter_low_jitter_mode(
+    scheduler: DeadlineScheduler, stack: ExitStack, cpu: int | None = None
+) -> None:
+    """等到開搶前 LOW_JITTER_OFFSET 再進入低抖動模式，關閉 stack 時離開
+
+    Args:
+        scheduler (DeadlineScheduler): 開搶時間的排程器
+        stack (ExitStack): 連發結束後關閉的 exit stack
+        cpu (int | None, optional): 要綁定的 CPU. Defaults to None.
+    """
+    await scheduler.wait_for_deadline(offset=LOW_JITTER_OFFSET, log_count_down=False)
+    stack.enter_context(LowJitterMode(cpu=cpu))
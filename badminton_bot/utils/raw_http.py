@@ -0,0 +1,298 @@
+"""開搶時直接把預先序列化好的 HTTP/1.1 請求寫入已建立好的連線的最小 HTTP 客戶端
+
+aiohttp 每送出一個請求都要組 url、header 與 cookie 字串，這裡在預熱階段就把每個
+請求的位元組準備好，開搶時只需要把它寫進已經完成 TCP/TLS 交握的連線。只支援
+搶場地用到的 GET/HEAD 請求與 Content-Length 或 chunked 的回應，其他請求仍交給 aiohttp。
+"""
+
+import asyncio
+import logging
+import ssl
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from utils.deadline_scheduler import DeadlineScheduler
+
+from .connection_warmer import DEFAULT_KEEP_ALIVE_INTERVAL, DEFAULT_KEEP_ALIVE_STOP_OFFSET
+
+# 建立連線與等待回應的上限秒數
+RAW_CONNECT_TIMEOUT_SECONDS = 10
+RAW_RESPONSE_TIMEOUT_SECONDS = 10
+# 讀取回應時可能遇到的錯誤，ssl.SSLError 與 ConnectionError 都是 OSError
+RAW_HTTP_ERRORS = (OSError, EOFError, ValueError, asyncio.TimeoutError)
+
+
+def build_request(url: str, method: str = "GET", cookies: dict[str, str] | None = None) -> bytes:
+    """把請求序列化成可以直接寫入連線的 HTTP/1.1 位元組
+
+    Args:
+        url (str): 請求的網址
+        method (str, optional): HTTP method. Defaults to "GET".
+        cookies (dict[str, str] | None, optional): 要帶上的 cookies. Defaults to None.
+
+    Returns:
+        bytes: 完整的請求
+    """
+    parts = urlsplit(url)
+    target = parts.path or "/"
+    if parts.query:
+        target += f"?{parts.query}"
+
+    lines = [
+        f"{method} {target} HTTP/1.1",
+        f"Host: {parts.netloc}",
+        "Accept: */*",
+        # 不壓縮回應，讀到的內容可以直接判斷預約結果
+        "Accept-Encoding: identity",
+        "Connection: keep-alive",
+    ]
+    if cookies:
+        lines.append("Cookie: " + "; ".join(f"{name}={value}" for name, value in cookies.items()))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+@dataclass
+class RawResponse:
+    """讀取完畢的 HTTP 回應
+
+    Attributes:
+        status (int): HTTP 狀態碼
+        headers (dict[str, str]): 以小寫名稱為索引的 header
+        body (bytes): 回應內容
+        keep_alive (bool): 回應結束後連線是否還能繼續使用
+    """
+
+    status: int
+    headers: dict[str, str]
+    body: bytes
+    keep_alive: bool
+
+
+class RawConnection:
+    """已完成 TCP/TLS 交握、一次只處理一個請求的 HTTP/1.1 連線"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.is_reusable = False
+
+    def send(self, request: bytes) -> None:
+        """把請求交給 transport，transport 會立刻嘗試寫入 socket，不需要等待 event loop
+
+        Args:
+            request (bytes): 由 build_request 產生的請求
+        """
+        self.is_reusable = False
+        self.writer.write(request)
+
+    async def read_response(self, method: str = "GET") -> RawResponse:
+        """讀取一個完整的回應，讀完後才能再送出下一個請求
+
+        Args:
+            method (str, optional): 送出的請求的 HTTP method. Defaults to "GET".
+
+        Raises:
+            ConnectionError: 伺服器在回應前關閉連線時發出的例外
+            ValueError: 回應格式不正確時發出的例外
+
+        Returns:
+            RawResponse: 回應
+        """
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("連線已被伺服器關閉")
+        version, status, *_ = status_line.decode("latin-1").split(" ", 2)
+
+        headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        status_code = int(status)
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or status_code in (204, 304) or 100 <= status_code < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self._read_chunked_body()
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            # 沒有長度資訊的回應以關閉連線代表結束
+            body = await self.reader.read()
+            keep_alive = False
+
+        self.is_reusable = keep_alive and not self.writer.is_closing()
+        return RawResponse(status=status_code, headers=headers, body=body, keep_alive=keep_alive)
+
+    async def request(self, request: bytes, method: str = "GET") -> RawResponse:
+        """送出請求並讀取回應
+
+        Args:
+            request (bytes): 由 build_request 產生的請求
+            method (str, optional): 請求的 HTTP method. Defaults to "GET".
+
+        Returns:
+            RawResponse: 回應
+        """
+        self.send(request=request)
+        return await asyncio.wait_for(
+            self.read_response(method=method), timeout=RAW_RESPONSE_TIMEOUT_SECONDS
+        )
+
+    def close(self) -> None:
+        self.is_reusable = False
+        self.writer.close()
+
+    async def _read_chunked_body(self) -> bytes:
+        chunks = []
+        while True:
+            size_line = await self.reader.readline()
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                # 略過 trailer
+                while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+
+class RawConnectionPool:
+    """開搶前預先建立好的 RawConnection 池
+
+    和 ConnectionWarmer 一樣用 HEAD 請求建立並定期確認每條連線，開搶時每個請求
+    各自取用一條閒置的連線，收到回應後再放回池中。
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int,
+        keep_alive_interval: timedelta = DEFAULT_KEEP_ALIVE_INTERVAL,
+    ) -> None:
+        """
+        Args:
+            url (str): 用來預熱連線的網址，必須和搶場地的網址同一個主機
+            pool_size (int): 要維持的連線數，通常等於預計送出的請求數
+            keep_alive_interval (timedelta, optional): 維持連線的間隔. Defaults to DEFAULT_KEEP_ALIVE_INTERVAL.
+        """
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.pool_size = pool_size
+        self.keep_alive_interval = keep_alive_interval
+        self._ssl_context = None
+        if parts.scheme == "https":
+            # 和 aiohttp 的 ssl=False 一樣不驗證憑證
+            self._ssl_context = ssl.create_default_context()
+            self._ssl_context.check_hostname = False
+            self._ssl_context.verify_mode = ssl.CERT_NONE
+        self._ping_request = build_request(url=url, method="HEAD")
+        self._idle: list[RawConnection] = []
+
+    async def warm_up(self) -> int:
+        """確認每條閒置的連線仍可使用，並補上新連線直到連線數等於連線池大小
+
+        Returns:
+            int: 可用的連線數
+        """
+        idle, self._idle = self._idle, []
+        results = await asyncio.gather(*(self._ping(connection=c) for c in idle))
+        alive = [connection for connection, is_alive in zip(idle, results) if is_alive]
+        opened = await asyncio.gather(
+            *(self._open() for _ in range(self.pool_size - len(alive)))
+        )
+        created = [connection for connection in opened if connection is not None]
+        self._idle = alive + created
+
+        logging.info(
+            "原始連線池 %d/%d 條連線可用 (新建 %d 條，重用 %d 條)",
+            len(self._idle),
+            self.pool_size,
+            len(created),
+            len(alive),
+        )
+        return len(self._idle)
+
+    async def keep_alive(
+        self,
+        scheduler: DeadlineScheduler,
+        stop_offset: timedelta = DEFAULT_KEEP_ALIVE_STOP_OFFSET,
+    ) -> None:
+        """定期預熱連線直到開搶時間加上 stop_offset
+
+        Args:
+            scheduler (DeadlineScheduler): 開搶時間的排程器
+            stop_offset (timedelta, optional): 相對開搶時間何時停止維持連線. Defaults to DEFAULT_KEEP_ALIVE_STOP_OFFSET.
+        """
+        stop_ns = scheduler.to_perf_counter_ns(scheduler.booking_date + stop_offset)
+        interval_ns = int(self.keep_alive_interval.total_seconds() * 1e9)
+
+        while (remaining_ns := stop_ns - time.perf_counter_ns()) > 0:
+            await asyncio.sleep(min(interval_ns, remaining_ns) / 1e9)
+            await self.warm_up()
+
+    def acquire(self) -> RawConnection | None:
+        """取出一條閒置的連線，沒有可用的連線時回傳 None，不會等待
+
+        Returns:
+            RawConnection | None: 閒置的連線
+        """
+        while self._idle:
+            connection = self._idle.pop()
+            if not connection.writer.is_closing():
+                return connection
+        return None
+
+    def release(self, connection: RawConnection) -> None:
+        """把讀完回應的連線放回池中，不能再使用的連線直接關閉
+
+        Args:
+            connection (RawConnection): 由 acquire 取出的連線
+        """
+        if connection.is_reusable:
+            self._idle.append(connection)
+        else:
+            connection.close()
+
+    async def close(self) -> None:
+        """關閉所有閒置的連線"""
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+        await asyncio.gather(
+            *(connection.writer.wait_closed() for connection in idle), return_exceptions=True
+        )
+
+    async def _open(self) -> RawConnection | None:
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    self.host,
+                    self.port,
+                    ssl=self._ssl_context,
+                    server_hostname=self.host if self._ssl_context else None,
+                ),
+                timeout=RAW_CONNECT_TIMEOUT_SECONDS,
+            )
+        except RAW_HTTP_ERRORS as e:
+            logging.debug("建立原始連線失敗： %s", e)
+            return None
+
+        connection = RawConnection(reader=reader, writer=writer)
+        return connection if await self._ping(connection=connection) else None
+
+    async def _ping(self, connection: RawConnection) -> bool:
+        try:
+            response = await connection.request(request=self._ping_request, method="HEAD")
+        except RAW_HTTP_ERRORS as e:
+            logging.debug("預熱原始連線失敗： %s", e)
+            connection.close()
+            return False
+
+        if response.status >= 500 or not connection.is_reusable:
+            connection.close()
+            return False
+        return True
@@ -0,0 +1,99 @@
+"""把登入後的 cookies 加密存在本機，下次執行時可以跳過登入"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+
+from cryptography.fernet import Fernet, InvalidToken
+
+DEFAULT_CACHE_DIR = Path.home() / ".badminton_bot" / "session_cache"
+# 有設定這個環境變數的話就用它當加密金鑰，否則會在快取目錄產生一把金鑰
+CACHE_KEY_ENV = "BADMINTON_BOT_CACHE_KEY"
+
+
+class SessionCache:
+    """以運動中心與帳號為單位，加密保存登入後的 cookies"""
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR) -> None:
+        """
+        Args:
+            cache_dir (Path, optional): 快取檔案存放的目錄. Defaults to DEFAULT_CACHE_DIR.
+        """
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._fernet = Fernet(load_or_create_key(key_dir=self.cache_dir))
+
+    def load(self, sports_center_name: str, username: str) -> dict[str, str] | None:
+        """讀取快取的 cookies
+
+        Args:
+            sports_center_name (str): 運動中心名稱
+            username (str): 帳號
+
+        Returns:
+            dict[str, str] | None: 快取的 cookies，沒有快取或無法解密時回傳 None
+        """
+        path = self._cache_path(sports_center_name=sports_center_name, username=username)
+        if not path.exists():
+            return None
+
+        try:
+            payload = json.loads(self._fernet.decrypt(path.read_bytes()))
+        except (InvalidToken, ValueError):
+            logging.error("無法讀取%s的登入快取，忽略快取", sports_center_name)
+            return None
+
+        logging.info("讀取%s於 %s 保存的登入快取", sports_center_name, payload["saved_at"])
+        return payload["cookies"]
+
+    def save(self, sports_center_name: str, username: str, cookies: dict[str, str]) -> None:
+        """加密保存 cookies
+
+        Args:
+            sports_center_name (str): 運動中心名稱
+            username (str): 帳號
+            cookies (dict[str, str]): 登入後取得的 cookies
+        """
+        payload = {"saved_at": datetime.now().isoformat(), "cookies": cookies}
+        path = self._cache_path(sports_center_name=sports_center_name, username=username)
+        path.write_bytes(self._fernet.encrypt(json.dumps(payload).encode()))
+        os.chmod(path, 0o600)
+
+    def delete(self, sports_center_name: str, username: str) -> None:
+        """刪除快取的 cookies
+
+        Args:
+            sports_center_name (str): 運動中心名稱
+            username (str): 帳號
+        """
+        path = self._cache_path(sports_center_name=sports_center_name, username=username)
+        path.unlink(missing_ok=True)
+
+    def _cache_path(self, sports_center_name: str, username: str) -> Path:
+        # 檔名用雜湊，避免身分證字號以明碼出現在檔名中
+        digest = hashlib.sha256(f"{sports_center_name}:{username}".encode()).hexdigest()
+        return self.cache_dir / f"{digest}.bin"
+
+
+def load_or_create_key(key_dir: Path = DEFAULT_CACHE_DIR) -> bytes:
+    """讀取加密金鑰，環境變數沒有設定金鑰時使用 key_dir 中的金鑰檔，沒有金鑰檔就產生一把
+
+    Args:
+        key_dir (Path, optional): 金鑰檔存放的目錄. Defaults to DEFAULT_CACHE_DIR.
+
+    Returns:
+        bytes: Fernet 金鑰
+    """
+    if os.environ.get(CACHE_KEY_ENV):
+        return os.environ[CACHE_KEY_ENV].encode()
+
+    key_path = key_dir / "cache.key"
+    if not key_path.exists():
+        key_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        key_path.write_bytes(Fernet.generate_key())
+        os.chmod(key_path, 0o600)
+
+    return key_path.read_bytes()
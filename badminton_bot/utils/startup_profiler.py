@@ -0,0 +1,255 @@
+"""量測啟動時每個模組的載入時間，main.py --profile-startup 時使用
+
+在 sys.meta_path 最前面插入一個 finder，把其他 finder 找到的 loader 包起來，
+每個模組的載入時間分成三段：
+    尋找：在 sys.path 中找到模組的時間
+    解開：讀取 .pyc 並還原成 code 物件的時間，打包後是從 PYZ 解壓縮，C 擴充模組則是載入 .so
+    執行：執行模組本體的時間
+模組執行時又載入的其他模組會從上層模組的自身時間中扣除，另外累計到上層模組的累計時間。
+這個模組只使用標準函式庫中已經載入的模組，量測本身幾乎不會影響結果。
+"""
+
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any
+
+# 報告中列出耗時最長的套件數與模組數
+DEFAULT_REPORT_TOP = 20
+
+
+@dataclass
+class ModuleTiming:
+    """單一模組的載入時間
+
+    Attributes:
+        name (str): 模組名稱
+        find_ns (int): 尋找模組的奈秒數
+        unpack_ns (int): 讀取並還原 code 物件或載入 C 擴充模組的奈秒數
+        exec_ns (int): 執行模組本體的奈秒數，包含期間載入其他模組的時間
+        nested_ns (int): 執行期間載入其他模組的奈秒數
+        parent (str | None): 載入這個模組的上層模組，直接由量測開始後的程式載入時為 None
+    """
+
+    name: str
+    parent: str | None = None
+    find_ns: int = 0
+    unpack_ns: int = 0
+    exec_ns: int = 0
+    nested_ns: int = 0
+
+    @property
+    def cumulative_ns(self) -> int:
+        """包含載入其他模組的總時間"""
+        return self.find_ns + self.unpack_ns + self.exec_ns
+
+    @property
+    def self_ns(self) -> int:
+        """扣除載入其他模組後，這個模組本身的時間"""
+        return self.cumulative_ns - self.nested_ns
+
+    @property
+    def package(self) -> str:
+        """模組所屬的最上層套件"""
+        return self.name.partition(".")[0]
+
+
+class _TimedLoader:
+    """計時後再交給原本 loader 的 loader，其他屬性都轉給原本的 loader"""
+
+    def __init__(self, loader: Any, timing: ModuleTiming, profiler: "StartupProfiler") -> None:
+        self._loader = loader
+        self._timing = timing
+        self._profiler = profiler
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+    def create_module(self, spec: Any) -> Any:
+        create_module = getattr(self._loader, "create_module", None)
+        if create_module is None:
+            return None
+
+        start_ns = time.perf_counter_ns()
+        try:
+            return create_module(spec)
+        finally:
+            self._timing.unpack_ns += time.perf_counter_ns() - start_ns
+
+    def exec_module(self, module: Any) -> None:
+        # 原本的 exec_module 會呼叫自己的 get_code，暫時換成計時的版本才能分開解開與執行的時間
+        timing = self._timing
+        get_code = getattr(self._loader, "get_code", None)
+        is_patched = False
+        if get_code is not None and not isinstance(self._loader, type):
+
+            def timed_get_code(fullname: str) -> Any:
+                start_ns = time.perf_counter_ns()
+                try:
+                    return get_code(fullname)
+                finally:
+                    timing.unpack_ns += time.perf_counter_ns() - start_ns
+
+            try:
+                self._loader.get_code = timed_get_code
+                is_patched = True
+            except AttributeError:
+                pass
+
+        stack = self._profiler._stack
+        stack.append(timing)
+        unpack_before_ns = timing.unpack_ns
+        start_ns = time.perf_counter_ns()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed_ns = time.perf_counter_ns() - start_ns
+            timing.exec_ns += elapsed_ns - (timing.unpack_ns - unpack_before_ns)
+            if is_patched:
+                del self._loader.get_code
+            stack.pop()
+            if stack:
+                stack[-1].nested_ns += timing.unpack_ns + timing.exec_ns
+
+
+class _TimedFinder:
+    """依序詢問 sys.meta_path 中其他的 finder，找到後把 loader 換成 _TimedLoader"""
+
+    def __init__(self, profiler: "StartupProfiler") -> None:
+        self._profiler = profiler
+
+    def find_spec(self, fullname: str, path: Any = None, target: Any = None) -> Any:
+        profiler = self._profiler
+        start_ns = time.perf_counter_ns()
+        spec = None
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        find_ns = time.perf_counter_ns() - start_ns
+        if profiler._stack:
+            profiler._stack[-1].nested_ns += find_ns
+
+        # 找不到時交還給匯入機制，照原本的方式處理或丟出 ImportError
+        if spec is None or spec.loader is None:
+            return None
+
+        timing = ModuleTiming(
+            name=fullname,
+            parent=profiler._stack[-1].name if profiler._stack else None,
+            find_ns=find_ns,
+        )
+        profiler.timings.append(timing)
+        spec.loader = _TimedLoader(loader=spec.loader, timing=timing, profiler=profiler)
+        return spec
+
+
+class StartupProfiler:
+    """記錄啟用後載入的每個模組的時間，並產生依套件與模組整理的報告"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.timings: list[ModuleTiming] = []
+        self._stack: list[ModuleTiming] = []
+        self._finder = _TimedFinder(profiler=self)
+        self._enabled_ns = 0
+        self._process_start_ns: int | None = None
+
+    def enable(self) -> None:
+        """開始量測，之後才載入的模組才會被記錄"""
+        if self.enabled:
+            return
+        self.enabled = True
+        self._enabled_ns = time.perf_counter_ns()
+        self._process_start_ns = _process_age_ns()
+        sys.meta_path.insert(0, self._finder)
+
+    def disable(self) -> None:
+        """停止量測，已經記錄的時間會保留"""
+        if not self.enabled:
+            return
+        self.enabled = False
+        sys.meta_path.remove(self._finder)
+
+    def report(self, top: int = DEFAULT_REPORT_TOP) -> str:
+        """產生啟動耗時的報告
+
+        Args:
+            top (int, optional): 列出耗時最長的前幾個套件與模組. Defaults to DEFAULT_REPORT_TOP.
+
+        Returns:
+            str: 可以直接印出的報告
+        """
+        elapsed_ns = time.perf_counter_ns() - self._enabled_ns
+        # 只加總最上層的模組，巢狀載入的時間已經包含在上層模組的累計時間中
+        import_ns = sum(
+            timing.cumulative_ns for timing in self.timings if timing.parent is None
+        )
+        lines = ["啟動耗時分析"]
+        if self._process_start_ns is not None:
+            lines.append(
+                f"  行程啟動到開始量測 {self._process_start_ns / 1e6:8.1f} ms"
+                f"  (Python 直譯器啟動{'與解壓縮打包檔' if _is_onefile_bundle() else ''})"
+            )
+        lines.append(f"  開始量測到產生報告 {elapsed_ns / 1e6:8.1f} ms")
+        lines.append(f"  載入模組           {import_ns / 1e6:8.1f} ms  共 {len(self.timings)} 個模組")
+
+        packages: dict[str, list[ModuleTiming]] = {}
+        for timing in self.timings:
+            packages.setdefault(timing.package, []).append(timing)
+        lines.append("")
+        lines.append(f"依套件加總自身時間，前 {top} 名")
+        lines.append(f"{'套件':<24}{'模組數':>7}{'尋找':>10}{'解開':>10}{'執行':>10}{'合計':>10}")
+        for package, timings in sorted(
+            packages.items(), key=lambda item: -sum(t.self_ns for t in item[1])
+        )[:top]:
+            find_ns = sum(t.find_ns for t in timings)
+            unpack_ns = sum(t.unpack_ns for t in timings)
+            self_exec_ns = sum(t.self_ns for t in timings) - find_ns - unpack_ns
+            lines.append(
+                f"{package:<26}{len(timings):>10}{find_ns / 1e6:>12.1f}{unpack_ns / 1e6:>12.1f}"
+                f"{self_exec_ns / 1e6:>12.1f}{(find_ns + unpack_ns + self_exec_ns) / 1e6:>12.1f}"
+            )
+
+        lines.append("")
+        lines.append(f"依模組累計時間，前 {top} 名")
+        lines.append(f"{'模組':<46}{'累計':>10}{'自身':>10}{'解開':>10}")
+        for timing in sorted(self.timings, key=lambda t: -t.cumulative_ns)[:top]:
+            lines.append(
+                f"{timing.name:<48}{timing.cumulative_ns / 1e6:>12.1f}"
+                f"{timing.self_ns / 1e6:>12.1f}{timing.unpack_ns / 1e6:>12.1f}"
+            )
+        lines.append("(單位：毫秒)")
+        return "\n".join(lines)
+
+
+def _process_age_ns() -> int | None:
+    """從行程啟動到現在的奈秒數，只支援 Linux，精度是一個 clock tick (通常 10 毫秒)"""
+    try:
+        with open(f"/proc/{_measured_pid()}/stat") as stat_file:
+            # comm 欄位可能含有空白，從最後一個括號後開始算，starttime 是第 22 個欄位
+            fields = stat_file.read().rpartition(")")[2].split()
+        with open("/proc/uptime") as uptime_file:
+            uptime_seconds = float(uptime_file.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    start_seconds = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    return max(int((uptime_seconds - start_seconds) * 1e9), 0)
+
+
+def _measured_pid() -> int:
+    # 單檔打包時由上層的 bootloader 行程先解壓縮到暫存目錄，從上層行程啟動開始算才包含解壓縮
+    return os.getppid() if _is_onefile_bundle() else os.getpid()
+
+
+def _is_onefile_bundle() -> bool:
+    meipass = getattr(sys, "_MEIPASS", None)
+    return bool(getattr(sys, "frozen", False) and meipass and os.path.basename(meipass).startswith("_MEI"))
+
+
+profiler = StartupProfiler()
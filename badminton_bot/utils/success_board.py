@@ -0,0 +1,118 @@
+"""多個搶場地行程透過共享記憶體共用開搶時間、時鐘偏移與每個時段搶到的場地數"""
+
+from datetime import datetime, timedelta
+from multiprocessing.shared_memory import SharedMemory
+
+# 共享記憶體開頭的欄位：開搶時間(epoch 奈秒)、時鐘偏移(奈秒)
+_DEADLINE_CELL = 0
+_CLOCK_OFFSET_CELL = 1
+_HEADER_CELLS = 2
+# 每個欄位都是 int64
+_CELL_FORMAT = "q"
+_CELL_SIZE = 8
+
+
+class SuccessBoard:
+    """多個行程共用的搶場地狀態
+
+    每個工作行程只寫入屬於自己的欄位，讀取時再加總所有工作行程的欄位，
+    所以不需要跨行程的鎖。物件被 pickle 傳給其他行程時只會傳送共享記憶體的名稱，
+    在新的行程中會重新連接同一塊共享記憶體。
+    """
+
+    def __init__(
+        self,
+        booking_periods: tuple[datetime, ...],
+        worker_count: int,
+        name: str | None = None,
+    ) -> None:
+        """
+        Args:
+            booking_periods (tuple[datetime, ...]): 所有工作行程要搶的時段
+            worker_count (int): 工作行程數
+            name (str | None, optional): 要連接的共享記憶體名稱，不指定則建立新的共享記憶體. Defaults to None.
+        """
+        self.booking_periods = tuple(booking_periods)
+        self.worker_count = worker_count
+        # 目前行程寫入的欄位，只有工作行程需要設定
+        self.worker_index: int | None = None
+        self._slot_indexes = {period: index for index, period in enumerate(self.booking_periods)}
+
+        cell_count = _HEADER_CELLS + worker_count * len(self.booking_periods)
+        if name is None:
+            self._shared_memory = SharedMemory(create=True, size=cell_count * _CELL_SIZE)
+        else:
+            self._shared_memory = SharedMemory(name=name)
+        self._cells = self._shared_memory.buf.cast(_CELL_FORMAT)
+
+    def __reduce__(self):
+        return (self.__class__, (self.booking_periods, self.worker_count, self.name))
+
+    @property
+    def name(self) -> str:
+        return self._shared_memory.name
+
+    def publish_deadline(self, booking_date: datetime, clock_offset: timedelta) -> None:
+        """寫入校時後的本機送出時間與時鐘偏移，工作行程倒數前會讀取
+
+        Args:
+            booking_date (datetime): 校時後的本機送出時間
+            clock_offset (timedelta): 本機送出時間相對伺服器開搶時間的偏移
+        """
+        self._cells[_DEADLINE_CELL] = int(booking_date.timestamp() * 1e9)
+        self._cells[_CLOCK_OFFSET_CELL] = int(clock_offset.total_seconds() * 1e9)
+
+    @property
+    def booking_date(self) -> datetime:
+        """校時後的本機送出時間"""
+        return datetime.fromtimestamp(self._cells[_DEADLINE_CELL] / 1e9)
+
+    @property
+    def clock_offset(self) -> timedelta:
+        """本機送出時間相對伺服器開搶時間的偏移"""
+        return timedelta(microseconds=self._cells[_CLOCK_OFFSET_CELL] / 1e3)
+
+    def won_count(self, booking_date: datetime) -> int:
+        """所有工作行程在某個時段搶到的場地數
+
+        Args:
+            booking_date (datetime): 預約時段
+
+        Returns:
+            int: 搶到的場地數，不在看板上的時段回傳 0
+        """
+        slot_index = self._slot_indexes.get(booking_date)
+        if slot_index is None:
+            return 0
+        return sum(
+            self._cells[self._cell_index(worker_index=worker_index, slot_index=slot_index)]
+            for worker_index in range(self.worker_count)
+        )
+
+    def record_win(self, booking_date: datetime) -> None:
+        """記錄目前的工作行程在某個時段搶到一個場地，其他工作行程會立刻看到
+
+        Args:
+            booking_date (datetime): 預約時段
+
+        Raises:
+            RuntimeError: 沒有設定 worker_index 時發出的例外
+        """
+        if self.worker_index is None:
+            raise RuntimeError("只有工作行程可以記錄搶到的場地")
+
+        slot_index = self._slot_indexes.get(booking_date)
+        if slot_index is not None:
+            self._cells[self._cell_index(worker_index=self.worker_index, slot_index=slot_index)] += 1
+
+    def close(self) -> None:
+        """中斷目前行程與共享記憶體的連接"""
+        self._cells.release()
+        self._shared_memory.close()
+
+    def unlink(self) -> None:
+        """釋放共享記憶體，只能由建立的行程在所有工作行程結束後呼叫"""
+        self._shared_memory.unlink()
+
+    def _cell_index(self, worker_index: int, slot_index: int) -> int:
+        return _HEADER_CELLS + worker_index * len(self.booking_periods) + slot_index
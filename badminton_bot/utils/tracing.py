@@ -0,0 +1,159 @@
+"""以 perf_counter_ns 記錄各階段耗時，輸出成 Chrome trace / Perfetto 可以開啟的 JSON"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Iterator
+
+import aiohttp
+
+_NULL_CONTEXT = nullcontext()
+
+
+class Tracer:
+    """收集 Chrome trace 格式的事件
+
+    沒有啟用時 span 直接回傳共用的 nullcontext，instant 只做一次布林判斷，
+    幾乎不會增加額外的負擔。
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._events: list[dict[str, Any]] = []
+        self._origin_ns = time.perf_counter_ns()
+        self._lanes: dict[tuple[str, int], int] = {}
+
+    def enable(self) -> None:
+        """開始記錄事件，時間以呼叫當下為 0"""
+        self.enabled = True
+        self._events.clear()
+        self._lanes.clear()
+        self._origin_ns = time.perf_counter_ns()
+
+    def span(self, name: str, **args: Any):
+        """記錄一段區間的 context manager
+
+        Args:
+            name (str): 區間名稱
+
+        Returns:
+            ContextManager: 沒有啟用時回傳不做任何事的 context manager
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._span(name=name, args=args)
+
+    def instant(self, name: str, **args: Any) -> None:
+        """記錄一個時間點
+
+        Args:
+            name (str): 事件名稱
+        """
+        if not self.enabled:
+            return
+        self.complete(name=name, start_ns=time.perf_counter_ns(), end_ns=None, **args)
+
+    def complete(self, name: str, start_ns: int, end_ns: int | None, **args: Any) -> None:
+        """用已經量好的 perf_counter_ns 時間記錄事件，end_ns 為 None 時記錄成時間點
+
+        Args:
+            name (str): 事件名稱
+            start_ns (int): 開始時間
+            end_ns (int | None): 結束時間
+        """
+        if not self.enabled:
+            return
+
+        event = {
+            "name": name,
+            "ts": (start_ns - self._origin_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": self._current_lane(),
+            "args": args,
+        }
+        if end_ns is None:
+            event.update(ph="i", s="t")
+        else:
+            event.update(ph="X", dur=(end_ns - start_ns) / 1000)
+        self._events.append(event)
+
+    def request_trace_config(self) -> aiohttp.TraceConfig:
+        """記錄每個 HTTP 請求開始、送出 header、收到第一個 byte 的 TraceConfig
+
+        Returns:
+            aiohttp.TraceConfig: 要掛到 ClientSession 上的 TraceConfig
+        """
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_request_headers_sent.append(self._on_request_headers_sent)
+        trace_config.on_request_end.append(self._on_request_end)
+        return trace_config
+
+    def write(self, path: Path) -> None:
+        """把收集到的事件寫成 JSON 檔
+
+        Args:
+            path (Path): 輸出的檔案路徑
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps({"traceEvents": self._events, "displayTimeUnit": "ns"}, ensure_ascii=False)
+        )
+
+    @contextmanager
+    def _span(self, name: str, args: dict[str, Any]) -> Iterator[None]:
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.complete(name=name, start_ns=start_ns, end_ns=time.perf_counter_ns(), **args)
+
+    def _current_lane(self) -> int:
+        # 每個 asyncio task 各自一條時間軸，方便看出同時進行的請求。用 id 當 key 才不會
+        # 讓已經結束的 task 一直留在記憶體中，id 被重複使用時前一個 task 早已結束，時間軸不會重疊
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = ("task", id(task)) if task is not None else ("thread", threading.get_ident())
+        return self._lanes.setdefault(key, len(self._lanes))
+
+    async def _on_request_start(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestStartParams,
+    ) -> None:
+        trace_config_ctx.start_ns = time.perf_counter_ns()
+        trace_config_ctx.url = str(params.url)
+
+    async def _on_request_headers_sent(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestHeadersSentParams,
+    ) -> None:
+        self.instant("request_headers_sent", url=str(params.url))
+
+    async def _on_request_end(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        # on_request_end 在收到回應 header 時觸發，也就是第一個 byte 抵達的時間
+        self.complete(
+            name="request_first_byte",
+            start_ns=trace_config_ctx.start_ns,
+            end_ns=time.perf_counter_ns(),
+            url=trace_config_ctx.url,
+            status=params.response.status,
+        )
+
+
+tracer = Tracer()
@@ -1,3 +1,9 @@
 #!/bin/bash
 
-pyinstaller badminton_bot/main.py --add-data "./badminton_bot/services:./services" --add-data "./badminton_bot/utils:./utils" --collect-all selenium -y
\ No newline at end of file
+# ./bundling_scripts.sh        完整版，包含瀏覽器登入需要的 selenium
+# ./bundling_scripts.sh --lite 精簡版，不含 selenium 只能用 HTTP 登入，檔案較小、啟動時解開的模組也較少
+if [ "$1" == "--lite" ]; then
+    pyinstaller badminton_bot/main.py --add-data "./badminton_bot/services:./services" --add-data "./badminton_bot/utils:./utils" --exclude-module selenium --name main-lite -y
+else
+    pyinstaller badminton_bot/main.py --add-data "./badminton_bot/services:./services" --add-data "./badminton_bot/utils:./utils" --collect-all selenium -y
+fi
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 程式以 badminton_bot 目錄為根目錄匯入 services、utils 與 devtools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "badminton_bot"))
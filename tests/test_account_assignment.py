@@ -0,0 +1,43 @@
+"""把時段分配給多個帳號"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from services.account_assignment import BookingAccount, assign_booking_periods
+
+FIRST = BookingAccount(username="A123456789", password="first")
+SECOND = BookingAccount(username="B123456789", password="second")
+PERIODS = tuple(datetime(2025, 4, 26, 18) + timedelta(hours=i) for i in range(5))
+
+
+def test_periods_are_assigned_round_robin():
+    assignments = assign_booking_periods(accounts=(FIRST, SECOND), booking_periods=PERIODS)
+
+    assert assignments == {
+        FIRST: (PERIODS[0], PERIODS[2], PERIODS[4]),
+        SECOND: (PERIODS[1], PERIODS[3]),
+    }
+
+
+def test_each_period_is_assigned_once():
+    assignments = assign_booking_periods(accounts=(FIRST, SECOND), booking_periods=PERIODS)
+
+    assigned = [period for periods in assignments.values() for period in periods]
+    assert sorted(assigned) == list(PERIODS)
+
+
+def test_accounts_without_periods_are_left_out():
+    assignments = assign_booking_periods(accounts=(FIRST, SECOND), booking_periods=PERIODS[:1])
+
+    assert assignments == {FIRST: PERIODS[:1]}
+
+
+def test_without_accounts():
+    with pytest.raises(ValueError):
+        assign_booking_periods(accounts=(), booking_periods=PERIODS)
+
+
+def test_duplicated_accounts():
+    duplicated = BookingAccount(username=FIRST.username, password="other")
+    with pytest.raises(ValueError):
+        assign_booking_periods(accounts=(FIRST, duplicated), booking_periods=PERIODS)
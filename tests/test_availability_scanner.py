@@ -0,0 +1,129 @@
+"""以條件式請求掃描時刻表，沒有變動的頁面不重新解析"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import aiohttp
+from aiohttp import web
+from devtools.mock_sports_center import MockServerConfig, MockSportsCenterServer
+from services.availability_scanner import AvailabilityScanner
+from services.sports_center_webservice import LOGIN_BACKEND_HTTP, BookingOutcome
+from services.zhongshan_sports_center_webservice import ZhongshanSportsCenterWebService
+
+USERNAME = "A123456789"
+PASSWORD = "correct-password"
+BOOKING_DATE = (datetime.now() + timedelta(days=14)).replace(
+    hour=20, minute=0, second=0, microsecond=0
+)
+
+
+def status_recorder(statuses: list[int]) -> aiohttp.TraceConfig:
+    async def on_request_end(session, context, params):
+        statuses.append(params.response.status)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
+
+
+def count_parses(scanner: AvailabilityScanner) -> list[str]:
+    parsed: list[str] = []
+    parse_available_slots = scanner.service.parse_available_slots
+
+    def counting_parse(html: str) -> set[tuple[str, int]]:
+        parsed.append(html)
+        return parse_available_slots(html=html)
+
+    scanner.service.parse_available_slots = counting_parse
+    return parsed
+
+
+def is_winnable(scanner: AvailabilityScanner, booking_date: datetime) -> bool:
+    return scanner.index.is_winnable(
+        center=scanner.service.sports_center_name(), court="84", booking_date=booking_date
+    )
+
+
+def test_unchanged_schedule_is_answered_with_304():
+    async def run():
+        config = MockServerConfig(port=0, accounts={USERNAME: PASSWORD})
+        async with MockSportsCenterServer(config=config) as server:
+            service = ZhongshanSportsCenterWebService(
+                username=USERNAME,
+                password=PASSWORD,
+                login_backend=LOGIN_BACKEND_HTTP,
+                base_url=server.base_url,
+            )
+            await service.http_login()
+            scanner = AvailabilityScanner(service=service)
+            parsed = count_parses(scanner=scanner)
+            statuses: list[int] = []
+
+            async with aiohttp.ClientSession(
+                cookies=service.get_cookies(), trace_configs=[status_recorder(statuses)]
+            ) as session:
+                await scanner.scan(session=session, booking_dates=(BOOKING_DATE,))
+                assert statuses == [200]
+                assert len(parsed) == 1
+                assert is_winnable(scanner=scanner, booking_date=BOOKING_DATE)
+
+                # 時刻表沒有變動，伺服器回應 304，沿用上次解析的結果
+                await scanner.scan(session=session, booking_dates=(BOOKING_DATE,))
+                assert statuses == [200, 304]
+                assert len(parsed) == 1
+                assert is_winnable(scanner=scanner, booking_date=BOOKING_DATE)
+
+                # 時段被預約後 ETag 改變，重新解析後這個時段就搶不到了
+                booking_url = service.get_booking_url(booking_date=BOOKING_DATE, court="84")
+                outcome = await service.send_booking_request(session=session, booking_url=booking_url)
+                assert outcome is BookingOutcome.SUCCESS
+                statuses.clear()
+                await scanner.scan(session=session, booking_dates=(BOOKING_DATE,))
+                assert statuses == [200]
+                assert len(parsed) == 2
+                assert not is_winnable(scanner=scanner, booking_date=BOOKING_DATE)
+                assert is_winnable(scanner=scanner, booking_date=BOOKING_DATE + timedelta(hours=1))
+
+    asyncio.run(run())
+
+
+def test_unchanged_schedule_without_etag_is_not_parsed_again():
+    async def run():
+        requests: list[web.Request] = []
+
+        async def schedule_page(request: web.Request) -> web.Response:
+            requests.append(request)
+            html = '<td><img src="img/sche01.png" onclick="Step3Action(84,20)" /></td>'
+            return web.Response(text=html, content_type="text/html")
+
+        app = web.Application()
+        app.router.add_get("/tp01.aspx", schedule_page)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host="127.0.0.1", port=0)
+        await site.start()
+        try:
+            port = site._server.sockets[0].getsockname()[1]
+            service = ZhongshanSportsCenterWebService(
+                username=USERNAME,
+                password=PASSWORD,
+                login_backend=LOGIN_BACKEND_HTTP,
+                base_url=f"http://127.0.0.1:{port}",
+            )
+            scanner = AvailabilityScanner(service=service)
+            parsed = count_parses(scanner=scanner)
+
+            async with aiohttp.ClientSession() as session:
+                await scanner.scan(session=session, booking_dates=(BOOKING_DATE,))
+                await scanner.scan(session=session, booking_dates=(BOOKING_DATE,))
+
+            # 沒有 ETag 與 Last-Modified 時每次都會重新下載，但內容相同就不重新解析
+            assert len(requests) == 2
+            assert "If-None-Match" not in requests[1].headers
+            assert len(parsed) == 1
+            assert is_winnable(scanner=scanner, booking_date=BOOKING_DATE)
+            assert not is_winnable(scanner=scanner, booking_date=BOOKING_DATE + timedelta(hours=1))
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
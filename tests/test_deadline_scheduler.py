@@ -0,0 +1,56 @@
+"""倒數計時最後一段忙等時是否讓出事件迴圈"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from utils.deadline_scheduler import DeadlineScheduler
+
+
+async def ran_during_wait(yield_while_spinning: bool) -> bool:
+    scheduler = DeadlineScheduler(booking_date=datetime.now() + timedelta(milliseconds=5))
+    ran = asyncio.Event()
+    task = asyncio.create_task(asyncio.sleep(0))
+    task.add_done_callback(lambda _: ran.set())
+
+    await scheduler.wait_for_deadline(
+        log_count_down=False, yield_while_spinning=yield_while_spinning
+    )
+    is_ran = ran.is_set()
+    await task
+    return is_ran
+
+
+def test_spin_blocks_the_event_loop_by_default():
+    assert not asyncio.run(ran_during_wait(yield_while_spinning=False))
+
+
+def test_spin_can_yield_to_pending_tasks():
+    assert asyncio.run(ran_during_wait(yield_while_spinning=True))
+
+
+def test_tasks_do_not_delay_the_deadline(caplog):
+    async def run() -> tuple[int, list[str]]:
+        finished: list[str] = []
+
+        async def quick() -> None:
+            finished.append("quick")
+
+        async def slow() -> None:
+            await asyncio.sleep(10)
+            finished.append("slow")
+
+        async def broken() -> None:
+            raise ValueError("broken")
+
+        scheduler = DeadlineScheduler(booking_date=datetime.now() + timedelta(milliseconds=50))
+        await scheduler.wait_for_deadline_with_tasks(
+            offset=timedelta(), tasks=[quick(), slow(), broken()], log_count_down=False
+        )
+        return scheduler.overshoot_ns(), finished
+
+    overshoot_ns, finished = asyncio.run(run())
+
+    assert overshoot_ns < 50_000_000
+    assert finished == ["quick"]
+    assert "slow 沒有在開搶前完成，已取消" in caplog.text
+    assert "broken 發生錯誤" in caplog.text
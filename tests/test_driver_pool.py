@@ -0,0 +1,72 @@
+"""瀏覽器池的使用者資料目錄與 cookies 清除，用假的 WebDriver 取代 Chrome"""
+
+import asyncio
+from functools import partial
+from pathlib import Path
+
+import pytest
+from utils.driver_pool import ChromeDriverPool, lean_chrome_options
+
+pytest.importorskip("selenium")
+
+
+class FakeDriver:
+    def __init__(self, options) -> None:
+        self.user_data_dir = next(
+            argument.partition("=")[2]
+            for argument in options.arguments
+            if argument.startswith("--user-data-dir=")
+        )
+        self.cdp_commands: list[str] = []
+        self.is_quit = False
+
+    def execute_cdp_cmd(self, command: str, params: dict) -> None:
+        self.cdp_commands.append(command)
+
+    def get(self, url: str) -> None:
+        pass
+
+    def quit(self) -> None:
+        self.is_quit = True
+
+
+def create_pool(profile_dir: Path) -> ChromeDriverPool:
+    return ChromeDriverPool(
+        max_drivers=1,
+        options_factory=partial(lean_chrome_options, profile_dir=profile_dir),
+        driver_factory=FakeDriver,
+        driver_setup=None,
+    )
+
+
+def test_pools_never_share_a_profile_directory(tmp_path: Path):
+    async def run() -> tuple[FakeDriver, FakeDriver]:
+        first_pool, second_pool = create_pool(tmp_path), create_pool(tmp_path)
+        # 兩個瀏覽器池的第一個 Chrome 編號都是 1
+        first, second = await asyncio.gather(
+            first_pool.run(lambda driver: driver), second_pool.run(lambda driver: driver)
+        )
+        assert first.user_data_dir != second.user_data_dir
+        assert Path(first.user_data_dir).is_dir() and Path(second.user_data_dir).is_dir()
+
+        await asyncio.gather(first_pool.close(), second_pool.close())
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first.is_quit and second.is_quit
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_all_cookies_are_cleared_before_reuse(tmp_path: Path):
+    async def run() -> FakeDriver:
+        pool = create_pool(tmp_path)
+        first = await pool.run(lambda driver: driver)
+        second = await pool.run(lambda driver: driver)
+        assert first is second
+        await pool.close()
+        return first
+
+    driver = asyncio.run(run())
+
+    assert driver.cdp_commands == ["Network.clearBrowserCookies"] * 2
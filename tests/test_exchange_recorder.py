@@ -0,0 +1,82 @@
+"""記錄對模擬伺服器的請求，遮蔽帳密後再用重播伺服器重現"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import aiohttp
+import pytest
+from devtools.mock_sports_center import MockServerConfig, MockSportsCenterServer
+from devtools.replay_server import ReplayServer, ReplayServerConfig
+from services.sports_center_webservice import LOGIN_BACKEND_HTTP, BookingOutcome
+from services.zhongshan_sports_center_webservice import ZhongshanSportsCenterWebService
+from utils.exchange_recorder import recorder
+
+USERNAME = "A123456789"
+BOOKING_DATE = (datetime.now() + timedelta(days=14)).replace(
+    hour=20, minute=0, second=0, microsecond=0
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_recorder():
+    yield
+    recorder.enabled = False
+    recorder.exchanges.clear()
+
+
+async def book_twice(base_url: str, password: str) -> tuple[list[BookingOutcome], set[str]]:
+    service = ZhongshanSportsCenterWebService(
+        username=USERNAME, password=password, login_backend=LOGIN_BACKEND_HTTP, base_url=base_url
+    )
+    await service.http_login()
+    assert service.login_status
+
+    booking_url = service.get_booking_url(booking_date=BOOKING_DATE, court="84")
+    async with aiohttp.ClientSession(
+        cookies=service.get_cookies(), trace_configs=recorder.trace_configs()
+    ) as session:
+        outcomes = [
+            await service.send_booking_request(session=session, booking_url=booking_url)
+            for _ in range(2)
+        ]
+    return outcomes, set(service.get_cookies().values())
+
+
+@pytest.mark.parametrize("password", ["x", "a-much-longer-password"])
+def test_record_redacts_credentials_and_replays(tmp_path: Path, password: str):
+    archive_path = tmp_path / "session.har"
+
+    async def record() -> set[str]:
+        recorder.enable()
+        config = MockServerConfig(port=0, accounts={USERNAME: password})
+        async with MockSportsCenterServer(config=config) as server:
+            outcomes, cookie_values = await book_twice(base_url=server.base_url, password=password)
+        recorder.write(path=archive_path)
+        assert outcomes == [BookingOutcome.SUCCESS, BookingOutcome.FAILED]
+        return cookie_values
+
+    cookie_values = asyncio.run(record())
+
+    text = archive_path.read_text()
+    entries = json.loads(text)["log"]["entries"]
+    assert entries
+    assert USERNAME not in text
+    assert all(cookie_value not in text for cookie_value in cookie_values)
+    # 密碼依表單欄位名稱遮蔽，短密碼不會把其他字串中相同的字元換掉
+    login_posts = [entry for entry in entries if entry["request"]["method"] == "POST"]
+    assert len(login_posts) == 1
+    assert "loginpw=REDACTED" in login_posts[0]["request"]["postData"]["text"]
+    assert f"loginpw={password}" not in text
+    assert all(".aspx" in entry["request"]["url"] for entry in entries)
+
+    async def replay() -> None:
+        recorder.enabled = False
+        config = ReplayServerConfig(archive_path=archive_path, port=0)
+        async with ReplayServer(config=config) as server:
+            outcomes, _ = await book_twice(base_url=server.base_url, password="anything")
+            assert server.unmatched == []
+        assert outcomes == [BookingOutcome.SUCCESS, BookingOutcome.FAILED]
+
+    asyncio.run(replay())
@@ -0,0 +1,85 @@
+"""連發區間的請求分配與送出時間"""
+
+from datetime import datetime, timedelta
+
+from services.firing_engine import FiringEngine, FiringWindow
+from services.sports_center_webservice import LOGIN_BACKEND_HTTP
+from services.zhongshan_sports_center_webservice import ZhongshanSportsCenterWebService
+from utils.deadline_scheduler import DeadlineScheduler
+
+WINDOW = FiringWindow(
+    shots_per_slot=5,
+    window_start=timedelta(milliseconds=-30),
+    window_end=timedelta(milliseconds=200),
+    max_requests=10,
+)
+PERIODS = tuple(datetime(2025, 4, 26, 18) + timedelta(hours=i) for i in range(3))
+
+
+def milliseconds(offsets: list[timedelta]) -> list[float]:
+    return [offset.total_seconds() * 1000 for offset in offsets]
+
+
+def test_single_shot_is_sent_at_opening():
+    assert WINDOW.shot_offsets(slot_count=6) == [timedelta()]
+    assert WINDOW.shot_offsets(slot_count=11) == [timedelta()]
+
+    late_window = FiringWindow(
+        window_start=timedelta(milliseconds=20), window_end=timedelta(milliseconds=80)
+    )
+    assert late_window.shot_offsets(slot_count=20) == [timedelta(milliseconds=20)]
+
+
+def test_one_of_several_shots_is_sent_at_opening():
+    assert milliseconds(WINDOW.shot_offsets(slot_count=1)) == [-30, 0, 85, 142.5, 200]
+    assert milliseconds(WINDOW.shot_offsets(slot_count=4)) == [0, 200]
+
+    narrow_window = FiringWindow(
+        window_start=timedelta(milliseconds=-15), window_end=timedelta(milliseconds=15)
+    )
+    assert milliseconds(narrow_window.shot_offsets(slot_count=1)) == [-15, -7.5, 0, 7.5, 15]
+
+
+def test_request_count_never_exceeds_budget():
+    assert WINDOW.request_count(target_count=2) == 10
+    assert WINDOW.request_count(target_count=4) == 8
+    assert WINDOW.request_count(target_count=11) == 10
+    assert WINDOW.request_count(target_count=0) == 0
+
+
+def test_split_shares_budget_across_accounts():
+    windows = WINDOW.split(target_counts={"A": 3, "B": 3, "C": 2})
+
+    assert {key: window.max_requests for key, window in windows.items()} == {
+        "A": 4,
+        "B": 4,
+        "C": 2,
+    }
+    assert sum(
+        windows[key].request_count(target_count=count)
+        for key, count in {"A": 3, "B": 3, "C": 2}.items()
+    ) <= WINDOW.max_requests
+
+
+def test_prepare_drops_lowest_priority_targets_over_budget():
+    service = ZhongshanSportsCenterWebService(
+        username="A123456789", password="password", login_backend=LOGIN_BACKEND_HTTP
+    )
+    engine = FiringEngine(
+        service=service,
+        session=None,
+        scheduler=DeadlineScheduler(booking_date=datetime.now()),
+        window=FiringWindow(max_requests=4),
+        courts=("84", "85"),
+    )
+
+    assert engine.prepare(booking_periods=PERIODS) == 4
+    _, plan = engine._prepared
+    # 三個時段的第一優先場地都保留，第二優先場地只剩第一個時段
+    assert sorted((slot_index, court) for _, slot_index, _, court, _, _ in plan) == [
+        (0, "84"),
+        (0, "85"),
+        (1, "84"),
+        (2, "84"),
+    ]
+    assert {offset for offset, *_ in plan} == {timedelta()}
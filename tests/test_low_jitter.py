@@ -0,0 +1,41 @@
+"""同一個行程中多次開搶交錯進出低抖動模式"""
+
+import gc
+import os
+
+import pytest
+from utils.low_jitter import LowJitterMode
+
+
+@pytest.fixture(autouse=True)
+def restore_gc():
+    yield
+    gc.unfreeze()
+    gc.enable()
+
+
+def test_overlapping_modes_restore_settings_once_the_last_one_leaves():
+    has_affinity = hasattr(os, "sched_getaffinity")
+    original_affinity = os.sched_getaffinity(0) if has_affinity else None
+    first, second = LowJitterMode(), LowJitterMode()
+
+    first.__enter__()
+    second.__enter__()
+    assert not gc.isenabled()
+
+    # 先進入的先離開時，後面的開搶仍在低抖動模式中
+    first.__exit__(None, None, None)
+    assert not gc.isenabled()
+
+    second.__exit__(None, None, None)
+    assert gc.isenabled()
+    if has_affinity:
+        assert os.sched_getaffinity(0) == original_affinity
+
+
+def test_nested_modes():
+    with LowJitterMode():
+        with LowJitterMode():
+            assert not gc.isenabled()
+        assert not gc.isenabled()
+    assert gc.isenabled()
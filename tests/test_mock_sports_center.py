@@ -0,0 +1,187 @@
+"""對本機模擬伺服器執行 HTTP 登入、搶場地請求與連發流程"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import aiohttp
+from devtools.mock_sports_center import MockServerConfig, MockSportsCenterServer
+from services.availability_scanner import AvailabilityScanner
+from services.firing_engine import FiringEngine, FiringWindow
+from services.sports_center_webservice import LOGIN_BACKEND_HTTP, BookingOutcome
+from services.zhongshan_sports_center_webservice import ZhongshanSportsCenterWebService
+from utils.deadline_scheduler import DeadlineScheduler
+
+USERNAME = "A123456789"
+PASSWORD = "correct-password"
+BOOKING_DATE = (datetime.now() + timedelta(days=14)).replace(
+    hour=20, minute=0, second=0, microsecond=0
+)
+
+
+def create_service(base_url: str, password: str = PASSWORD) -> ZhongshanSportsCenterWebService:
+    return ZhongshanSportsCenterWebService(
+        username=USERNAME, password=password, login_backend=LOGIN_BACKEND_HTTP, base_url=base_url
+    )
+
+
+def test_http_login_and_logout():
+    async def run():
+        config = MockServerConfig(port=0, accounts={USERNAME: PASSWORD})
+        async with MockSportsCenterServer(config=config) as server:
+            service = create_service(base_url=server.base_url)
+            await service.http_login()
+            assert service.login_status
+            assert list(server._sessions.values()) == [USERNAME]
+
+            await service.http_logout()
+            assert not service.login_status
+            assert server._sessions == {}
+
+    asyncio.run(run())
+
+
+def test_http_login_with_wrong_password():
+    async def run():
+        config = MockServerConfig(port=0, accounts={USERNAME: PASSWORD})
+        async with MockSportsCenterServer(config=config) as server:
+            service = create_service(base_url=server.base_url, password="wrong-password")
+            await service.http_login()
+            assert not service.login_status
+            assert server._sessions == {}
+
+    asyncio.run(run())
+
+
+def test_send_booking_request():
+    async def run():
+        config = MockServerConfig(port=0, accounts={USERNAME: PASSWORD})
+        async with MockSportsCenterServer(config=config) as server:
+            service = create_service(base_url=server.base_url)
+            await service.http_login()
+            booking_url = service.get_booking_url(booking_date=BOOKING_DATE, court="84")
+
+            async with aiohttp.ClientSession(cookies=service.get_cookies()) as session:
+                first = await service.send_booking_request(session=session, booking_url=booking_url)
+                # 每個場地時段只能被預約一次
+                second = await service.send_booking_request(
+                    session=session, booking_url=booking_url
+                )
+                full_page = await service.send_booking_request(
+                    session=session, booking_url=booking_url, read_full_page=True
+                )
+
+            assert first is BookingOutcome.SUCCESS
+            assert second is BookingOutcome.FAILED
+            assert full_page is BookingOutcome.FAILED
+            assert [(record.username, record.hour, record.is_success) for record in server.bookings] == [
+                (USERNAME, 20, True),
+                (USERNAME, 20, False),
+                (USERNAME, 20, False),
+            ]
+
+    asyncio.run(run())
+
+
+def test_send_booking_request_without_login():
+    async def run():
+        async with MockSportsCenterServer(config=MockServerConfig(port=0)) as server:
+            service = create_service(base_url=server.base_url)
+            booking_url = service.get_booking_url(booking_date=BOOKING_DATE, court="84")
+
+            async with aiohttp.ClientSession() as session:
+                outcome = await service.send_booking_request(session=session, booking_url=booking_url)
+
+            # 沒有登入會被導回登入頁，無法判斷預約結果
+            assert outcome is BookingOutcome.UNKNOWN
+            assert server.bookings == []
+
+    asyncio.run(run())
+
+
+def test_send_booking_request_when_server_is_down():
+    async def run():
+        async with MockSportsCenterServer(config=MockServerConfig(port=0)) as server:
+            service = create_service(base_url=server.base_url)
+        booking_url = service.get_booking_url(booking_date=BOOKING_DATE, court="84")
+
+        async with aiohttp.ClientSession() as session:
+            outcome = await service.send_booking_request(session=session, booking_url=booking_url)
+
+        assert outcome is BookingOutcome.ERROR
+
+    asyncio.run(run())
+
+
+def test_firing_engine_burst():
+    async def run():
+        opening_time = datetime.now() + timedelta(milliseconds=500)
+        config = MockServerConfig(port=0, accounts={USERNAME: PASSWORD}, opening_time=opening_time)
+        async with MockSportsCenterServer(config=config) as server:
+            service = create_service(base_url=server.base_url)
+            await service.http_login()
+            periods = (BOOKING_DATE, BOOKING_DATE + timedelta(hours=1))
+
+            async with aiohttp.ClientSession(cookies=service.get_cookies()) as session:
+                engine = FiringEngine(
+                    service=service,
+                    session=session,
+                    scheduler=DeadlineScheduler(booking_date=opening_time),
+                    # 第一發在開放前送出會失敗，第二發搶到後第三發就會取消
+                    window=FiringWindow(
+                        shots_per_slot=3,
+                        window_start=timedelta(milliseconds=-100),
+                        window_end=timedelta(milliseconds=200),
+                        max_requests=10,
+                    ),
+                )
+                assert engine.prepare(booking_periods=periods) == 6
+                results = await engine.fire(booking_periods=periods)
+
+            assert [result.booking_date for result in results] == list(periods)
+            for result in results:
+                assert result.is_success
+                assert result.won_courts == ["84"]
+                assert result.winning_offset == timedelta()
+                assert [shot.outcome for shot in result.shots] == [
+                    BookingOutcome.FAILED,
+                    BookingOutcome.SUCCESS,
+                ]
+            assert sorted(
+                record.hour for record in server.bookings if record.is_success
+            ) == [20, 21]
+            assert len(server.bookings) == 4
+
+    asyncio.run(run())
+
+
+def test_schedule_shows_slots_taken_by_competitors():
+    async def run():
+        opening_time = datetime.now() - timedelta(seconds=1)
+        config = MockServerConfig(
+            port=0,
+            accounts={USERNAME: PASSWORD},
+            opening_time=opening_time,
+            capacity_per_slot=2,
+            competitor_delays=(timedelta(milliseconds=10),),
+        )
+        async with MockSportsCenterServer(config=config) as server:
+            service = create_service(base_url=server.base_url)
+            await service.http_login()
+            scanner = AvailabilityScanner(service=service, courts=("84",))
+            center = service.sports_center_name()
+            other_hour = BOOKING_DATE + timedelta(hours=1)
+
+            async with aiohttp.ClientSession(cookies=service.get_cookies()) as session:
+                index = await scanner.scan(session=session, booking_dates=[BOOKING_DATE])
+                # 競爭者已經搶下一個名額，還剩一個
+                assert index.is_winnable(center=center, court="84", booking_date=BOOKING_DATE)
+
+                booking_url = service.get_booking_url(booking_date=BOOKING_DATE, court="84")
+                outcome = await service.send_booking_request(session=session, booking_url=booking_url)
+                assert outcome is BookingOutcome.SUCCESS
+
+                index = await scanner.scan(session=session, booking_dates=[BOOKING_DATE])
+                assert not index.is_winnable(center=center, court="84", booking_date=BOOKING_DATE)
+                assert index.is_winnable(center=center, court="84", booking_date=other_hour)
+
+    asyncio.run(run())
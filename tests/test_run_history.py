@@ -0,0 +1,54 @@
+"""由每一發請求的結果推算伺服器實際開放預約的時間"""
+
+from datetime import datetime, timedelta
+
+from services.run_history import RunRecord, ShotRecord
+from services.sports_center_webservice import BookingOutcome
+
+BOOKING_DATE = datetime(2025, 4, 26, 20)
+
+
+def shot(offset_ms: int, outcome: BookingOutcome, court: str = "84", hour: int = 20) -> ShotRecord:
+    return ShotRecord(
+        username="A123456789",
+        booking_date=BOOKING_DATE.replace(hour=hour),
+        court=court,
+        offset=timedelta(milliseconds=offset_ms),
+        overshoot_ns=0,
+        response_ns=0,
+        outcome=outcome,
+    )
+
+
+def record(*shots: ShotRecord) -> RunRecord:
+    return RunRecord(
+        center="zhongshan",
+        planned_booking_date=BOOKING_DATE,
+        clock_offset=timedelta(),
+        send_offset=timedelta(),
+        window=(timedelta(milliseconds=-30), timedelta(milliseconds=200)),
+        shots=shots,
+    )
+
+
+def test_bracket_uses_failures_on_the_winning_target():
+    run = record(
+        shot(-20, BookingOutcome.FAILED),
+        shot(10, BookingOutcome.SUCCESS),
+        # 別的場地、別的時段已經被搶走，和開放時間無關
+        shot(5, BookingOutcome.FAILED, court="85"),
+        shot(8, BookingOutcome.FAILED, hour=21),
+        shot(30, BookingOutcome.FAILED),
+    )
+
+    assert run.opening_bracket() == (timedelta(milliseconds=-20), timedelta(milliseconds=10))
+
+
+def test_no_bracket_without_failures_on_the_winning_target():
+    run = record(
+        shot(-5, BookingOutcome.FAILED, court="85"),
+        shot(0, BookingOutcome.SUCCESS),
+    )
+
+    assert run.opening_bracket() is None
+    assert record(shot(-5, BookingOutcome.FAILED)).opening_bracket() is None
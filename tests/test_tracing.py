@@ -0,0 +1,26 @@
+"""追蹤事件的時間軸不會讓已經結束的 asyncio task 留在記憶體中"""
+
+import asyncio
+import gc
+import weakref
+
+from utils.tracing import Tracer
+
+
+def test_finished_tasks_are_not_kept_alive():
+    tracer = Tracer()
+    tracer.enable()
+
+    async def traced() -> None:
+        tracer.instant("shot")
+
+    async def run() -> weakref.ref:
+        task = asyncio.create_task(traced())
+        await task
+        return weakref.ref(task)
+
+    task_ref = asyncio.run(run())
+    gc.collect()
+
+    assert task_ref() is None
+    assert len(tracer._events) == 1